@@ -0,0 +1,43 @@
+from flask import Response, request  # type: ignore
+from services.table_versions import table_versions
+import hashlib
+import json
+
+
+def table_etag(*tables):
+    """
+    Strong ETag for the current request's JSON response, built from the versions of the `tables` it reads.
+    The same URL (path and query string) over the same table versions always renders the same body.
+    """
+    versions = table_versions(*tables)
+    raw = json.dumps([sorted(versions.items()), request.full_path], separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def content_etag(payload):
+    """
+    Strong ETag for the current request's JSON response, built from the `payload` it renders.
+    For bodies served from a cache, where the live table versions may already be ahead of the cached copy.
+    """
+    raw = json.dumps([payload, request.full_path], separators=(",", ":"), sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def not_modified(etag):
+    """
+    A 304 response if the client's If-None-Match already holds `etag`, otherwise None.
+    The comparison is weak, as RFC 9110 specifies: compressed responses carry the same tag marked weak.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        return with_validators(response, etag)
+    return None
+
+
+def with_validators(response, etag):
+    """
+    Attaches `etag` to `response`; `no-cache` makes browsers revalidate instead of reusing it blindly
+    """
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
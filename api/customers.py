@@ -1,7 +1,17 @@
-from flask import Blueprint, request, jsonify  # type: ignore
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context  # type: ignore
 from models import db, Customer
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from auth.auth_middleware import login_required # Import login_required
+from services.customer_cache import CachedCustomer, customer_cache, snapshot
+from services.customer_search import index_customers, reindex_customers, search_customers, unindex_customers
+from services.customer_import import import_customers_csv
+from services.export_service import EXPORT_FORMATS, stream_rows
+from api.conditional import content_etag, not_modified, table_etag, with_validators
+from api.pagination import InvalidCursor, decode_cursor, encode_cursor, page_limit, wants_all
+from api.serialization import InvalidRepresentation, parse_representation, render, selected_columns
+import csv
+import io
 import logging
 
 customers_bp = Blueprint('customers', __name__)
@@ -25,9 +35,12 @@ def register_customer():
     try:
         new_customer = Customer(name=name, phone_number=phone_number, code=code)
         db.session.add(new_customer)
+        db.session.flush()
+        customer_id = new_customer.id # Read before commit expires it, which would cost a reload
         db.session.commit()
-        logger.info(f"Customer registered successfully: {new_customer.id}")
-        return jsonify({"message": "Customer registered successfully", "customer_id": new_customer.id}), 201
+        index_customers(CachedCustomer(customer_id, name, phone_number, code))
+        logger.info(f"Customer registered successfully: {customer_id}")
+        return jsonify({"message": "Customer registered successfully", "customer_id": customer_id}), 201
     except IntegrityError:
         db.session.rollback()
         logger.error(f"Integrity error: Phone number '{phone_number}' or code '{code}' already exists.", exc_info=True)
@@ -38,47 +51,180 @@ def register_customer():
         return jsonify({"error": "An internal server error occurred"}), 500
 
 
+@customers_bp.route('/import', methods=['POST'])
+@login_required # Protect this route
+def import_customers():
+    """
+    Function for bulk importing customers from a CSV file on the route `/customers/import`.
+    Send the file as the `file` field of a multipart upload, or as a raw `text/csv` body.
+    The CSV needs `name,phone_number,code` columns; existing customers (matched on phone_number or code) are updated.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        binary_stream = upload.stream
+    elif request.mimetype == "text/csv":
+        binary_stream = request.stream
+    else:
+        logger.warning("Customer import attempted without a CSV file.")
+        return jsonify({"error": "Upload a CSV file in the 'file' field or send a text/csv body"}), 400
+
+    # utf-8-sig drops the byte order mark spreadsheet exports like to add
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        summary = import_customers_csv(
+            text_stream, chunk_size=current_app.config.get("CUSTOMER_IMPORT_CHUNK_SIZE", 1000),
+            after_commit=refresh_imported_customers
+        )
+        return jsonify(summary), 200
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        logger.warning(f"Rejected customer import: {e}")
+        return jsonify({"error": f"Invalid CSV file: {e}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing customers: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+    finally:
+        text_stream.detach() # Leave closing the underlying upload stream to Werkzeug
+
+
+def refresh_imported_customers():
+    """
+    Drops cached and indexed customers after an import chunk commits (so a failed import still refreshes the
+    chunks it kept). Dropping the whole cache is cheaper than tracking every key an import touched. Failures are
+    logged and never replace the import's response: the cache entries expire and the index reloads on its own.
+    """
+    try:
+        customer_cache().clear()
+    except Exception as e:
+        logger.error(f"Customer import committed, but clearing the customer cache failed: {e}", exc_info=True)
+    try:
+        reindex_customers()
+    except Exception as e:
+        logger.error(f"Customer import committed, but invalidating the search index failed: {e}", exc_info=True)
+
+
 @customers_bp.route('/view_customers', methods=['GET'])
 @login_required # Protect this route
 def view_customers():
     """
     Function for viewing all the customers on the route `/customers/view_customers`
+
+    Customers are returned in id order, one page at a time: `limit` bounds the page size and
+    `cursor` (the `next_cursor` of the previous page) seeks past the last id seen.
+    Pass `all=true` to get the unpaginated list instead.
+    `fields=id,name` returns (and selects) only those fields; `format=columnar` returns one array per field.
+    Responses carry an ETag; a matching `If-None-Match` gets a 304 without any customers being read.
     """
     try:
-        customers = Customer.query.all()
-        customer_list = [
-            {
-                "id": customer.id,
-                "name": customer.name,
-                "phone_number": customer.phone_number,
-                "code": customer.code
-            } for customer in customers
-        ]
-        logger.info(f"Retrieved {len(customer_list)} customers.")
-        return jsonify(customer_list), 200
+        limit = page_limit()
+        cursor = request.args.get("cursor")
+        if cursor:
+            (last_id,) = decode_cursor(cursor, 1)
+            last_id = int(last_id)
+        fields, columnar = parse_representation(Customer.JSON_FIELDS)
+    except InvalidRepresentation as e:
+        logger.warning(f"Invalid fields or format for customers: {e}")
+        return jsonify({"error": str(e)}), 400
+    except (InvalidCursor, TypeError, ValueError) as e:
+        logger.warning(f"Invalid pagination parameters for customers: {e}")
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    try:
+        etag = table_etag("customers")
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
+        statement = select(*selected_columns(Customer, fields, "id")).order_by(Customer.id)
+        next_cursor = None
+        if wants_all():
+            customers = db.session.execute(statement).all()
+        else:
+            if cursor:
+                statement = statement.where(Customer.id > last_id)
+            # Fetch one extra row to know whether another page exists
+            customers = db.session.execute(statement.limit(limit + 1)).all()
+            if len(customers) > limit:
+                customers = customers[:limit]
+                next_cursor = encode_cursor(customers[-1].id)
+
+        customer_list = render(customers, Customer.JSON_FIELDS, fields, columnar)
+        logger.info(f"Retrieved {len(customers)} customers.")
+        if wants_all():
+            return with_validators(jsonify(customer_list), etag), 200
+        return with_validators(jsonify({"customers": customer_list, "next_cursor": next_cursor}), etag), 200
     except Exception as e:
         logger.error(f"Error viewing all customers: {e}", exc_info=True)
         return jsonify({"error": "An internal server error occurred"}), 500
 
+@customers_bp.route('/search', methods=['GET'])
+@login_required # Protect this route
+def search_customers_route():
+    """
+    Function for finding customers as you type on the route `/customers/search?q=<text>&limit=<n>`.
+    Matches the start of the code, the phone number (digits only, so "+254 700" finds "+254700123456") or the name,
+    and returns the best `limit` matches (exact code first, then code, phone and name prefixes).
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        logger.warning("Customer search attempted without a query.")
+        return jsonify({"error": "Provide a search query in the 'q' parameter"}), 400
+    try:
+        limit = request.args.get("limit", type=int) or current_app.config.get("CUSTOMER_SEARCH_LIMIT_DEFAULT", 10)
+        limit = max(1, min(limit, current_app.config.get("CUSTOMER_SEARCH_LIMIT_MAX", 50)))
+        customers = search_customers(query, limit)
+        logger.info(f"Customer search returned {len(customers)} matches.")
+        return jsonify({"customers": [customer.to_dict() for customer in customers]}), 200
+    except Exception as e:
+        logger.error(f"Error searching customers: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+@customers_bp.route('/export', methods=['GET'])
+@login_required # Protect this route
+def export_customers():
+    """
+    Function for streaming every customer as NDJSON or CSV on the route `/customers/export`.
+    Pick the format with `?format=ndjson|csv` (default `ndjson`).
+    """
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        logger.warning(f"Unsupported customer export format requested: {fmt}")
+        return jsonify({"error": f"Unsupported export format (choose from {', '.join(EXPORT_FORMATS)})"}), 400
+
+    statement = select(Customer.id, Customer.name, Customer.phone_number, Customer.code).order_by(Customer.id)
+    logger.info(f"Streaming customer export as {fmt}.")
+    rows = stream_rows(
+        statement,
+        ["id", "name", "phone_number", "code"],
+        fmt,
+        batch_size=current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+    )
+    return Response(
+        stream_with_context(rows),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=customers.{fmt}"}
+    )
+
 @customers_bp.route('/view_customers/<int:id>', methods=['GET'])
 @login_required # Protect this route
 def view_customer(id):
     """
     Function for viewing a specific customer on the route `/customers/view_customers/<id>`
+    The body may come from the customer cache, so its ETag is built from that body rather than the table version.
     """
     try:
-        customer = db.session.get(Customer, id)
+        customer = customer_cache().get_by_id(id)
         if not customer:
             logger.warning(f"Customer with ID {id} not found.")
             return jsonify({"error": "Customer not found"}), 404
-        customer_data = {
-            "id": customer.id,
-            "name": customer.name,
-            "phone_number": customer.phone_number,
-            "code": customer.code
-        }
+        body = customer.to_dict()
+        etag = content_etag(body)
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
         logger.info(f"Retrieved customer with ID: {id}")
-        return jsonify(customer_data), 200
+        return with_validators(jsonify(body), etag), 200
     except Exception as e:
         logger.error(f"Error viewing customer with ID {id}: {e}", exc_info=True)
         return jsonify({"error": "An internal server error occurred"}), 500
@@ -101,11 +247,14 @@ def update_customer(id):
             logger.warning(f"No update data provided for customer ID: {id}")
             return jsonify({"error": "No update data provided"}), 400
 
+        previous = snapshot(customer) # Its phone_number/code keys must be dropped too
         customer.name = data.get("name", customer.name)
         customer.phone_number = data.get("phone_number", customer.phone_number)
         customer.code = data.get("code", customer.code)
 
         db.session.commit()
+        customer_cache().invalidate(previous, customer)
+        index_customers(customer)
         logger.info(f"Customer with ID {id} updated successfully.")
         return jsonify({"message": "Customer updated successfully"}), 200
     except IntegrityError:
@@ -122,15 +271,21 @@ def update_customer(id):
 @login_required # Protect this route
 def delete_customer(id):
     """
-    Function for deleting a customer on the route `/customers/delete_customers/<id>`
+    Function for deleting a customer on the route `/customers/delete_customers/<id>`.
+    The customer's orders are deleted by the database (ON DELETE CASCADE) without being loaded,
+    so a customer with a long order history costs the same single DELETE as any other.
     """
     try:
         customer = db.session.get(Customer, id)
         if not customer:
             logger.warning(f"Attempt to delete non-existent customer with ID: {id}")
             return jsonify({"error": "Customer not found"}), 404
+        previous = snapshot(customer)
+        # One DELETE; the database cascades it to the customer's orders and rollup rows
         db.session.delete(customer)
         db.session.commit()
+        customer_cache().invalidate(previous)
+        unindex_customers(id)
         logger.info(f"Customer with ID {id} deleted successfully.")
         return jsonify({"message": "Customer deleted successfully"}), 200
     except Exception as e:
@@ -0,0 +1,34 @@
+from flask import Blueprint, current_app, jsonify  # type: ignore
+from models import db
+from auth.auth_middleware import login_required
+import logging
+
+internal_bp = Blueprint('internal', __name__)
+logger = logging.getLogger(__name__)
+
+@internal_bp.route('/pool', methods=['GET'])
+@login_required
+def pool_stats():
+    """
+    Endpoint for diagnosing the database connection pool on the route `/internal/pool`.
+    Counters are per worker process, since each process has its own pool.
+    """
+    try:
+        stats = current_app.extensions['pool_stats']
+        return jsonify(stats.snapshot(db.engine.pool)), 200
+    except Exception as e:
+        logger.error(f"Error reading pool statistics: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+@internal_bp.route('/cache', methods=['GET'])
+@login_required
+def cache_stats():
+    """
+    Endpoint for the customer cache hit/miss/eviction counters on the route `/internal/cache`.
+    Counters are per worker process; `shared_hits` are lookups served by the shared backend.
+    """
+    try:
+        return jsonify(current_app.extensions['customer_cache'].stats()), 200
+    except Exception as e:
+        logger.error(f"Error reading cache statistics: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
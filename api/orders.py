@@ -1,8 +1,19 @@
-from flask import Blueprint, request, jsonify, session  # type: ignore
-from models import db, Order, Customer
-from services.sms_service import SendSMS
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context  # type: ignore
+from models import db, Order, OrderArchive, Customer, SmsDeliveryReport, SmsOutbox, utcnow
+from services.customer_cache import customer_cache
+from services.order_rollup import BUCKETS, record_new_orders, revenue_series, top_customers
+from services.order_service import MAX_AMOUNT, MAX_ITEM_LENGTH, create_orders, delete_orders, update_orders
+from services.order_archive import archive_cutoff
+from services.sms_outbox import order_confirmation_values
+from services.export_service import EXPORT_FORMATS, stream_rows
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, insert, or_, select, text, tuple_, union_all
 from auth.auth_middleware import login_required
+from api.conditional import not_modified, table_etag, with_validators
+from api.pagination import InvalidCursor, decode_cursor, encode_cursor, page_limit, wants_all
+from api.serialization import InvalidRepresentation, parse_representation, render, selected_columns
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import logging
 
 orders_bp = Blueprint('orders', __name__)
@@ -23,36 +34,33 @@ def place_order():
         logger.warning("Attempt to place order with missing details.")
         return jsonify({"error": "Missing order details (customer_id, item, amount are required)"}), 400
 
+    customer = None
     try:
-        customer = db.session.get(Customer, customer_id)
+        customer = customer_cache().get_by_id(customer_id)
         if not customer:
             logger.warning(f"Customer with ID {customer_id} not found for order placement.")
             return jsonify({"error": "Customer not found"}), 404
 
-        new_order = Order(customer_id=customer_id, item=item, amount=amount)
-        db.session.add(new_order)
+        # Queues the confirmation SMS and counts the order in the daily rollup in the same transaction
+        (new_order,) = create_orders([(customer, item, amount)])
+        order_id = new_order.id # Read before commit expires it, which would cost a reload
         db.session.commit()
-        logger.info(f"Order placed successfully for customer ID {customer_id}, Order ID: {new_order.id}")
-
-        order_details = f"Item: {item}, Amount: {amount}"
-        customer_name = customer.name
-        phone_number = customer.phone_number
-
-        # Call SMS service once and capture its status
-        sms_sent_status = SendSMS.send_order_confirmation(phone_number, customer_name, order_details)
-        sms_status_message = "SMS sent successfully" if sms_sent_status else "SMS sending failed"
-        if not sms_sent_status:
-            logger.error(f"Failed to send SMS for order {new_order.id} to {phone_number}.")
+        logger.info(f"Order placed successfully for customer ID {customer_id}, Order ID: {order_id}")
 
         return jsonify(
             {
                 "message": "Order placed successfully!",
-                "id": new_order.id,
-                "sms_status": sms_status_message # Return status, not the call itself
+                "id": order_id,
+                "sms_status": "queued"
             }), 201
 
     except IntegrityError:
         db.session.rollback()
+        # The customer came from the cache; another worker may have deleted it since (the foreign key fails)
+        if customer is not None and db.session.get(Customer, customer.id) is None:
+            customer_cache().invalidate(customer)
+            logger.warning(f"Customer with ID {customer_id} was deleted after it was cached; order not placed.")
+            return jsonify({"error": "Customer not found"}), 404
         logger.error("Integrity error during order placement.", exc_info=True)
         return jsonify({"error": "Error placing order due to data conflict"}), 500
     except Exception as e:
@@ -60,6 +68,130 @@ def place_order():
         logger.error(f"Error placing order: {e}", exc_info=True)
         return jsonify({"error": "An internal server error occurred"}), 500
 
+@orders_bp.route('/bulk', methods=['POST'])
+@login_required # Protect this route
+def place_orders_bulk():
+    """
+    Endpoint for creating many orders at once on the route `/orders/bulk`.
+    Accepts `{"orders": [{"customer_id": ..., "item": ..., "amount": ...}, ...]}`.
+
+    All customer ids are checked with one IN query, valid rows are inserted with a single multi-row INSERT
+    (plus one for their confirmation SMS) and committed once. Invalid rows are reported individually in
+    `results` without blocking the rest: 201 if every row was created, 207 if only some were.
+    """
+    data = request.get_json(silent=True) or {}
+    rows = data.get("orders") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        logger.warning("Attempt to place bulk orders without an orders list.")
+        return jsonify({"error": "An 'orders' list is required"}), 400
+
+    max_rows = current_app.config.get("BULK_ORDERS_MAX", 5000)
+    if len(rows) > max_rows:
+        logger.warning(f"Bulk order request with {len(rows)} rows exceeds the limit of {max_rows}.")
+        return jsonify({"error": f"At most {max_rows} orders can be placed per request"}), 413
+
+    results = [None] * len(rows)
+    valid = [] # (index, row) pairs that passed field validation
+    for index, row in enumerate(rows):
+        error = validate_order_row(row)
+        if error:
+            results[index] = {"index": index, "status": "error", "error": error}
+        else:
+            valid.append((index, row))
+
+    try:
+        customer_ids = {int(row["customer_id"]) for _, row in valid}
+        customers = {}
+        if customer_ids:
+            customers = {
+                customer.id: customer for customer in db.session.execute(
+                    select(Customer.id, Customer.name, Customer.phone_number).where(Customer.id.in_(customer_ids))
+                )
+            }
+
+        to_insert = []
+        for index, row in valid:
+            if int(row["customer_id"]) not in customers:
+                results[index] = {"index": index, "status": "error", "error": "Customer not found"}
+            else:
+                to_insert.append((index, {
+                    "customer_id": int(row["customer_id"]),
+                    "item": row["item"],
+                    "amount": Decimal(str(row["amount"]))
+                }))
+
+        if to_insert:
+            order_ids = insert_orders([values for _, values in to_insert])
+            outbox_rows = []
+            for (index, values), order_id in zip(to_insert, order_ids):
+                customer = customers[values["customer_id"]]
+                outbox_rows.append(order_confirmation_values(order_id, customer, values["item"], values["amount"]))
+                results[index] = {"index": index, "status": "created", "id": order_id, "sms_status": "queued"}
+            db.session.execute(insert(SmsOutbox), outbox_rows)
+            record_new_orders(order_ids)
+            db.session.commit()
+
+        created = len(to_insert)
+        failed = len(rows) - created
+        logger.info(f"Bulk order placement: {created} created, {failed} rejected.")
+        status = 201 if not failed else (207 if created else 400)
+        return jsonify({"created": created, "failed": failed, "results": results}), status
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error placing bulk orders: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+def validate_order_row(row):
+    """
+    Returns an error message for a bulk order row that cannot be inserted as it is, or None if it is usable.
+    Each field is checked against its column, so one bad row is reported on its own instead of failing the INSERT.
+    """
+    if not isinstance(row, dict) or not row.get("customer_id") or not row.get("item") or not row.get("amount"):
+        return "Missing order details (customer_id, item, amount are required)"
+    customer_id = row["customer_id"]
+    if isinstance(customer_id, bool) or not (isinstance(customer_id, int) or (isinstance(customer_id, str) and customer_id.isdigit())):
+        return "customer_id must be an integer"
+    if not isinstance(row["item"], str) or not row["item"].strip():
+        return "item must be a non-empty string"
+    if len(row["item"]) > MAX_ITEM_LENGTH:
+        return f"item must be at most {MAX_ITEM_LENGTH} characters"
+    try:
+        amount = None if isinstance(row["amount"], (bool, dict, list)) else Decimal(str(row["amount"]))
+    except ArithmeticError:
+        amount = None
+    if amount is None or not amount.is_finite():
+        return "amount must be a number"
+    if not 0 < amount <= MAX_AMOUNT:
+        return f"amount must be greater than 0 and at most {MAX_AMOUNT}"
+    return None
+
+
+def insert_orders(rows):
+    """
+    Inserts order rows with one INSERT statement and returns their ids in the same order.
+
+    Databases with INSERT ... RETURNING report the ids directly. Otherwise (MySQL, SQLite before 3.35) the rows go
+    in as one multi-row INSERT ... VALUES, for which InnoDB and SQLite hand out one run of ids: consecutive values
+    `auto_increment_increment` apart on MySQL (innodb_autoinc_lock_mode 1 or 2), consecutive ones on SQLite.
+    The run is located from the id the driver reports and the row count.
+    """
+    bind = db.session.get_bind()
+    if bind.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.session.execute(insert(Order).returning(Order.id, sort_by_parameter_order=True), rows).scalars().all()
+    result = db.session.execute(insert(Order).values(rows))
+    count = result.rowcount
+    if bind.dialect.name == "mysql":
+        # LAST_INSERT_ID() is the first row's id; hosted and replicated servers often step by more than 1
+        step = db.session.execute(text("SELECT @@auto_increment_increment")).scalar()
+        first = result.lastrowid
+    else:
+        # SQLite's last_insert_rowid() is the last row's id
+        step = 1
+        first = result.lastrowid - count + 1
+    return list(range(first, first + count * step, step))
+
+
 @orders_bp.route('/view_orders', methods=['GET'])
 @orders_bp.route('/view_orders/<int:customer_id>', methods=['GET'])
 @login_required # Protect this route
@@ -67,53 +199,289 @@ def view_orders(customer_id=None):
     """
     Endpoint for viewing all orders or orders placed by a specific customer.
     If customer_id is provided, filters orders by that customer.
+
+    Orders are returned newest first, one page at a time: `limit` bounds the page size and
+    `cursor` (the `next_cursor` of the previous page) seeks past the last `(time, id)` seen.
+    Pass `all=true` to get the unpaginated list instead.
+    `fields=id,amount` returns (and selects) only those fields; `format=columnar` returns one array per field.
+    `from` and `to` (inclusive ISO timestamps; a bare `to` date covers that day) narrow the time range.
+    Only the hot `orders` table is read unless `include_archived=true` is passed or the range reaches back
+    past the archival age, in which case `orders_archive` is merged in.
+    Responses carry an ETag; a matching `If-None-Match` gets a 304 without any orders being read.
     """
     try:
-        if customer_id:
-            orders = Order.query.filter_by(customer_id=customer_id).all()
-            if not orders:
-                logger.info(f"No orders found for customer with ID {customer_id}.")
-                return jsonify({"message": f"No orders found for customer with ID {customer_id}."}), 404
-            logger.info(f"Retrieved {len(orders)} orders for customer ID {customer_id}.")
+        limit = page_limit()
+        cursor = request.args.get("cursor")
+        if cursor:
+            last_time, last_id = decode_cursor(cursor, 2)
+            last_time, last_id = datetime.fromisoformat(last_time), int(last_id)
+        fields, columnar = parse_representation(Order.JSON_FIELDS)
+    except InvalidRepresentation as e:
+        logger.warning(f"Invalid fields or format for orders: {e}")
+        return jsonify({"error": str(e)}), 400
+    except (InvalidCursor, TypeError, ValueError) as e:
+        logger.warning(f"Invalid pagination parameters for orders: {e}")
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    try:
+        start, end = request.args.get("from"), request.args.get("to")
+        time_range(Order.time, start, end) # Validates both before anything is read
+        archived = reads_archive(start, end)
+    except ValueError as e:
+        logger.warning(f"Invalid time range for orders: {e}")
+        return jsonify({"error": "Invalid from or to"}), 400
+
+    try:
+        etag = table_etag("orders") # Archiving and customer deletes both move the orders version on
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
+        def orders_from(model):
+            # Plain rows of just the needed columns: no ORM objects, and nothing read that is not returned
+            statement = select(*selected_columns(model, fields, "time", "id")).where(*time_range(model.time, start, end))
+            if customer_id:
+                statement = statement.where(model.customer_id == customer_id)
+            if cursor and not wants_all():
+                statement = statement.where(or_(
+                    model.time < last_time,
+                    and_(model.time == last_time, model.id < last_id)
+                ))
+            statement = statement.order_by(model.time.desc(), model.id.desc())
+            # Fetch one extra row to know whether another page exists
+            return statement if wants_all() else statement.limit(limit + 1)
+
+        if archived:
+            # Each table serves its newest rows from its own (time, id) index; the merge only sees two short lists
+            merged = union_all(*(select(orders_from(model).subquery()) for model in (Order, OrderArchive))).subquery()
+            statement = select(merged).order_by(merged.c.time.desc(), merged.c.id.desc())
+            if not wants_all():
+                statement = statement.limit(limit + 1)
         else:
-            orders = Order.query.all()
-            logger.info(f"Retrieved {len(orders)} total orders.")
+            statement = orders_from(Order)
+        orders = db.session.execute(statement).all()
 
-        order_list = [
-            {
-                "id": order.id,
-                "customer_id": order.customer_id,
-                "item": order.item,
-                "amount": float(order.amount),
-                "time": order.time.isoformat() # ISO format for easier JS parsing
-            } for order in orders
-        ]
-        return jsonify(order_list), 200
+        next_cursor = None
+        if not wants_all() and len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor(orders[-1].time.isoformat(), orders[-1].id)
+
+        if customer_id and not cursor and not orders:
+            logger.info(f"No orders found for customer with ID {customer_id}.")
+            return jsonify({"message": f"No orders found for customer with ID {customer_id}."}), 404
+        logger.info(f"Retrieved {len(orders)} orders (customer_id: {customer_id}, archived: {archived}).")
+
+        order_list = render(orders, Order.JSON_FIELDS, fields, columnar)
+        if wants_all():
+            return with_validators(jsonify(order_list), etag), 200
+        return with_validators(jsonify({"orders": order_list, "next_cursor": next_cursor}), etag), 200
     except Exception as e:
         logger.error(f"Error viewing orders (customer_id: {customer_id}): {e}", exc_info=True)
         return jsonify({"error": "An internal server error occurred"}), 500
 
 
+def time_range(column, start=None, end=None):
+    """
+    Criteria on `column` for the inclusive ISO timestamps `start` and `end`; a bare `end` date covers that
+    whole day. Raises ValueError for malformed timestamps.
+    """
+    criteria = []
+    if start:
+        criteria.append(column >= datetime.fromisoformat(start))
+    if end:
+        bound = datetime.fromisoformat(end)
+        criteria.append(column < bound + timedelta(days=1) if len(end) == len("YYYY-MM-DD") else column <= bound)
+    return criteria
+
+
+def reads_archive(start, end):
+    """
+    Whether a listing should merge in orders_archive: `include_archived=true|false` decides when given,
+    otherwise only a time range starting before the archival cutoff (or with no start) reaches the archive
+    """
+    flag = request.args.get("include_archived")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    if not start and not end:
+        return False
+    return not start or datetime.fromisoformat(start) < archive_cutoff()
+
+
+@orders_bp.route('/export', methods=['GET'])
+@orders_bp.route('/export/<int:customer_id>', methods=['GET'])
+@login_required # Protect this route
+def export_orders(customer_id=None):
+    """
+    Endpoint for streaming every order (or a specific customer's orders) as NDJSON or CSV
+    on the route `/orders/export`. Pick the format with `?format=ndjson|csv` (default `ndjson`).
+    Rows are read in batches with a server-side cursor, so memory stays flat however large the table is.
+    """
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        logger.warning(f"Unsupported order export format requested: {fmt}")
+        return jsonify({"error": f"Unsupported export format (choose from {', '.join(EXPORT_FORMATS)})"}), 400
+
+    statement = select(Order.id, Order.customer_id, Order.item, Order.amount, Order.time).order_by(Order.id)
+    if customer_id:
+        statement = statement.where(Order.customer_id == customer_id)
+
+    logger.info(f"Streaming order export as {fmt} (customer_id: {customer_id}).")
+    rows = stream_rows(
+        statement,
+        ["id", "customer_id", "item", "amount", "time"],
+        fmt,
+        batch_size=current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+    )
+    filename = f"orders-{customer_id}.{fmt}" if customer_id else f"orders.{fmt}"
+    return Response(
+        stream_with_context(rows),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@orders_bp.route('/stats', methods=['GET'])
+@login_required # Protect this route
+def order_stats():
+    """
+    Endpoint for revenue-over-time and top-customer figures on the route `/orders/stats`.
+
+    Query parameters: `from` and `to` (ISO dates, inclusive; default the last 30 days), `bucket`
+    (`day`, `week` or `month`), `top` (number of top customers, at most 100) and an optional `customer_id`
+    that narrows the series. Everything is read from the order_daily_rollup table, never from `orders`.
+    """
+    try:
+        end = date.fromisoformat(request.args["to"]) if request.args.get("to") else utcnow().date()
+        start = date.fromisoformat(request.args["from"]) if request.args.get("from") else end - timedelta(days=29)
+        bucket = request.args.get("bucket", "day")
+        top = request.args.get("top", 10, type=int)
+        customer_id = request.args.get("customer_id", type=int)
+        if start > end or bucket not in BUCKETS or top is None or not 0 <= top <= 100:
+            raise ValueError("from must not be after to, bucket must be day, week or month, and top between 0 and 100")
+    except ValueError as e:
+        logger.warning(f"Invalid order stats parameters: {e}")
+        return jsonify({"error": "Invalid from, to, bucket or top"}), 400
+
+    try:
+        etag = table_etag("orders", "customers")
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
+        series = revenue_series(start, end, bucket, customer_id)
+        stats = {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "bucket": bucket,
+            "totals": {
+                "order_count": sum(point["order_count"] for point in series),
+                "amount_sum": round(sum(point["amount_sum"] for point in series), 2)
+            },
+            "series": series,
+            "top_customers": top_customers(start, end, top) if top else []
+        }
+        return with_validators(jsonify(stats), etag), 200
+    except Exception as e:
+        logger.error(f"Error computing order stats: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@orders_bp.route('/delivery_status', methods=['GET'])
+@login_required # Protect this route
+def delivery_status():
+    """
+    Endpoint for the delivery status of order confirmation SMS on the route `/orders/delivery_status`.
+    Pass `order_id` or `customer_id`. Messages are returned newest first, paginated with `limit`/`cursor`
+    like `/orders/view_orders`; each carries its latest delivery report and the full report history.
+    """
+    order_id = request.args.get("order_id", type=int)
+    customer_id = request.args.get("customer_id", type=int)
+    if not order_id and not customer_id:
+        return jsonify({"error": "order_id or customer_id is required"}), 400
+    try:
+        limit = page_limit()
+        cursor = request.args.get("cursor")
+        if cursor:
+            (last_id,) = decode_cursor(cursor, 1)
+            last_id = int(last_id)
+    except (InvalidCursor, TypeError, ValueError) as e:
+        logger.warning(f"Invalid pagination parameters for delivery status: {e}")
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    try:
+        query = select(SmsOutbox).order_by(SmsOutbox.id.desc())
+        # Messages of archived orders are linked through archived_order_id instead of order_id
+        if order_id:
+            query = query.where(or_(SmsOutbox.order_id == order_id, SmsOutbox.archived_order_id == order_id))
+        else:
+            query = query.where(or_(
+                SmsOutbox.order_id.in_(select(Order.id).where(Order.customer_id == customer_id)),
+                SmsOutbox.archived_order_id.in_(select(OrderArchive.id).where(OrderArchive.customer_id == customer_id))
+            ))
+        if cursor:
+            query = query.where(SmsOutbox.id < last_id)
+        # Fetch one extra row to know whether another page exists
+        messages = db.session.execute(query.limit(limit + 1)).scalars().all()
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1].id)
+
+        # One query for the reports of the whole page, in arrival order
+        message_ids = {message.provider_message_id for message in messages if message.provider_message_id}
+        reports = {}
+        if message_ids:
+            for report in db.session.execute(
+                select(SmsDeliveryReport)
+                .where(SmsDeliveryReport.provider_message_id.in_(message_ids))
+                .order_by(SmsDeliveryReport.provider_message_id, SmsDeliveryReport.id)
+            ).scalars():
+                reports.setdefault(report.provider_message_id, []).append(report.to_dict())
+
+        results = []
+        for message in messages:
+            history = reports.get(message.provider_message_id, [])
+            results.append({
+                **message.to_dict(),
+                "delivery_status": history[-1]["status"] if history else None,
+                "failure_reason": history[-1]["failure_reason"] if history else None,
+                "reports": history
+            })
+        logger.info(f"Retrieved delivery status for {len(results)} messages (order_id: {order_id}, customer_id: {customer_id}).")
+        return jsonify({"messages": results, "next_cursor": next_cursor}), 200
+    except Exception as e:
+        logger.error(f"Error reading delivery status (order_id: {order_id}, customer_id: {customer_id}): {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
 @orders_bp.route('/update_orders/<int:id>', methods=['PUT'])
 @login_required # Protect this route
 def update_order(id):
     """
-    Endpoint for updating order details on the route `/orders/update_orders/<id>`
+    Endpoint for updating order details on the route `/orders/update_orders/<id>`.
+    Accepts `item` and/or `amount`, plus an optional `version`: the update then only applies if the order
+    is still at that version, otherwise 409. Runs as one UPDATE whose row count tells whether the order exists.
     """
-    try:
-        order = db.session.get(Order, id)
-        if not order:
-            logger.warning(f"Attempt to update non-existent order with ID: {id}")
-            return jsonify({"error": "Order not found"}), 404
-        data = request.json
+    data = request.json
 
-        # Check if any data is provided for update
-        if not data:
-            logger.warning(f"No update data provided for order ID: {id}")
-            return jsonify({"error": "No update data provided"}), 400
+    # Check if any data is provided for update
+    if not data or not isinstance(data, dict):
+        logger.warning(f"No update data provided for order ID: {id}")
+        return jsonify({"error": "No update data provided"}), 400
+    try:
+        values = order_changes(data)
+        version = optional_int(data.get("version"))
+    except ValueError as e:
+        logger.warning(f"Invalid update data for order ID {id}: {e}")
+        return jsonify({"error": str(e)}), 400
+    if not values:
+        logger.warning(f"No update data provided for order ID: {id}")
+        return jsonify({"error": "No update data provided"}), 400
 
-        order.item = data.get("item", order.item)
-        order.amount = data.get("amount", order.amount)
+    try:
+        criteria = [Order.id == id] if version is None else [Order.id == id, Order.version == version]
+        if not update_orders(criteria, values):
+            db.session.rollback()
+            return order_missing_or_stale(id, version, "update")
 
         db.session.commit()
         logger.info(f"Order with ID {id} updated successfully.")
@@ -131,18 +499,214 @@ def update_order(id):
 @login_required # Protect this route
 def delete_order(id):
     """
-    Endpoint for deleting an order on the route `/orders/delete_orders/<id>`
+    Endpoint for deleting an order on the route `/orders/delete_orders/<id>`.
+    With `?version=` the order is only deleted if it is still at that version, otherwise 409.
+    Runs as one DELETE whose row count tells whether the order existed.
     """
     try:
-        order = db.session.get(Order, id)
-        if not order:
-            logger.warning(f"Attempt to delete non-existent order with ID: {id}")
-            return jsonify({"error": "Order not found"}), 404
-        db.session.delete(order)
+        version = optional_int(request.args.get("version"))
+    except ValueError as e:
+        logger.warning(f"Invalid version for deleting order ID {id}: {e}")
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        criteria = [Order.id == id] if version is None else [Order.id == id, Order.version == version]
+        if not delete_orders(criteria):
+            db.session.rollback()
+            return order_missing_or_stale(id, version, "delete")
         db.session.commit()
         logger.info(f"Order with ID {id} deleted successfully.")
         return jsonify({"message": "Order deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error deleting order with ID {id}: {e}", exc_info=True)
-        return jsonify({"error": "An internal server error occurred"}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+def order_missing_or_stale(id, version, action):
+    """
+    The 404 or 409 response for a single-order write that matched no row; only a versioned write needs a lookup
+    """
+    if version is not None:
+        current = db.session.execute(select(Order.version).where(Order.id == id)).scalar_one_or_none()
+        if current is not None:
+            logger.warning(f"Order ID {id} is at version {current}, not {version}; {action} rejected.")
+            return jsonify({"error": "Order was changed by someone else", "version": current}), 409
+    logger.warning(f"Attempt to {action} non-existent order with ID: {id}")
+    return jsonify({"error": "Order not found"}), 404
+
+
+@orders_bp.route('/bulk', methods=['PATCH'])
+@login_required # Protect this route
+def update_orders_bulk():
+    """
+    Endpoint for updating many orders at once on the route `/orders/bulk`.
+    Accepts `{"set": {"item": ..., "amount": ...}}` plus the orders to update, given by exactly one of:
+
+    - `"ids": [1, 2, ...]`
+    - `"versions": {"1": 3, "2": 1, ...}`: ids with the version each was read at
+    - `"filter": {"customer_id": ..., "from": ..., "to": ...}`: any combination, times inclusive (ISO; a bare
+      `to` date covers that whole day)
+
+    Everything runs as one UPDATE (plus one rollup statement for a new amount) in a single transaction.
+    With `ids` or `versions` it is all or nothing: 404 if any order is missing, 409 (with the current versions)
+    if any has moved on. Archived orders are read-only and never matched. Returns the number of orders updated.
+    """
+    data = request.get_json(silent=True)
+    try:
+        if not isinstance(data, dict) or not isinstance(data.get("set"), dict):
+            raise ValueError("A 'set' object with the fields to change is required")
+        values = order_changes(data["set"])
+        if not values:
+            raise ValueError("'set' must change item and/or amount")
+        criteria, expected = bulk_selection(data)
+    except BulkSelectionTooLarge as e:
+        logger.warning(f"Bulk order update rejected: {e}")
+        return jsonify({"error": str(e)}), 413
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid bulk order update: {e}")
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        updated = update_orders(criteria, values)
+        if expected is not None and updated != len(expected):
+            db.session.rollback()
+            return bulk_missing_or_stale(expected, "update")
+        db.session.commit()
+        logger.info(f"Bulk order update: {updated} orders updated ({', '.join(values)}).")
+        return jsonify({"updated": updated}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating orders in bulk: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@orders_bp.route('/bulk', methods=['DELETE'])
+@login_required # Protect this route
+def delete_orders_bulk():
+    """
+    Endpoint for deleting many orders at once on the route `/orders/bulk`.
+    Takes the same `ids`, `versions` or `filter` as PATCH /orders/bulk, with the same all-or-nothing rules,
+    and runs as one DELETE (plus two rollup statements) in a single transaction.
+    Returns the number of orders deleted.
+    """
+    data = request.get_json(silent=True)
+    try:
+        if not isinstance(data, dict):
+            raise ValueError("One of 'ids', 'versions' or 'filter' is required")
+        criteria, expected = bulk_selection(data)
+    except BulkSelectionTooLarge as e:
+        logger.warning(f"Bulk order delete rejected: {e}")
+        return jsonify({"error": str(e)}), 413
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid bulk order delete: {e}")
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        deleted = delete_orders(criteria)
+        if expected is not None and deleted != len(expected):
+            db.session.rollback()
+            return bulk_missing_or_stale(expected, "delete")
+        db.session.commit()
+        logger.info(f"Bulk order delete: {deleted} orders deleted.")
+        return jsonify({"deleted": deleted}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting orders in bulk: {e}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+class BulkSelectionTooLarge(ValueError):
+    """
+    Raised when a bulk write names more orders than BULK_ORDERS_MAX
+    """
+
+
+def optional_int(value):
+    """
+    `value` as an int, or None if it was not given; raises ValueError for anything else
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("version must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("version must be an integer")
+
+
+def order_changes(data):
+    """
+    The column values an update body asks for (`item` and/or `amount`), validated; raises ValueError
+    """
+    values = {}
+    if "item" in data:
+        if not isinstance(data["item"], str) or not data["item"].strip():
+            raise ValueError("item must be a non-empty string")
+        values["item"] = data["item"]
+    if "amount" in data:
+        try:
+            amount = Decimal(str(data["amount"]))
+        except ArithmeticError:
+            amount = None
+        if amount is None or not amount.is_finite() or isinstance(data["amount"], bool):
+            raise ValueError("amount must be a number")
+        values["amount"] = amount
+    return values
+
+
+def bulk_selection(data):
+    """
+    (criteria, expected) for the orders a bulk write body selects. `expected` is the list of ids every one of
+    which must be written, or None for a filter. Raises ValueError for a malformed selection.
+    """
+    given = [key for key in ("ids", "versions", "filter") if key in data]
+    if len(given) != 1:
+        raise ValueError("Exactly one of 'ids', 'versions' or 'filter' is required")
+    max_rows = current_app.config.get("BULK_ORDERS_MAX", 5000)
+
+    if given[0] == "filter":
+        selection = data["filter"]
+        if not isinstance(selection, dict) or not selection.keys() & {"customer_id", "from", "to"}:
+            raise ValueError("'filter' needs at least one of customer_id, from, to")
+        criteria = []
+        if selection.get("customer_id") is not None:
+            criteria.append(Order.customer_id == int(selection["customer_id"]))
+        criteria.extend(time_range(Order.time, selection.get("from"), selection.get("to")))
+        if not criteria:
+            raise ValueError("'filter' needs at least one of customer_id, from, to")
+        return criteria, None
+
+    if given[0] == "ids":
+        if not isinstance(data["ids"], list) or not data["ids"]:
+            raise ValueError("'ids' must be a non-empty list of order ids")
+        ids = list(dict.fromkeys(int(order_id) for order_id in data["ids"]))
+        if len(ids) > max_rows:
+            raise BulkSelectionTooLarge(f"At most {max_rows} orders can be changed per request")
+        return [Order.id.in_(ids)], ids
+
+    if not isinstance(data["versions"], dict) or not data["versions"]:
+        raise ValueError("'versions' must map order ids to the versions they were read at")
+    versions = {int(order_id): optional_int(version) for order_id, version in data["versions"].items()}
+    if None in versions.values():
+        raise ValueError("version must be an integer")
+    if len(versions) > max_rows:
+        raise BulkSelectionTooLarge(f"At most {max_rows} orders can be changed per request")
+    return [tuple_(Order.id, Order.version).in_(list(versions.items()))], list(versions)
+
+
+def bulk_missing_or_stale(ids, action):
+    """
+    The 404 (some orders do not exist) or 409 (some have moved on) response for a bulk write that was rolled back
+    """
+    current = dict(db.session.execute(select(Order.id, Order.version).where(Order.id.in_(ids))).all())
+    missing = [order_id for order_id in ids if order_id not in current]
+    if missing:
+        logger.warning(f"Bulk order {action} rolled back: {len(missing)} orders not found.")
+        return jsonify({"error": "Orders not found", "ids": missing}), 404
+    logger.warning(f"Bulk order {action} rolled back: orders changed since they were read.")
+    return jsonify({
+        "error": "Orders were changed by someone else",
+        "versions": {str(order_id): version for order_id, version in current.items()}
+    }), 409
@@ -0,0 +1,52 @@
+from flask import request, current_app  # type: ignore
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a `cursor` query parameter cannot be decoded
+    """
+
+
+def encode_cursor(*values):
+    """
+    Encodes the seek key of the last row on a page into an opaque, URL-safe cursor
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    """
+    Decodes a cursor produced by `encode_cursor` back into its `size` seek values.
+    Raises InvalidCursor if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(f"Malformed cursor: {cursor}")
+    return values
+
+
+def wants_all():
+    """
+    True when the caller explicitly opted out of pagination with `?all=true`
+    """
+    return request.args.get("all", "").lower() in ("1", "true", "yes")
+
+
+def page_limit():
+    """
+    Reads the `limit` query parameter, clamped to the configured page size bounds.
+    Raises ValueError if `limit` is not a positive integer.
+    """
+    default = current_app.config.get("PAGE_SIZE_DEFAULT", 50)
+    maximum = current_app.config.get("PAGE_SIZE_MAX", 500)
+    limit = request.args.get("limit", default, type=int)
+    if limit is None or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, maximum)
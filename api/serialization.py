@@ -0,0 +1,49 @@
+from flask import request  # type: ignore
+from models import json_dict
+
+
+class InvalidRepresentation(ValueError):
+    """
+    Raised when the `fields` or `format` query parameter of a list endpoint is not valid
+    """
+
+
+def parse_representation(json_fields):
+    """
+    (fields, columnar) requested by the current list request.
+
+    `?fields=id,amount` picks the fields returned (default all of `json_fields`), which also lets
+    the endpoint select only those columns. `?format=columnar` asks for one array per field instead of one
+    object per record. Raises InvalidRepresentation for unknown fields or formats.
+    """
+    raw = request.args.get("fields")
+    if raw is None:
+        fields = list(json_fields)
+    else:
+        fields = list(dict.fromkeys(field.strip() for field in raw.split(",") if field.strip()))
+        unknown = [field for field in fields if field not in json_fields]
+        if unknown or not fields:
+            raise InvalidRepresentation(
+                f"Unknown fields: {', '.join(unknown) or raw!r} (choose from {', '.join(json_fields)})")
+
+    fmt = request.args.get("format", "rows").lower()
+    if fmt not in ("rows", "columnar"):
+        raise InvalidRepresentation(f"Unsupported format {fmt!r} (choose from rows, columnar)")
+    return fields, fmt == "columnar"
+
+
+def selected_columns(model, fields, *required):
+    """
+    Model columns to SELECT for `fields`, plus the `required` ones the endpoint itself needs (e.g. for its cursor)
+    """
+    return [getattr(model, name) for name in dict.fromkeys([*fields, *required])]
+
+
+def render(records, json_fields, fields, columnar=False):
+    """
+    `records` as a list of dicts, or with `columnar` as {field: [value per record]}, which leaves out the
+    repeated keys and is much smaller on large lists
+    """
+    if columnar:
+        return {field: [json_fields[field](record) for record in records] for field in fields}
+    return [json_dict(record, json_fields, fields) for record in records]
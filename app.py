@@ -3,173 +3,301 @@ from config import Config
 from models import db, Customer, Order # Import Customer and Order models
 from api.customers import customers_bp
 from api.orders import orders_bp
-from services.database_service import create_database
+from api.internal import internal_bp
+from services.database_service import create_database, create_database_command, explain_queries_command
+from services.sms_outbox import sms_worker_command
+from services.order_archive import archive_orders_command
+from services.order_rollup import rebuild_rollup_command
+from services.delivery_reports import DeliveryReportBuffer, report_values
+from services.sms_orders import SmsOrderPipeline, inbound_values
+from services.db_pool import enforce_foreign_keys, instrument_engine, pool_engine_options
+from services.customer_cache import CustomerCache, customer_cache
+from services.customer_search import CustomerSearchIndex
+from services.table_versions import register_version_tracking
+from services.metrics import init_metrics
+from services.json_provider import FastJSONProvider
+from services.compression import compress_static_command, init_compression
+from services.structured_logging import AsyncQueueHandler, build_log_handler, register_request_ids
 from authlib.integrations.flask_client import OAuth # type: ignore
+from flask_migrate import Migrate # type: ignore
 from datetime import timedelta
 from dotenv import load_dotenv
 from auth.auth_routes import create_auth_blueprint
+from auth.session_store import ServerSideSessionInterface
 from auth.auth_middleware import login_required # Ensure login_required is imported
-import os
+import hmac
 import logging
-from logging.handlers import RotatingFileHandler
 
 # dotenv setup
 load_dotenv()
 
-app = Flask(__name__)
-app.config.from_object(Config)
-
-app.secret_key = os.getenv("APP_SECRET_KEY")
-app.config['SESSION_COOKIE_NAME'] = 'google-login-session'
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
-
-# Configure logging
-if not app.debug:
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/make-an-order.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('Make-An-Order startup')
-else:
-    # For debug mode, log to console
-    logging.basicConfig(level=logging.DEBUG)
-
-
-# Create the database if it doesn't exist (only for local dev, skipped for prod DB)
-create_database()
-
-# Initialize the database
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-# OAuth Setup
-oauth = OAuth(app)
-google = oauth.register(
-    name='google',
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    access_token_url='https://accounts.google.com/o/oauth2/token',
-    authorize_url='https://accounts.google.com/o/oauth2/auth',
-    api_base_url='https://www.googleapis.com/oauth2/v1/',
-    userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',
-    client_kwargs={'scope': 'email profile'},
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration'
-)
-
-# Register the endpoint blueprints
-app.register_blueprint(customers_bp, url_prefix='/customers')
-app.register_blueprint(orders_bp, url_prefix='/orders')
-app.register_blueprint(create_auth_blueprint(oauth))
-
-
-# --- Frontend Routes ---
-@app.route('/')
-def index():
-    if 'profile' in session:
-        return redirect(url_for('dashboard')) # Redirect to dashboard if logged in
-    return render_template('index.html') # Landing page with login button
-
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    user_email = session['profile']['email'] if 'profile' in session else 'Guest'
-    return render_template('dashboard.html', user_email=user_email)
-
-@app.route('/customers-ui')
-@login_required
-def customers_page():
-    user_email = session['profile']['email'] if 'profile' in session else 'Guest'
-    return render_template('customers.html', user_email=user_email)
-
-@app.route('/orders-ui')
-@login_required
-def orders_page():
-    user_email = session['profile']['email'] if 'profile' in session else 'Guest'
-    return render_template('orders.html', user_email=user_email)
-
-# --- Customer Detail/Edit Pages ---
-@app.route('/customers/<int:customer_id>')
-@login_required
-def customer_detail_page(customer_id):
-    customer = db.session.get(Customer, customer_id)
-    if not customer:
-        return render_template('404.html', message="Customer not found"), 404
-    user_email = session['profile']['email'] if 'profile' in session else 'Guest'
-    return render_template('customer_detail.html', customer=customer, user_email=user_email)
-
-@app.route('/customers/<int:customer_id>/edit')
-@login_required
-def customer_edit_page(customer_id):
-    customer = db.session.get(Customer, customer_id)
-    if not customer:
-        return render_template('404.html', message="Customer not found"), 404
-    user_email = session['profile']['email'] if 'profile' in session else 'Guest'
-    return render_template('customer_edit.html', customer=customer, user_email=user_email)
-
-# --- Order Edit Page ---
-@app.route('/orders/<int:order_id>/edit')
-@login_required
-def order_edit_page(order_id):
-    order = db.session.get(Order, order_id)
-    if not order:
-        return render_template('404.html', message="Order not found"), 404
-    user_email = session['profile']['email'] if 'profile' in session else 'Guest'
-    return render_template('order_edit.html', order=order, user_email=user_email)
-
-
-# --- Centralized Error Handlers ---
-@app.errorhandler(400)
-def bad_request_error(error):
-    app.logger.error(f"Bad Request: {request.url} - {str(error)}")
-    return jsonify({"error": "Bad Request", "message": str(error)}), 400
-
-@app.errorhandler(401)
-def unauthorized_error(error):
-    app.logger.warning(f"Unauthorized Access: {request.url}")
-    return jsonify({"error": "Unauthorized", "message": "Authentication required or invalid credentials"}), 401
-
-@app.errorhandler(404)
-def not_found_error(error):
-    app.logger.warning(f"Not Found: {request.url}")
-    # Render a more user-friendly 404 page for UI
-    return render_template('404.html', message="The page you are looking for does not exist."), 404
-
-@app.errorhandler(500)
-def internal_server_error(error):
-    app.logger.exception(f"Internal Server Error: {request.url}") # Logs traceback
-    return jsonify({"error": "Internal Server Error", "message": "An unexpected error occurred."}), 500
-
-
-# Route to handle incoming messages
-@app.route('/incoming-messages', methods=['POST'])
-def incoming_messages():
+migrate = Migrate()
+
+
+def create_app(config=Config):
     """
-    This route handles incoming messages sent to your shortcode.
-    Africa's Talking will send POST requests to this URL.
+    Application factory: builds a configured Flask app from `config` (a class or object with settings).
+
+    Creating the app does no I/O. The database server is only contacted by the first query (or by
+    `flask create-db`), and the Africa's Talking client is initialised on first send, so a worker
+    started from a preloaded app does not inherit open connections.
     """
-    data = request.get_json(force=True)  # Get the incoming message data
-    app.logger.info(f'Incoming message: {data}') # Use app.logger
+    app = Flask(__name__)
+    app.config.from_object(config)
+    if app.config['JSON_FAST_ENCODER']:
+        app.json = FastJSONProvider(app)
+
+    app.secret_key = app.config.get("SECRET_KEY")
+    app.config['SESSION_COOKIE_NAME'] = 'google-login-session'
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
+    app.session_interface = ServerSideSessionInterface.from_config(app.config)
+
+    configure_logging(app)
+
+    # Initialize the database; the schema is managed by migrations (`flask db upgrade`)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_engine_options(app.config)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    register_version_tracking(db.session) # Feeds the ETags of the list/detail endpoints
+    with app.app_context():
+        # Creating the engine does not connect; the listeners feed GET /internal/pool
+        app.extensions['pool_stats'] = instrument_engine(db.engine)
+        enforce_foreign_keys(db.engine) # Customer deletes rely on the database cascading to orders
+    init_metrics(app) # Request latency, status and SQL counts per endpoint, served on /metrics
+    init_compression(app) # gzip/brotli for large text responses, precompressed static assets
+    app.extensions['customer_cache'] = CustomerCache.from_config(app.config)
+    app.extensions['customer_search'] = CustomerSearchIndex.from_config(app.config) if app.config['CUSTOMER_SEARCH_INDEX'] else None
+    app.extensions['delivery_reports'] = DeliveryReportBuffer(
+        app,
+        batch_size=app.config['DELIVERY_REPORT_BATCH_SIZE'],
+        flush_interval=app.config['DELIVERY_REPORT_FLUSH_SECONDS'],
+        max_pending=app.config['DELIVERY_REPORT_BUFFER_MAX'],
+        max_attempts=app.config['DELIVERY_REPORT_MAX_ATTEMPTS']
+    )
+    app.extensions['sms_orders'] = SmsOrderPipeline(
+        app,
+        workers=app.config['SMS_ORDER_WORKERS'],
+        batch_size=app.config['SMS_ORDER_BATCH_SIZE'],
+        max_pending=app.config['SMS_ORDER_QUEUE_MAX']
+    )
+    if app.config['AUTO_CREATE_TABLES']:
+        # Local convenience only; never enabled in production
+        with app.app_context():
+            db.create_all()
+
+    # OAuth Setup; client metadata is fetched lazily on first login
+    oauth = OAuth(app)
+    oauth.register(
+        name='google',
+        client_id=app.config.get("GOOGLE_CLIENT_ID"),
+        client_secret=app.config.get("GOOGLE_CLIENT_SECRET"),
+        access_token_url='https://accounts.google.com/o/oauth2/token',
+        authorize_url='https://accounts.google.com/o/oauth2/auth',
+        api_base_url='https://www.googleapis.com/oauth2/v1/',
+        userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',
+        client_kwargs={'scope': 'email profile'},
+        server_metadata_url='https://accounts.google.com/.well-known/openid-configuration'
+    )
+
+    # Register the endpoint blueprints
+    app.register_blueprint(customers_bp, url_prefix='/customers')
+    app.register_blueprint(orders_bp, url_prefix='/orders')
+    app.register_blueprint(internal_bp, url_prefix='/internal')
+    app.register_blueprint(create_auth_blueprint(oauth))
+
+    register_frontend_routes(app)
+    register_error_handlers(app)
+    register_webhooks(app)
+
+    # Register CLI commands (run with `flask --app app <command>`)
+    app.cli.add_command(create_database_command)
+    app.cli.add_command(sms_worker_command)
+    app.cli.add_command(explain_queries_command)
+    app.cli.add_command(rebuild_rollup_command)
+    app.cli.add_command(archive_orders_command)
+    app.cli.add_command(compress_static_command)
 
-    # Handle the incoming message here if needed, e.g., respond to the user or log it
-    return Response(status=200)  # Return 200 OK to acknowledge receipt
+    return app
 
-# Route to handle delivery reports
-@app.route('/delivery-reports', methods=['POST'])
-def delivery_reports():
+
+def configure_logging(app):
+    """
+    Sends app and module logs through a queue to a rotating file (or stdout), as JSON lines with request ids,
+    or to the console in debug mode
+    """
+    register_request_ids(app)
+    if not app.debug:
+        # The root logger is shared by every app instance, so only attach the queued handler once
+        root = logging.getLogger()
+        if any(isinstance(handler, AsyncQueueHandler) for handler in root.handlers):
+            return
+        root.addHandler(build_log_handler(app.config))
+        root.setLevel(app.config.get("LOG_LEVEL", "INFO"))
+        app.logger.info('Make-An-Order startup')
+    else:
+        # For debug mode, log to console
+        logging.basicConfig(level=logging.DEBUG)
+
+
+def register_frontend_routes(app):
     """
-    This route handles the delivery reports for messages sent.
-    Africa's Talking will send POST requests with delivery status updates.
+    Registers the Jinja pages of the web interface
     """
-    data = request.get_json(force=True)
-    app.logger.info(f'Delivery report: {data}') # Use app.logger
+    # --- Frontend Routes ---
+    @app.route('/')
+    def index():
+        if 'profile' in session:
+            return redirect(url_for('dashboard')) # Redirect to dashboard if logged in
+        return render_template('index.html') # Landing page with login button
+
+    @app.route('/dashboard')
+    @login_required
+    def dashboard():
+        user_email = session['profile']['email'] if 'profile' in session else 'Guest'
+        return render_template('dashboard.html', user_email=user_email)
+
+    @app.route('/customers-ui')
+    @login_required
+    def customers_page():
+        user_email = session['profile']['email'] if 'profile' in session else 'Guest'
+        return render_template('customers.html', user_email=user_email)
+
+    @app.route('/orders-ui')
+    @login_required
+    def orders_page():
+        user_email = session['profile']['email'] if 'profile' in session else 'Guest'
+        return render_template('orders.html', user_email=user_email)
+
+    # --- Customer Detail/Edit Pages ---
+    @app.route('/customers/<int:customer_id>')
+    @login_required
+    def customer_detail_page(customer_id):
+        customer = customer_cache().get_by_id(customer_id)
+        if not customer:
+            return render_template('404.html', message="Customer not found"), 404
+        user_email = session['profile']['email'] if 'profile' in session else 'Guest'
+        return render_template('customer_detail.html', customer=customer, user_email=user_email)
+
+    @app.route('/customers/<int:customer_id>/edit')
+    @login_required
+    def customer_edit_page(customer_id):
+        customer = customer_cache().get_by_id(customer_id)
+        if not customer:
+            return render_template('404.html', message="Customer not found"), 404
+        user_email = session['profile']['email'] if 'profile' in session else 'Guest'
+        return render_template('customer_edit.html', customer=customer, user_email=user_email)
+
+    # --- Order Edit Page ---
+    @app.route('/orders/<int:order_id>/edit')
+    @login_required
+    def order_edit_page(order_id):
+        order = db.session.get(Order, order_id)
+        if not order:
+            return render_template('404.html', message="Order not found"), 404
+        user_email = session['profile']['email'] if 'profile' in session else 'Guest'
+        return render_template('order_edit.html', order=order, user_email=user_email)
+
+
+def register_error_handlers(app):
+    """
+    Registers the centralized JSON/HTML error handlers
+    """
+    # --- Centralized Error Handlers ---
+    @app.errorhandler(400)
+    def bad_request_error(error):
+        app.logger.error(f"Bad Request: {request.url} - {str(error)}")
+        return jsonify({"error": "Bad Request", "message": str(error)}), 400
+
+    @app.errorhandler(401)
+    def unauthorized_error(error):
+        app.logger.warning(f"Unauthorized Access: {request.url}")
+        return jsonify({"error": "Unauthorized", "message": "Authentication required or invalid credentials"}), 401
+
+    @app.errorhandler(404)
+    def not_found_error(error):
+        app.logger.warning(f"Not Found: {request.url}")
+        # Render a more user-friendly 404 page for UI
+        return render_template('404.html', message="The page you are looking for does not exist."), 404
+
+    @app.errorhandler(500)
+    def internal_server_error(error):
+        app.logger.exception(f"Internal Server Error: {request.url}") # Logs traceback
+        return jsonify({"error": "Internal Server Error", "message": "An unexpected error occurred."}), 500
+
+
+def register_webhooks(app):
+    """
+    Registers the routes Africa's Talking calls back.
+    Both place orders or write rows, so each post must carry AT_WEBHOOK_TOKEN (see `webhook_forbidden`).
+    """
+    def webhook_forbidden():
+        """
+        A 403 response unless the post carries the configured token as `?token=` or an `X-Webhook-Token` header
+        """
+        expected = app.config.get("AT_WEBHOOK_TOKEN")
+        if not expected:
+            app.logger.error(f'AT_WEBHOOK_TOKEN is not set; refusing the callback to {request.path}.')
+            return Response(status=403)
+        supplied = request.args.get("token") or request.headers.get("X-Webhook-Token") or ""
+        if not hmac.compare_digest(supplied.encode(), expected.encode()):
+            app.logger.warning(f'Callback to {request.path} from {request.remote_addr} without a valid token.')
+            return Response(status=403)
+        return None
+
+    # Route to handle incoming messages
+    @app.route('/incoming-messages', methods=['POST'])
+    def incoming_messages():
+        """
+        This route handles incoming messages sent to your shortcode.
+        Africa's Talking will send POST requests to this URL.
+        Customers order by texting "ORDER <code> <item> <amount>"; messages are queued and turned into
+        orders by the SMS order workers, so the provider gets its 200 straight away.
+        """
+        forbidden = webhook_forbidden()
+        if forbidden:
+            return forbidden
+        # Africa's Talking posts form fields; JSON is accepted too
+        data = request.form.to_dict() or request.get_json(silent=True) or {}
+        values = inbound_values(data)
+        if values is None:
+            app.logger.warning(f'Malformed incoming message: {data}')
+            return Response(status=400)
+        app.logger.debug(f'Incoming message: {data}')
+
+        if not app.extensions['sms_orders'].submit(values):
+            app.logger.error('SMS order queue is full; asking the provider to retry.')
+            return Response(status=503)
+        return Response(status=200)  # Return 200 OK to acknowledge receipt
+
+    # Route to handle delivery reports
+    @app.route('/delivery-reports', methods=['POST'])
+    def delivery_reports():
+        """
+        This route handles the delivery reports for messages sent.
+        Africa's Talking will send POST requests with delivery status updates.
+        Reports are buffered and stored in batches, so the provider gets its 200 without waiting on the database.
+        """
+        forbidden = webhook_forbidden()
+        if forbidden:
+            return forbidden
+        # Africa's Talking posts form fields; JSON is accepted too
+        data = request.form.to_dict() or request.get_json(silent=True) or {}
+        values = report_values(data)
+        if values is None:
+            app.logger.warning(f'Malformed delivery report: {data}')
+            return Response(status=400)
+        app.logger.debug(f'Delivery report: {data}')
+
+        if not app.extensions['delivery_reports'].add(values):
+            app.logger.error('Delivery report buffer is full; asking the provider to retry.')
+            return Response(status=503)
+        return Response(status=200)  # Return 200 OK to acknowledge receipt
+
 
-    # Handle the delivery report here, e.g., log the delivery status or update the database
-    return Response(status=200)  # Return 200 OK to acknowledge receipt
+# Module-level app for `gunicorn app:app`, `flask --app app` and the tests
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    # Create the database if it doesn't exist (only for local dev, skipped for prod DB)
+    create_database()
+    app.run(debug=True, port=5001)
@@ -32,7 +32,8 @@ def create_auth_blueprint(oauth):
             token = google_client.authorize_access_token()
             user_info = google_client.get('userinfo').json()
 
-            # Store user info and access token in the session
+            # Store user info and access token in the server-side session, under a fresh session id
+            session.regenerate()
             session['profile'] = user_info
             session['access_token'] = token['access_token']
             session.permanent = True
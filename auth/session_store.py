@@ -0,0 +1,254 @@
+from flask.sessions import SessionInterface, SessionMixin  # type: ignore
+from flask.json.tag import TaggedJSONSerializer  # type: ignore
+from werkzeug.datastructures import CallbackDict  # type: ignore
+from models import db, StoredSession, TableVersion, SESSION_REVOCATIONS
+from services.customer_cache import LRUCache
+from sqlalchemy import delete, insert, select, update
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VALID_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{32}$")
+
+
+def new_session_id():
+    return secrets.token_urlsafe(24) # 32 characters, 192 random bits
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """
+    Session whose data lives on the server; only `sid` travels in the cookie
+    """
+    def __init__(self, initial=None, sid=None, expires_at=0.0, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid or new_session_id()
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+        self.stale_cookie = False # The request sent an id that no longer resolves
+
+    def regenerate(self):
+        """
+        Moves the data to a fresh id (call on login, so an id planted before authentication is worthless)
+        """
+        self.previous_sid = self.previous_sid or (None if self.new else self.sid)
+        self.sid = new_session_id()
+        self.modified = True
+
+
+class DatabaseSessionBackend:
+    """
+    Session rows in the app database's `sessions` table, shared by every worker on every dyno and kept
+    across restarts. Each call uses its own short transaction, apart from the request's `db.session`.
+    """
+    def get(self, sid):
+        """
+        Returns (serialized data, expires_at) of a live session, or None
+        """
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(StoredSession.data, StoredSession.expires_at)
+                .where(StoredSession.sid == sid, StoredSession.expires_at > time.time())
+            ).first()
+        return tuple(row) if row else None
+
+    def set(self, sid, data, expires_at):
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                update(StoredSession).where(StoredSession.sid == sid).values(data=data, expires_at=expires_at)
+            ).rowcount
+            if not updated:
+                connection.execute(insert(StoredSession).values(sid=sid, data=data, expires_at=expires_at))
+
+    def delete(self, sid):
+        with db.engine.begin() as connection:
+            connection.execute(delete(StoredSession).where(StoredSession.sid == sid))
+            connection.execute(
+                update(TableVersion).where(TableVersion.table_name == SESSION_REVOCATIONS)
+                .values(version=TableVersion.version + 1)
+            )
+
+    def sweep(self):
+        """
+        Deletes expired sessions and returns how many there were
+        """
+        with db.engine.begin() as connection:
+            return connection.execute(delete(StoredSession).where(StoredSession.expires_at <= time.time())).rowcount
+
+    def revision(self):
+        """
+        How many sessions have been deleted so far; changes whenever one is
+        """
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(TableVersion.version).where(TableVersion.table_name == SESSION_REVOCATIONS)
+            ).scalar() or 0
+
+
+class SQLiteSessionBackend:
+    """
+    Session rows in a local SQLite file, shared by every gunicorn worker on the host.
+    The file must be on a disk that outlives the process; sessions are lost with it.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS revocations (id INTEGER PRIMARY KEY, count INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO revocations (id, count) VALUES (1, 0)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, sid):
+        """
+        Returns (serialized data, expires_at) of a live session, or None
+        """
+        row = self._connection().execute(
+            "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, sid, data, expires_at):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)", (sid, data, expires_at)
+        )
+
+    def delete(self, sid):
+        connection = self._connection()
+        connection.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        # Counted after the delete, so a worker that sees the new count no longer finds the row
+        connection.execute("UPDATE revocations SET count = count + 1 WHERE id = 1")
+
+    def sweep(self):
+        """
+        Deletes expired sessions and returns how many there were
+        """
+        return self._connection().execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def revision(self):
+        """
+        How many sessions have been deleted so far; changes whenever one is
+        """
+        return self._connection().execute("SELECT count FROM revocations WHERE id = 1").fetchone()[0]
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keeps session data in `backend` behind a bounded in-process cache, so the cookie only carries a
+    32-character id and most requests resolve their session from memory instead of reading its row.
+
+    `backend` is a DatabaseSessionBackend, a SQLiteSessionBackend, or any object with the same `get`,
+    `set`, `delete`, `sweep` and `revision` methods. Every cached copy is tagged with the backend's
+    revision when it was read. Deleting a session (logout, or the old id at login) changes the revision,
+    so every worker stops trusting the copies it cached before and reads the backend again: a logged-out
+    session is rejected everywhere on the next request. Checking the revision costs one small read per
+    request. Other changes made by another worker can look unchanged here for up to `cache_ttl` seconds.
+
+    A session expires PERMANENT_SESSION_LIFETIME after it was last written. An unchanged session is
+    written again (extending it) once half of that has passed, not on every request. Expired rows are
+    swept every `sweep_interval` seconds.
+    """
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend, cache_entries=10000, cache_ttl=30, sweep_interval=3600):
+        self.backend = backend
+        self.cache = LRUCache(cache_entries, cache_ttl)
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        path = config.get("SESSION_STORE_PATH")
+        return cls(
+            SQLiteSessionBackend(path) if path else DatabaseSessionBackend(),
+            cache_entries=config.get("SESSION_CACHE_MAX_ENTRIES", 10000),
+            cache_ttl=config.get("SESSION_CACHE_TTL_SECONDS", 30),
+            sweep_interval=config.get("SESSION_SWEEP_SECONDS", 3600)
+        )
+
+    def load(self, sid):
+        """
+        (serialized data, expires_at) for `sid` from the cache, else from the backend; None if there is none
+        """
+        revision = self.backend.revision()
+        cached = self.cache.get(sid)
+        if cached is not None and cached[0] == revision:
+            stored = cached[1]
+        else:
+            stored = self.backend.get(sid)
+            if stored is not None:
+                self.cache.set(sid, (revision, stored))
+        if stored is None or stored[1] <= time.time():
+            return None
+        return stored
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSession(new=True)
+        stored = self.load(sid) if VALID_SESSION_ID.match(sid) else None
+        if stored is None:
+            session = ServerSession(new=True)
+            session.stale_cookie = True
+            return session
+        return ServerSession(self.serializer.loads(stored[0]), sid=sid, expires_at=stored[1])
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.previous_sid:
+            self._forget(session.previous_sid)
+
+        if not session:
+            if not session.new:
+                self._forget(session.sid) # Emptied, e.g. by logout
+            if not session.new or session.stale_cookie:
+                response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app), httponly=self.get_cookie_httponly(app))
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        if not session.modified and session.expires_at - now > lifetime / 2:
+            return # Unchanged and not yet due for extension
+
+        expires_at = now + lifetime
+        data = self.serializer.dumps(dict(session))
+        revision = self.backend.revision() # Read first: a deletion after it must still invalidate this copy
+        self.backend.set(session.sid, data, expires_at)
+        self.cache.set(session.sid, (revision, (data, expires_at)))
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path, secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app)
+        )
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            swept = self.backend.sweep()
+            if swept:
+                logger.info(f"Swept {swept} expired sessions.")
+
+    def _forget(self, sid):
+        self.backend.delete(sid)
+        self.cache.delete(sid)
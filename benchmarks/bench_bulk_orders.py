@@ -0,0 +1,58 @@
+"""
+Compares order ingestion throughput of POST /orders/place_order (one request per order)
+with POST /orders/bulk (one request for all orders).
+
+Runs against whatever database the app is configured for, e.g.:
+
+    JAWSDB_URL=sqlite:///bench.db python -m benchmarks.bench_bulk_orders --orders 2000
+"""
+from app import app, db
+from models import Customer
+import argparse
+import json
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1000, help="Orders to place with each method")
+    args = parser.parse_args()
+
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        customer = Customer(name="Bench", phone_number="+254700999999", code="BENCH-BULK")
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = customer.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'bench@example.com'}
+
+    orders = [{"customer_id": customer_id, "item": f"Item {i}", "amount": 10.0 + i % 100} for i in range(args.orders)]
+
+    start = time.perf_counter()
+    for order in orders:
+        assert client.post("/orders/place_order", json=order).status_code == 201
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert client.post("/orders/bulk", json={"orders": orders}).status_code == 201
+    bulk_seconds = time.perf_counter() - start
+
+    with app.app_context():
+        db.session.delete(db.session.get(Customer, customer_id))
+        db.session.commit()
+
+    print(json.dumps({
+        "orders": args.orders,
+        "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+        "single": {"seconds": round(single_seconds, 3), "orders_per_sec": round(args.orders / single_seconds, 1)},
+        "bulk": {"seconds": round(bulk_seconds, 3), "orders_per_sec": round(args.orders / bulk_seconds, 1)},
+        "speedup": round(single_seconds / bulk_seconds, 1)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
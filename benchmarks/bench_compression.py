@@ -0,0 +1,108 @@
+"""
+Measures what response compression saves on the wire and costs in CPU: the JSON of GET /orders/view_orders?all=true
+(rows and columnar), the NDJSON order export (compressed as a stream) and static/style.css, each at several
+gzip levels and brotli qualities. Transfer times assume a `--mbps` mobile link, e.g.:
+
+    python -m benchmarks.bench_compression --orders 20000 --mbps 2
+"""
+from app import create_app
+from config import Config
+from models import db, Customer, Order
+from services import compression
+from services.compression import ResponseCompressor, _compress_stream
+from sqlalchemy import insert
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def seed(orders, customers=200):
+    db.create_all()
+    db.session.execute(insert(Customer), [
+        {"name": f"Customer {i}", "phone_number": f"+2547{i:08d}", "code": f"BENCH{i}"} for i in range(customers)
+    ])
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(Order), [
+        {"customer_id": i % customers + 1, "item": f"Item {i % 500}", "amount": round(5 + (i % 9973) / 7, 2),
+         "time": start + timedelta(seconds=i)}
+        for i in range(orders)
+    ])
+    db.session.commit()
+
+
+def settings():
+    variants = [("identity", None, None)]
+    variants += [(f"gzip-{level}", "gzip", level) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        variants += [(f"br-{quality}", "br", quality) for quality in (1, 4, 11)]
+    return variants
+
+
+def measure(body, chunks, mbps, repeat=3):
+    results = {}
+    for name, coding, level in settings():
+        if coding is None:
+            size, cpu = len(body), 0.0
+        else:
+            compressor = ResponseCompressor(gzip_level=level or 6, brotli_quality=level or 4)
+            started = time.process_time()
+            for _ in range(repeat):
+                if chunks is None:
+                    size = len(compressor.compress(coding, body))
+                else:
+                    size = sum(len(part) for part in _compress_stream(iter(chunks), compressor.stream(coding)))
+            cpu = (time.process_time() - started) / repeat
+        results[name] = {
+            "bytes": size,
+            "ratio": round(len(body) / size, 2),
+            "cpu_ms": round(cpu * 1000, 2),
+            "transfer_ms": round(size * 8 / (mbps * 1e6) * 1000, 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20000, help="Orders in the table")
+    parser.add_argument("--mbps", type=float, default=2.0, help="Link speed used for the transfer estimate")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            LOG_FILE = os.path.join(directory, "app.log")
+            COMPRESS_RESPONSES = False # Bodies are compressed below, once per setting
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            seed(args.orders)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['profile'] = {'email': 'bench@example.com'}
+
+        rows = client.get("/orders/view_orders?all=true").get_data()
+        columnar = client.get("/orders/view_orders?all=true&format=columnar").get_data()
+        export = client.get("/orders/export?format=ndjson")
+        export_chunks = [bytes(chunk) for chunk in export.response]
+        with open(os.path.join(app.static_folder, "style.css"), "rb") as css:
+            stylesheet = css.read()
+
+    print(json.dumps({
+        "orders": args.orders,
+        "mbps": args.mbps,
+        "brotli": compression.brotli is not None,
+        "bodies": {
+            "view_orders_all": measure(rows, None, args.mbps),
+            "view_orders_all_columnar": measure(columnar, None, args.mbps),
+            "export_ndjson_streamed": measure(b"".join(export_chunks), export_chunks, args.mbps),
+            "static_style_css": measure(stylesheet, None, args.mbps),
+        }
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
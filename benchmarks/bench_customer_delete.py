@@ -0,0 +1,118 @@
+"""
+Measures deleting customers with large order histories: the ORM-loaded cascade the app used before (every order
+loaded into the session, then deleted by primary key) against DELETE /customers/delete_customers/<id>, where the
+database cascades the single DELETE to the orders. Reports the median time, the SQL statements run (an executemany
+counts once) and the peak Python memory per delete, e.g.:
+
+    python -m benchmarks.bench_customer_delete --orders-per-customer 50000 --repeat 3
+    python -m benchmarks.bench_customer_delete --database-url mysql+pymysql://user:pw@localhost/orders_bench
+
+The target database is dropped and recreated; never point it at real data.
+"""
+from app import create_app
+from config import Config
+from models import db, Customer, Order
+from services.order_rollup import rebuild_rollup
+from services.query_budget import count_queries
+from sqlalchemy import insert
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+SEED_CHUNK = 10000
+
+
+def seed(customers, orders_per_customer):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Customer), [
+        {"name": f"Wholesale {i}", "phone_number": f"+2547{i:08d}", "code": f"BULK{i}"} for i in range(customers)
+    ])
+    start = datetime(2024, 1, 1)
+    rows = ({"customer_id": c + 1, "item": f"Item {i % 500}", "amount": 5 + i % 100, "time": start + timedelta(minutes=i)}
+            for c in range(customers) for i in range(orders_per_customer))
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == SEED_CHUNK:
+            db.session.execute(insert(Order), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(Order), chunk)
+    db.session.commit()
+    rebuild_rollup()
+
+
+def orm_loaded_delete(customer_id):
+    # The delete before passive deletes: the cascade loads every order, then deletes them one by one
+    customer = db.session.get(Customer, customer_id)
+    customer.orders # Loads the collection, as the non-passive cascade did
+    db.session.delete(customer)
+    db.session.commit()
+
+
+def measure(delete, customer_ids):
+    timings, statements, peaks = [], [], []
+    for customer_id in customer_ids:
+        tracemalloc.start()
+        start = time.perf_counter()
+        with count_queries() as queries:
+            delete(customer_id)
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        statements.append(queries.count)
+    return {
+        "ms_per_delete": round(statistics.median(timings) * 1000, 1),
+        "statements": max(statements),
+        "peak_python_mb": round(max(peaks) / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders-per-customer", type=int, default=50000, help="Orders of each deleted customer")
+    parser.add_argument("--repeat", type=int, default=3, help="Customers deleted per variant (the median is reported)")
+    parser.add_argument("--database-url", help="Database to run against (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            LOG_FILE = os.path.join(directory, "app.log")
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['profile'] = {'email': 'bench@example.com'}
+
+        def route_delete(customer_id):
+            response = client.delete(f"/customers/delete_customers/{customer_id}")
+            assert response.status_code == 200, response.status_code
+
+        with app.app_context():
+            seed(2 * args.repeat, args.orders_per_customer)
+            before = measure(orm_loaded_delete, range(1, args.repeat + 1))
+            after = measure(route_delete, range(args.repeat + 1, 2 * args.repeat + 1))
+            remaining = Order.query.count()
+
+    print(json.dumps({
+        "orders_per_customer": args.orders_per_customer,
+        "database": "sqlite" if not args.database_url else args.database_url.split(":")[0],
+        "orders_left": remaining,
+        "variants": {
+            "before: orm-loaded cascade": before,
+            "database cascade (DELETE /customers/delete_customers/<id>)": after,
+        },
+        "speedup": round(before["ms_per_delete"] / after["ms_per_delete"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Load test for the order and customer APIs: seeds a database, then drives each endpoint with concurrent
+clients and reports latency percentiles and throughput as JSON, so runs on two commits can be compared.
+
+Each client is a thread with its own logged-in Flask test client, so requests go through the whole WSGI app
+(routing, sessions, ORM, database) without a network hop. While the load runs, the SMS outbox worker sends
+confirmations through a local fake provider with `--sms-latency` per call.
+
+    python -m benchmarks.bench_load --customers 2000 --orders-per-customer 20 --clients 8 --requests 500
+    python -m benchmarks.bench_load --output before.json
+    python -m benchmarks.bench_load --baseline before.json    # adds the change against an earlier run
+    python -m benchmarks.bench_load --database-url mysql+pymysql://user:pw@localhost/orders_bench
+
+The target database is dropped and recreated; never point it at real data.
+"""
+from app import create_app
+from config import Config
+from models import db, Customer, Order, SmsOutbox
+from services.order_rollup import rebuild_rollup
+from services.sms_outbox import run_worker
+from services.fake_sms import FakeSMS
+from sqlalchemy import func, insert, select
+from datetime import datetime, timedelta
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+
+SCENARIOS = ("place_order", "view_orders", "view_customers", "update_order", "delete_customer")
+SEED_CHUNK = 1000
+
+
+def build_app(database_url, clients):
+    class LoadConfig(Config):
+        TESTING = True
+        SECRET_KEY = "bench"
+        SQLALCHEMY_DATABASE_URI = database_url
+        DB_POOL_SIZE = clients + 2 # Clients plus the SMS worker never wait on the pool
+        DB_MAX_OVERFLOW = 0
+        SMS_OUTBOX_POLL_SECONDS = 0.2
+
+    return create_app(LoadConfig)
+
+
+def seed(app, customers, orders_per_customer, disposable, rng):
+    """
+    Recreates the schema and inserts `customers` customers with `orders_per_customer` orders each, spread
+    over the last year. The last `disposable` customers are the ones the delete_customer scenario removes.
+    """
+    now = datetime.utcnow()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        total = customers + disposable
+        for start in range(0, total, SEED_CHUNK):
+            db.session.execute(insert(Customer), [
+                {"name": f"Load Customer {i}", "phone_number": f"+2547{i:08d}", "code": f"LOAD{i}"}
+                for i in range(start, min(start + SEED_CHUNK, total))
+            ])
+        ids = db.session.execute(select(Customer.id).order_by(Customer.id)).scalars().all()
+        rows = (
+            {
+                "customer_id": customer_id,
+                "item": f"Item {rng.randrange(1000)}",
+                "amount": round(rng.uniform(1, 5000), 2),
+                "time": now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+            }
+            for customer_id in ids for _ in range(orders_per_customer)
+        )
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == SEED_CHUNK:
+                db.session.execute(insert(Order), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Order), batch)
+        db.session.commit()
+        rebuild_rollup()
+        order_ids = db.session.execute(
+            select(Order.id).where(Order.customer_id.in_(ids[:customers])).order_by(Order.id)
+        ).scalars().all()
+    return ids[:customers], ids[customers:], order_ids
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def drive(app, requests, clients, make_request):
+    """
+    Sends `requests` requests from `clients` threads; `make_request(i)` returns (method, url, json body)
+    """
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    next_index = iter(range(requests))
+
+    def client_loop():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['profile'] = {'email': 'bench@example.com'}
+        own_latencies, own_statuses = [], {}
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                break
+            method, url, body = make_request(i)
+            start = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            own_latencies.append(time.perf_counter() - start)
+            own_statuses[response.status_code] = own_statuses.get(response.status_code, 0) + 1
+        with lock:
+            latencies.extend(own_latencies)
+            for status, count in own_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 2)
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+        }
+    }
+
+
+def scenario_requests(name, customer_ids, disposable_ids, order_ids, seed_value):
+    """
+    Request factory for one scenario; request `i` is the same on every run with the same seed
+    """
+    def make_request(i):
+        rng = random.Random(f"{seed_value}-{name}-{i}")
+        if name == "place_order":
+            body = {"customer_id": rng.choice(customer_ids), "item": f"Load item {i}", "amount": round(rng.uniform(1, 5000), 2)}
+            return "POST", "/orders/place_order", body
+        if name == "view_orders":
+            return "GET", "/orders/view_orders", None
+        if name == "view_customers":
+            return "GET", "/customers/view_customers", None
+        if name == "update_order":
+            return "PUT", f"/orders/update_orders/{rng.choice(order_ids)}", {"amount": round(rng.uniform(1, 5000), 2)}
+        return "DELETE", f"/customers/delete_customers/{disposable_ids[i]}", None
+    return make_request
+
+
+class SmsWorker:
+    """
+    Runs the outbox worker against a fake provider in a background thread while the load runs
+    """
+    def __init__(self, app, latency):
+        self.app = app
+        self.provider = FakeSMS(latency=latency)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        with self.app.app_context():
+            while not self.stop.is_set():
+                run_worker(once=True, client=self.provider)
+                if not self.backlog():
+                    time.sleep(0.05)
+
+    def backlog(self):
+        return db.session.execute(
+            select(func.count()).select_from(SmsOutbox).where(SmsOutbox.status == "pending")
+        ).scalar_one()
+
+    def drain(self, timeout):
+        """
+        Waits for the outbox to empty after the load; returns the seconds it took (None if it did not)
+        """
+        start = time.perf_counter()
+        with self.app.app_context():
+            while self.backlog():
+                if time.perf_counter() - start > timeout:
+                    return None
+                time.sleep(0.1)
+        self.stop.set()
+        self.thread.join()
+        return round(time.perf_counter() - start, 3)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """
+    Relative change of rps and p95 per scenario against an earlier run (+0.1 = 10% more)
+    """
+    changes = {}
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            "rps": round(current["rps"] / previous["rps"] - 1, 3) if previous["rps"] else None,
+            "p95": round(current["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1, 3) if previous["latency_ms"]["p95"] else None
+        }
+    return {"commit": baseline.get("commit"), "changes": changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1000, help="Customers to seed")
+    parser.add_argument("--orders-per-customer", type=int, default=10, help="Orders seeded for each customer")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run, in order")
+    parser.add_argument("--sms-latency", type=float, default=0.05, help="Seconds the fake SMS provider takes per call")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for data and requests")
+    parser.add_argument("--database-url", help="Database to run against (default: a temporary SQLite file)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(SCENARIOS)})")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench_load.db')}"
+        app = build_app(database_url, args.clients)
+        rng = random.Random(args.seed)
+        disposable = args.requests if "delete_customer" in scenarios else 0
+        started = time.perf_counter()
+        customer_ids, disposable_ids, order_ids = seed(app, args.customers, args.orders_per_customer, disposable, rng)
+        seed_seconds = time.perf_counter() - started
+
+        sms = SmsWorker(app, args.sms_latency)
+        sms.thread.start()
+        results = {}
+        for name in scenarios:
+            make_request = scenario_requests(name, customer_ids, disposable_ids, order_ids, args.seed)
+            results[name] = drive(app, args.requests, args.clients, make_request)
+        drain_seconds = sms.drain(timeout=300)
+        with app.app_context():
+            db.engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "database": database_url.split(":", 1)[0],
+        "customers": args.customers,
+        "orders": args.customers * args.orders_per_customer,
+        "clients": args.clients,
+        "requests_per_scenario": args.requests,
+        "seed_seconds": round(seed_seconds, 3),
+        "scenarios": results,
+        "sms": {
+            "provider_latency_s": args.sms_latency,
+            "provider_calls": len(sms.provider.calls),
+            "messages_sent": sum(len(recipients) for _, recipients in sms.provider.calls),
+            "outbox_drain_seconds": drain_seconds
+        }
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Measures what logging costs a request: the same route, logging `--lines` info lines per request, is served with
+logging off, with the old synchronous RotatingFileHandler (10 KB files), and with the queued JSON handler
+with and without sampling. Reports the mean time per request and the overhead over logging off, e.g.:
+
+    python -m benchmarks.bench_logging --requests 5000 --lines 5
+    python -m benchmarks.bench_logging --disk-latency 0.0005    # every write stalls like a busy disk
+
+On a fast local disk the synchronous handler is cheap and the queue's gain is small (its listener thread still
+needs the GIL to format); the difference shows when writes stall, which the request thread no longer waits for.
+"""
+from app import create_app
+from config import Config
+from services.structured_logging import build_log_handler
+from logging.handlers import RotatingFileHandler
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+bench_logger = logging.getLogger("api.bench")
+
+
+class SlowDisk(logging.Handler):
+    """
+    Wraps a handler so every write takes `latency` seconds longer
+    """
+    def __init__(self, handler, latency):
+        super().__init__()
+        self.handler = handler
+        self.latency = latency
+
+    def emit(self, record):
+        time.sleep(self.latency)
+        self.handler.emit(record)
+
+    def close(self):
+        self.handler.close()
+        super().close()
+
+
+def old_handler(directory):
+    # The setup app.py used before: formatted and written to disk on the request thread, rotated every 10 KB
+    handler = RotatingFileHandler(os.path.join(directory, "sync.log"), maxBytes=10240, backupCount=10)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    return handler
+
+
+def run(client, root, handler, requests):
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    if handler is not None:
+        root.addHandler(handler)
+    root.setLevel(logging.INFO if handler is not None else logging.WARNING)
+
+    client.get("/bench-logging") # Warm up (and start the queue listener)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get("/bench-logging")
+    elapsed = time.perf_counter() - start
+
+    drain = 0.0
+    if hasattr(handler, "stop"):
+        started = time.perf_counter()
+        handler.stop() # Waits for the listener to write out everything still queued
+        drain = time.perf_counter() - started
+    if handler is not None:
+        root.removeHandler(handler)
+        for output in getattr(handler, "handlers", [handler]):
+            output.close()
+    return elapsed / requests, drain, getattr(handler, "dropped", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000, help="Requests per variant")
+    parser.add_argument("--lines", type=int, default=5, help="Info lines logged per request")
+    parser.add_argument("--disk-latency", type=float, default=0, help="Seconds added to every log write")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+            LOG_FILE = os.path.join(directory, "app.log")
+
+        app = create_app(BenchConfig)
+
+        def bench_route():
+            for i in range(args.lines):
+                bench_logger.info(f"Order {i} placed successfully for customer ID 42, Order ID: {i}")
+            return "ok"
+        app.add_url_rule("/bench-logging", "bench_logging", bench_route)
+
+        client = app.test_client()
+        root = logging.getLogger()
+        saved = list(root.handlers), root.level
+        variants = {
+            "off": None,
+            "sync_rotating_file": old_handler(directory),
+            "queued_json": build_log_handler({"LOG_FILE": os.path.join(directory, "json.log")}),
+            "queued_json_sampled": build_log_handler({
+                "LOG_FILE": os.path.join(directory, "sampled.log"), "LOG_SAMPLING": "api.bench=0.1"
+            }),
+        }
+        if args.disk_latency:
+            variants["sync_rotating_file"] = SlowDisk(variants["sync_rotating_file"], args.disk_latency)
+            for name in ("queued_json", "queued_json_sampled"):
+                variants[name].handlers = [SlowDisk(output, args.disk_latency) for output in variants[name].handlers]
+        results = {}
+        for name, handler in variants.items():
+            per_request, drain, dropped = run(client, root, handler, args.requests)
+            results[name] = {"us_per_request": round(per_request * 1e6, 1), "drain_ms": round(drain * 1000, 1), "dropped": dropped}
+        root.handlers[:], root.level = saved
+
+    baseline = results["off"]["us_per_request"]
+    for result in results.values():
+        result["overhead_us"] = round(result["us_per_request"] - baseline, 1)
+    print(json.dumps({
+        "requests": args.requests,
+        "lines_per_request": args.lines,
+        "disk_latency_ms": args.disk_latency * 1000,
+        "variants": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
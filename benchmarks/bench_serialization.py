@@ -0,0 +1,121 @@
+"""
+Measures GET /orders/view_orders?all=true on a large orders table (100k rows by default): the route as it was
+(ORM objects, stock json encoder), then with the orjson provider, with `fields=` narrowing the SELECT and with
+`format=columnar`. Reports the median time per request, the share of it spent encoding, and the body size
+before and after gzip, e.g.:
+
+    python -m benchmarks.bench_serialization --orders 100000 --repeat 5
+"""
+from app import create_app
+from config import Config
+from models import db, Customer, Order
+from services.json_provider import FastJSONProvider, orjson
+from flask import jsonify  # type: ignore
+from flask.json.provider import DefaultJSONProvider  # type: ignore
+from sqlalchemy import insert
+from datetime import datetime, timedelta
+import argparse
+import gzip
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def seed(orders, customers=1000):
+    db.create_all()
+    db.session.execute(insert(Customer), [
+        {"name": f"Customer {i}", "phone_number": f"+2547{i:08d}", "code": f"BENCH{i}"} for i in range(customers)
+    ])
+    start = datetime(2024, 1, 1)
+    batch = 10000
+    for offset in range(0, orders, batch):
+        db.session.execute(insert(Order), [
+            {"customer_id": i % customers + 1, "item": f"Item {i % 500}", "amount": round(5 + (i % 9973) / 7, 2),
+             "time": start + timedelta(seconds=i)}
+            for i in range(offset, min(offset + batch, orders))
+        ])
+    db.session.commit()
+
+
+def old_view_orders():
+    # The route before sparse fields: full ORM objects, one dict each, encoded by the stock provider
+    orders = Order.query.order_by(Order.time.desc(), Order.id.desc()).all()
+    return jsonify([order.to_dict() for order in orders])
+
+
+def measure(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    body = response.get_data()
+    return statistics.median(timings), body
+
+
+def encode_seconds(provider, body, repeat):
+    payload = json.loads(body)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        provider.dumps(payload, separators=(",", ":"))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100000, help="Orders in the table")
+    parser.add_argument("--repeat", type=int, default=5, help="Requests per variant (the median is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            LOG_FILE = os.path.join(directory, "app.log")
+
+        app = create_app(BenchConfig)
+        app.add_url_rule("/bench-old-view-orders", "bench_old_view_orders", old_view_orders)
+        with app.app_context():
+            seed(args.orders)
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['profile'] = {'email': 'bench@example.com'}
+
+        stock, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+        variants = [
+            ("before: orm rows, stock json", stock, "/bench-old-view-orders"),
+            ("plain rows, stock json", stock, "/orders/view_orders?all=true"),
+            ("plain rows, fast json", fast, "/orders/view_orders?all=true"),
+            ("fields=id,amount, fast json", fast, "/orders/view_orders?all=true&fields=id,amount"),
+            ("columnar, fast json", fast, "/orders/view_orders?all=true&format=columnar"),
+            ("columnar fields=id,amount, fast json", fast, "/orders/view_orders?all=true&format=columnar&fields=id,amount"),
+        ]
+        results = {}
+        for name, provider, url in variants:
+            app.json = provider
+            seconds, body = measure(client, url, args.repeat)
+            results[name] = {
+                "ms_per_request": round(seconds * 1000, 1),
+                "encode_ms": round(encode_seconds(provider, body, args.repeat) * 1000, 1),
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+            }
+
+    baseline = results["before: orm rows, stock json"]["ms_per_request"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["ms_per_request"], 2)
+    print(json.dumps({
+        "orders": args.orders,
+        "orjson": orjson is not None,
+        "variants": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
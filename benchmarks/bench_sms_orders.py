@@ -0,0 +1,99 @@
+"""
+Replays a burst of "ORDER ..." messages against the local /incoming-messages webhook and compares processing
+each message during its request (workers=0) with the queued worker pool that commits in batches.
+
+Reports how long the webhook takes to acknowledge and end-to-end orders per second, e.g.:
+
+    python -m benchmarks.bench_sms_orders --messages 2000 --workers 4 --batch-size 100
+    python -m benchmarks.bench_sms_orders --database-url mysql+pymysql://user:pw@localhost/orders_bench
+"""
+from app import create_app
+from config import Config
+from models import db, Customer
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def replay(database_url, messages, customers, workers, batch_size):
+    class BenchConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+        AUTO_CREATE_TABLES = True
+        SMS_ORDER_WORKERS = workers
+        SMS_ORDER_BATCH_SIZE = batch_size
+        SMS_ORDER_QUEUE_MAX = messages
+        AT_WEBHOOK_TOKEN = "bench-token"
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(
+            Customer(name=f"Bench {i}", phone_number=f"+2547{i:08d}", code=f"BENCH{i}") for i in range(customers)
+        )
+        db.session.commit()
+
+    client = app.test_client()
+    acks = []
+    start = time.perf_counter()
+    for i in range(messages):
+        customer = i % customers
+        payload = {
+            "id": f"ATXid_bench_{i}",
+            "from": f"+2547{customer:08d}",
+            "to": "12345",
+            "text": f"ORDER BENCH{customer} Item {i} {10 + i % 90}.50"
+        }
+        sent = time.perf_counter()
+        assert client.post("/incoming-messages?token=bench-token", data=payload).status_code == 200
+        acks.append(time.perf_counter() - sent)
+    acked = time.perf_counter() - start
+    app.extensions['sms_orders'].join()
+    total = time.perf_counter() - start
+
+    stats = app.extensions['sms_orders'].stats()
+    assert stats["ordered"] == messages, stats
+    acks.sort()
+    return {
+        "workers": workers,
+        "batch_size": batch_size if workers else 1,
+        "transactions": stats["batches"],
+        "ack_ms": {
+            "p50": round(statistics.median(acks) * 1000, 3),
+            "p99": round(acks[int(len(acks) * 0.99) - 1] * 1000, 3)
+        },
+        "all_acked_seconds": round(acked, 3),
+        "all_processed_seconds": round(total, 3),
+        "orders_per_sec": round(messages / total, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1000, help="Messages in the replayed burst")
+    parser.add_argument("--customers", type=int, default=50, help="Distinct customers sending them")
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads for the queued run")
+    parser.add_argument("--batch-size", type=int, default=100, help="Messages committed per transaction")
+    parser.add_argument("--database-url", help="Database to run against (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench_sms_orders.db')}"
+        inline = replay(database_url, args.messages, args.customers, 0, 1)
+        queued = replay(database_url, args.messages, args.customers, args.workers, args.batch_size)
+
+    print(json.dumps({
+        "messages": args.messages,
+        "database": database_url.split(":", 1)[0],
+        "inline": inline,
+        "queued": queued,
+        "throughput_speedup": round(queued["orders_per_sec"] / inline["orders_per_sec"], 1)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
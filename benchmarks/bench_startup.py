@@ -0,0 +1,46 @@
+"""
+Measures worker cold-start time: how long a fresh interpreter takes to import the app and serve its first request.
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+app.test_client().get('/')
+served = time.perf_counter()
+print(imported - start, served - start)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to start")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    imports, first_requests = [], []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=root, check=True, capture_output=True, text=True
+        ).stdout.split()
+        imports.append(float(output[-2]))
+        first_requests.append(float(output[-1]))
+
+    print(json.dumps({
+        "runs": args.runs,
+        "import_ms": {"median": round(statistics.median(imports) * 1000, 1), "max": round(max(imports) * 1000, 1)},
+        "first_request_ms": {"median": round(statistics.median(first_requests) * 1000, 1), "max": round(max(first_requests) * 1000, 1)}
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
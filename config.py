@@ -5,10 +5,89 @@ import os
 load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get("APP_SECRET_KEY")
-    SESSION_TYPE = "filesystem"
+    # Server-side sessions: the cookie only holds an id. Data lives in the app database's `sessions` table, or in a
+    # SQLite file at SESSION_STORE_PATH (which must be on persistent disk) shared by the workers on the host, behind a
+    # per-worker cache that drops its copies as soon as any worker deletes a session (logout)
+    SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH")
+    SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("SESSION_CACHE_MAX_ENTRIES", 10000))
+    SESSION_CACHE_TTL_SECONDS = float(os.environ.get("SESSION_CACHE_TTL_SECONDS", 30))
+    SESSION_SWEEP_SECONDS = float(os.environ.get("SESSION_SWEEP_SECONDS", 3600))
     SQLALCHEMY_DATABASE_URI = os.environ.get("JAWSDB_URL") or \
                               f"mysql+pymysql://{os.environ.get('MYSQL_USER')}:{os.environ.get('MYSQL_PASSWORD')}@{os.environ.get('MYSQL_HOST')}/{os.environ.get('MYSQL_DB')}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Run db.create_all() at startup instead of `flask db upgrade` (local development only)
+    AUTO_CREATE_TABLES = os.environ.get("AUTO_CREATE_TABLES", "false").lower() in ("1", "true", "yes")
+
+    # Connection pool sizing (set per environment; in-memory SQLite ignores these).
+    # Recycle connections before the server's idle timeout and ping them on checkout, since JawsDB drops idle connections
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 280))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+    # Customer lookup cache: a per-process LRU (0 entries disables it) whose entries live for the TTL,
+    # optionally in front of a SQLite file shared by all workers on the host
+    CUSTOMER_CACHE_MAX_ENTRIES = int(os.environ.get("CUSTOMER_CACHE_MAX_ENTRIES", 10000))
+    CUSTOMER_CACHE_TTL_SECONDS = float(os.environ.get("CUSTOMER_CACHE_TTL_SECONDS", 60))
+    CUSTOMER_CACHE_SHARED_PATH = os.environ.get("CUSTOMER_CACHE_SHARED_PATH")
+
+    # Customer search (/customers/search): results per call by default and at most. With CUSTOMER_SEARCH_INDEX on,
+    # each worker answers from an in-memory prefix index instead of the database; other workers' writes reach it
+    # within CUSTOMER_SEARCH_REFRESH_SECONDS
+    CUSTOMER_SEARCH_LIMIT_DEFAULT = int(os.environ.get("CUSTOMER_SEARCH_LIMIT_DEFAULT", 10))
+    CUSTOMER_SEARCH_LIMIT_MAX = int(os.environ.get("CUSTOMER_SEARCH_LIMIT_MAX", 50))
+    CUSTOMER_SEARCH_INDEX = os.environ.get("CUSTOMER_SEARCH_INDEX", "false").lower() in ("1", "true", "yes")
+    CUSTOMER_SEARCH_REFRESH_SECONDS = float(os.environ.get("CUSTOMER_SEARCH_REFRESH_SECONDS", 60))
+
+    # Logging: records go through an in-memory queue (dropped when LOG_QUEUE_MAX are waiting) to a file rotated at
+    # LOG_MAX_BYTES, or to stdout with LOG_FILE=-. LOG_SAMPLING keeps a fraction of a noisy logger's info lines,
+    # e.g. "api.orders=0.1,services.sms_orders=0.5"; warnings and errors are always kept
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower() # json or text
+    LOG_FILE = os.environ.get("LOG_FILE", "logs/make-an-order.log")
+    LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 10))
+    LOG_QUEUE_MAX = int(os.environ.get("LOG_QUEUE_MAX", 10000))
+    LOG_SAMPLING = os.environ.get("LOG_SAMPLING", "")
+
+    # Prometheus metrics on /metrics. Under gunicorn set METRICS_DIR to a directory shared by the workers
+    # (emptied at startup); each worker writes its totals there this often and a scrape adds them all up.
+    # With METRICS_TOKEN set, scrapes must send `Authorization: Bearer <token>`
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+    # In debug mode, warn when one request runs the same statement shape this many times (likely N+1; 0 disables)
+    QUERY_REPEAT_WARN_THRESHOLD = int(os.environ.get("QUERY_REPEAT_WARN_THRESHOLD", 5))
+
+    # Keyset pagination bounds for the list endpoints
+    PAGE_SIZE_DEFAULT = int(os.environ.get("PAGE_SIZE_DEFAULT", 50))
+    PAGE_SIZE_MAX = int(os.environ.get("PAGE_SIZE_MAX", 500))
+
+    # Encode JSON responses with orjson when it is installed (falls back to the standard library otherwise)
+    JSON_FAST_ENCODER = os.environ.get("JSON_FAST_ENCODER", "true").lower() in ("1", "true", "yes")
+
+    # Response compression: text responses of at least COMPRESS_MIN_BYTES (and every streamed export) are sent
+    # gzip- or brotli-encoded when the client accepts it. Higher levels shrink more at a higher CPU cost
+    COMPRESS_RESPONSES = os.environ.get("COMPRESS_RESPONSES", "true").lower() in ("1", "true", "yes")
+    COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6)) # 1-9
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 4)) # 0-11
+
+    # Rows fetched per server-side cursor round trip by the export endpoints
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+    # Maximum number of orders accepted by one POST /orders/bulk request
+    BULK_ORDERS_MAX = int(os.environ.get("BULK_ORDERS_MAX", 5000))
+
+    # Order archival: `flask archive-orders` moves orders older than ORDER_ARCHIVE_AFTER_DAYS to orders_archive,
+    # ORDER_ARCHIVE_BATCH_SIZE per transaction. view_orders reads the archive only when asked or for older ranges
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", 365))
+    ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get("ORDER_ARCHIVE_BATCH_SIZE", 1000))
+
+    # Rows upserted per round trip by POST /customers/import
+    CUSTOMER_IMPORT_CHUNK_SIZE = int(os.environ.get("CUSTOMER_IMPORT_CHUNK_SIZE", 1000))
 
     GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
@@ -17,6 +96,34 @@ class Config:
     AT_USERNAME = os.environ.get("AT_USERNAME")
     AT_API_KEY = os.environ.get("AT_API_KEY")
     AT_SENDER_ID = os.environ.get("AT_SENDER_ID")
+    # Shared secret for the Africa's Talking callbacks (/incoming-messages, /delivery-reports): register them as
+    # `https://<host>/incoming-messages?token=<token>`. Without it the callbacks refuse every post
+    AT_WEBHOOK_TOKEN = os.environ.get("AT_WEBHOOK_TOKEN")
+
+    # SMS outbox worker (`flask sms-worker`)
+    SMS_OUTBOX_BATCH_SIZE = int(os.environ.get("SMS_OUTBOX_BATCH_SIZE", 50))
+    SMS_OUTBOX_WORKERS = int(os.environ.get("SMS_OUTBOX_WORKERS", 8))
+    SMS_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("SMS_OUTBOX_MAX_ATTEMPTS", 5))
+    SMS_OUTBOX_BACKOFF_SECONDS = int(os.environ.get("SMS_OUTBOX_BACKOFF_SECONDS", 30))
+    SMS_OUTBOX_LEASE_SECONDS = int(os.environ.get("SMS_OUTBOX_LEASE_SECONDS", 300))
+    SMS_OUTBOX_POLL_SECONDS = float(os.environ.get("SMS_OUTBOX_POLL_SECONDS", 2))
+
+    # Provider calls per second across the worker's send pool (0 = unlimited)
+    SMS_RATE_LIMIT_PER_SECOND = float(os.environ.get("SMS_RATE_LIMIT_PER_SECOND", 0))
+
+    # Delivery report webhook: reports are buffered and written in batches of this size at least this often
+    # (0 seconds writes each report during the request); a buffer holding the maximum answers 503.
+    # A report the database keeps rejecting is dropped after the given number of attempts
+    DELIVERY_REPORT_BATCH_SIZE = int(os.environ.get("DELIVERY_REPORT_BATCH_SIZE", 500))
+    DELIVERY_REPORT_FLUSH_SECONDS = float(os.environ.get("DELIVERY_REPORT_FLUSH_SECONDS", 1.0))
+    DELIVERY_REPORT_BUFFER_MAX = int(os.environ.get("DELIVERY_REPORT_BUFFER_MAX", 10000))
+    DELIVERY_REPORT_MAX_ATTEMPTS = int(os.environ.get("DELIVERY_REPORT_MAX_ATTEMPTS", 3))
+
+    # Ordering by SMS on /incoming-messages: worker threads per process (0 processes during the request),
+    # messages committed per transaction, and queued messages held before the webhook answers 503
+    SMS_ORDER_WORKERS = int(os.environ.get("SMS_ORDER_WORKERS", 4))
+    SMS_ORDER_BATCH_SIZE = int(os.environ.get("SMS_ORDER_BATCH_SIZE", 100))
+    SMS_ORDER_QUEUE_MAX = int(os.environ.get("SMS_ORDER_QUEUE_MAX", 10000))
 
     # DB Credentials (for local, non-Prod setup)
     MYSQL_HOST=os.environ.get("MYSQL_HOST")
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for the web process (`gunicorn -c gunicorn.conf.py app:app`).
+
+The app is imported once in the master (`preload_app`) and forked into workers, so workers boot without
+re-importing it. Connections must never be shared across a fork: app creation opens none, and `post_fork`
+discards any pooled connection the master might have made so each worker starts with an empty pool.
+"""
+import glob
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+preload_app = True
+accesslog = "-"
+
+
+def on_starting(server):
+    # Snapshots left by a previous run's workers would otherwise be added to this run's totals
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "*.json*")):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    from app import app
+    from models import db
+
+    with app.app_context():
+        # close=False leaves the parent's sockets alone and just drops them from this worker's pool
+        db.engine.dispose(close=False)
+    server.log.info(f"Worker {worker.pid} reset its database connection pool.")
@@ -0,0 +1,52 @@
+"""Initial schema: customers and orders
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18 10:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def existing_tables():
+    """
+    Tables already in the database; one created by the app's old `db.create_all()` has customers and orders
+    """
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = existing_tables()
+    if 'customers' not in existing:
+        op.create_table('customers',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('phone_number', sa.String(length=15), nullable=False),
+        sa.Column('code', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('code'),
+        sa.UniqueConstraint('phone_number')
+        )
+    if 'orders' not in existing:
+        op.create_table('orders',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('item', sa.String(length=255), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('time', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('orders')
+    op.drop_table('customers')
@@ -0,0 +1,52 @@
+"""Add sms_outbox for queued order confirmation SMS
+
+Revision ID: 0002_sms_outbox
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 10:41:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_sms_outbox'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A database created by `db.create_all()` after the outbox was added already has it, indexes included
+    if 'sms_outbox' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('sms_outbox',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('phone_number', sa.String(length=15), nullable=False),
+    sa.Column('message', sa.String(length=1000), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('claim_token', sa.String(length=36), nullable=True),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('provider_message_id', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sms_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sms_outbox_claim_token'), ['claim_token'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sms_outbox_order_id'), ['order_id'], unique=False)
+        batch_op.create_index('ix_sms_outbox_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sms_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_sms_outbox_status_next_attempt_at')
+        batch_op.drop_index(batch_op.f('ix_sms_outbox_order_id'))
+        batch_op.drop_index(batch_op.f('ix_sms_outbox_claim_token'))
+
+    op.drop_table('sms_outbox')
@@ -0,0 +1,30 @@
+"""Add composite indexes for per-customer and time-ordered order listings
+
+Revision ID: 0003_order_indexes
+Revises: 0002_sms_outbox
+Create Date: 2026-10-18 10:42:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_order_indexes'
+down_revision = '0002_sms_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_customer_id_time_id', ['customer_id', 'time', 'id'], unique=False)
+        batch_op.create_index('ix_orders_time_id', ['time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        # InnoDB drops its implicit customer_id foreign key index once the composite index covers it,
+        # so give the foreign key a plain index back before removing the composite one
+        batch_op.create_index('ix_orders_customer_id', ['customer_id'], unique=False)
+        batch_op.drop_index('ix_orders_time_id')
+        batch_op.drop_index('ix_orders_customer_id_time_id')
@@ -0,0 +1,32 @@
+"""Add table_versions write counters for ETags on customer and order listings
+
+Revision ID: 0004_table_versions
+Revises: 0003_order_indexes
+Create Date: 2026-10-18 11:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_table_versions'
+down_revision = '0003_order_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(table_versions, [
+        {'table_name': 'customers', 'version': 0},
+        {'table_name': 'orders', 'version': 0},
+    ])
+
+
+def downgrade():
+    op.drop_table('table_versions')
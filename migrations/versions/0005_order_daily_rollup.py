@@ -0,0 +1,43 @@
+"""Add order_daily_rollup with per-day, per-customer order totals
+
+Revision ID: 0005_order_daily_rollup
+Revises: 0004_table_versions
+Create Date: 2026-10-18 11:45:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_order_daily_rollup'
+down_revision = '0004_table_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_daily_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('amount_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('day', 'customer_id')
+    )
+    with op.batch_alter_table('order_daily_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_order_daily_rollup_customer_id_day', ['customer_id', 'day'], unique=False)
+
+    # Backfill from existing orders; `flask rebuild-order-rollup` does the same at any later time
+    op.execute(
+        "INSERT INTO order_daily_rollup (day, customer_id, order_count, amount_sum) "
+        "SELECT DATE(time), customer_id, COUNT(id), SUM(amount) FROM orders "
+        "WHERE time IS NOT NULL GROUP BY DATE(time), customer_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('order_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_daily_rollup_customer_id_day')
+
+    op.drop_table('order_daily_rollup')
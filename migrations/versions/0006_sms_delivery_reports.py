@@ -0,0 +1,45 @@
+"""Add sms_delivery_reports and index sms_outbox.provider_message_id
+
+Revision ID: 0006_sms_delivery_reports
+Revises: 0005_order_daily_rollup
+Create Date: 2026-10-18 12:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_sms_delivery_reports'
+down_revision = '0005_order_daily_rollup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sms_delivery_reports',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('provider_message_id', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('phone_number', sa.String(length=15), nullable=True),
+    sa.Column('network_code', sa.String(length=10), nullable=True),
+    sa.Column('failure_reason', sa.String(length=100), nullable=True),
+    sa.Column('retry_count', sa.Integer(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sms_delivery_reports', schema=None) as batch_op:
+        batch_op.create_index('ix_sms_delivery_reports_provider_message_id_id', ['provider_message_id', 'id'], unique=False)
+
+    with op.batch_alter_table('sms_outbox', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sms_outbox_provider_message_id'), ['provider_message_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sms_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sms_outbox_provider_message_id'))
+
+    with op.batch_alter_table('sms_delivery_reports', schema=None) as batch_op:
+        batch_op.drop_index('ix_sms_delivery_reports_provider_message_id_id')
+
+    op.drop_table('sms_delivery_reports')
@@ -0,0 +1,42 @@
+"""Add inbound_sms for orders placed by SMS
+
+Revision ID: 0007_inbound_sms
+Revises: 0006_sms_delivery_reports
+Create Date: 2026-10-18 12:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_inbound_sms'
+down_revision = '0006_sms_delivery_reports'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('inbound_sms',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('provider_message_id', sa.String(length=100), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=False),
+    sa.Column('text', sa.String(length=500), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider_message_id')
+    )
+    with op.batch_alter_table('inbound_sms', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_inbound_sms_order_id'), ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inbound_sms', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_inbound_sms_order_id'))
+
+    op.drop_table('inbound_sms')
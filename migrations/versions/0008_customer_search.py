@@ -0,0 +1,54 @@
+"""Add customers.phone_digits and the indexes behind customer search
+
+Revision ID: 0008_customer_search
+Revises: 0007_inbound_sms
+Create Date: 2026-10-18 14:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_customer_search'
+down_revision = '0007_inbound_sms'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_digits', sa.String(length=15), nullable=True))
+
+    # Backfill in id order, a batch at a time, so large tables never hold one huge transaction's worth of locks
+    connection = op.get_bind()
+    customers = sa.table('customers', sa.column('id', sa.Integer), sa.column('phone_number', sa.String),
+                         sa.column('phone_digits', sa.String))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(customers.c.id, customers.c.phone_number)
+            .where(customers.c.id > last_id).order_by(customers.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            customers.update().where(customers.c.id == sa.bindparam('customer_id')).values(phone_digits=sa.bindparam('digits')),
+            [{"customer_id": row.id, "digits": re.sub(r"\D", "", row.phone_number)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.alter_column('phone_digits', existing_type=sa.String(length=15), nullable=False)
+        batch_op.create_index(batch_op.f('ix_customers_name'), ['name'], unique=False)
+        batch_op.create_index(batch_op.f('ix_customers_phone_digits'), ['phone_digits'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_customers_phone_digits'))
+        batch_op.drop_index(batch_op.f('ix_customers_name'))
+        batch_op.drop_column('phone_digits')
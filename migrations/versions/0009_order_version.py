@@ -0,0 +1,27 @@
+"""Add orders.version for optimistic concurrency checks
+
+Revision ID: 0009_order_version
+Revises: 0008_customer_search
+Create Date: 2026-10-18 16:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_order_version'
+down_revision = '0008_customer_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The server default fills existing rows, so no backfill is needed
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,43 @@
+"""Cascade customer deletes to orders in the database
+
+Revision ID: 0010_order_customer_cascade
+Revises: 0009_order_version
+Create Date: 2026-10-18 17:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_order_customer_cascade'
+down_revision = '0009_order_version'
+branch_labels = None
+depends_on = None
+
+FK_NAME = 'fk_orders_customer_id_customers'
+# Names the unnamed foreign key from 0001 on SQLite, where batch mode rebuilds the table from reflection
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def existing_fk_name():
+    """
+    Name of the orders -> customers foreign key; MySQL generated one (e.g. orders_ibfk_1), SQLite has none
+    """
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys('orders'):
+        if fk['referred_table'] == 'customers' and fk['constrained_columns'] == ['customer_id']:
+            return fk['name'] or FK_NAME
+    return FK_NAME
+
+
+def upgrade():
+    name = existing_fk_name()
+    with op.batch_alter_table('orders', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'customers', ['customer_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'customers', ['customer_id'], ['id'])
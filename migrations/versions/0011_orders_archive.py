@@ -0,0 +1,41 @@
+"""Add orders_archive for orders moved out of the hot table
+
+Revision ID: 0011_orders_archive
+Revises: 0010_order_customer_cascade
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_orders_archive'
+down_revision = '0010_order_customer_cascade'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('orders_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('item', sa.String(length=255), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=True),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], name='fk_orders_archive_customer_id_customers', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_customer_id_time_id', ['customer_id', 'time', 'id'], unique=False)
+        batch_op.create_index('ix_orders_archive_time_id', ['time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_time_id')
+        batch_op.drop_index('ix_orders_archive_customer_id_time_id')
+
+    op.drop_table('orders_archive')
@@ -0,0 +1,37 @@
+"""Keep SMS links to orders that move to orders_archive
+
+Revision ID: 0012_sms_archived_order_id
+Revises: 0011_orders_archive
+Create Date: 2026-10-18 19:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_sms_archived_order_id'
+down_revision = '0011_orders_archive'
+branch_labels = None
+depends_on = None
+
+TABLES = ('sms_outbox', 'inbound_sms')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('archived_order_id', sa.Integer(), nullable=True))
+            batch_op.create_index(f'ix_{table}_archived_order_id', ['archived_order_id'], unique=False)
+            batch_op.create_foreign_key(
+                f'fk_{table}_archived_order_id_orders_archive', 'orders_archive',
+                ['archived_order_id'], ['id'], ondelete='SET NULL'
+            )
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_archived_order_id_orders_archive', type_='foreignkey')
+            batch_op.drop_index(f'ix_{table}_archived_order_id')
+            batch_op.drop_column('archived_order_id')
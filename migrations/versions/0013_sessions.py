@@ -0,0 +1,39 @@
+"""Store login sessions in the app database
+
+Revision ID: 0013_sessions
+Revises: 0012_sms_archived_order_id
+Create Date: 2026-10-18 21:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_sessions'
+down_revision = '0012_sms_archived_order_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sessions',
+    sa.Column('sid', sa.String(length=32), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.Double(), nullable=False),
+    sa.PrimaryKeyConstraint('sid')
+    )
+    with op.batch_alter_table('sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sessions_expires_at'), ['expires_at'], unique=False)
+
+    # Counts deleted sessions, so workers know when to drop their cached copies
+    table_versions = sa.table('table_versions', sa.column('table_name', sa.String), sa.column('version', sa.BigInteger))
+    op.bulk_insert(table_versions, [{'table_name': 'sessions', 'version': 0}])
+
+
+def downgrade():
+    op.execute("DELETE FROM table_versions WHERE table_name = 'sessions'")
+    with op.batch_alter_table('sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sessions_expires_at'))
+
+    op.drop_table('sessions')
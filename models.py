@@ -1,7 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy # type: ignore
+from sqlalchemy.dialects import sqlite
+from datetime import datetime, timezone
+import re
 
 db = SQLAlchemy()
 
+# MySQL DATETIME has second precision and SQLite's CURRENT_TIMESTAMP writes 'YYYY-MM-DD HH:MM:SS'.
+# Bind datetimes in that same format on SQLite so `(time, id)` keyset comparisons line up with
+# the rows the server default wrote.
+Timestamp = db.DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
 class Customer(db.Model):
     """
     Customer: Model to represent a customer in the database
@@ -16,26 +27,53 @@ class Customer(db.Model):
     name(str): Name of the customer
     phone_number(str): Unique phone number of the customer
     code(str): Unique code assciated with customer for secondary identification
+    phone_digits(str): phone_number without its `+`, spaces and dashes; kept in step with it for prefix search
     """
     __tablename__ = 'customers'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False, index=True)
     phone_number = db.Column(db.String(15), unique=True, nullable=False)
     code = db.Column(db.String(50), unique=True, nullable=False)
+    # Core inserts (the CSV import, benchmarks) get it from this default, ORM writes from the listener below
+    phone_digits = db.Column(
+        db.String(15), nullable=False, index=True,
+        default=lambda context: normalize_phone(context.get_current_parameters()["phone_number"])
+    )
 
-    # Relationship to Order
-    orders = db.relationship('Order', backref='customer', lazy=True,  cascade='all, delete')
+    # Relationship to Order; the database deletes a customer's orders (ON DELETE CASCADE), so they are never
+    # loaded just to be deleted one by one
+    orders = db.relationship('Order', backref='customer', lazy=True, cascade='all, delete', passive_deletes=True)
 
     def __repr__(self):
         return f"<Customer(id={self.id}, name={self.name}, phone_number={self.phone_number}, code={self.code})>"
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "phone_number": self.phone_number,
-            "code": self.code
-        }
+    # Each public field and how it is rendered in JSON; to_dict and the list endpoints share these
+    JSON_FIELDS = {
+        "id": lambda customer: customer.id,
+        "name": lambda customer: customer.name,
+        "phone_number": lambda customer: customer.phone_number,
+        "code": lambda customer: customer.code,
+    }
+
+    def to_dict(self, fields=None):
+        return json_dict(self, self.JSON_FIELDS, fields)
+
+def json_dict(record, json_fields, fields=None):
+    """
+    Dict of `fields` (default: all of `json_fields`) rendered from `record`, which may be a model instance
+    or any row with the same attribute names, e.g. a `select(Order.id, Order.amount)` result row
+    """
+    return {field: json_fields[field](record) for field in (fields or json_fields)}
+
+def normalize_phone(phone_number):
+    """
+    Digits of a phone number, e.g. "+254 700-123456" -> "254700123456"
+    """
+    return re.sub(r"\D", "", phone_number or "")
+
+@db.event.listens_for(Customer.phone_number, 'set')
+def sync_phone_digits(target, value, oldvalue, initiator):
+    target.phone_digits = normalize_phone(value)
 
 class Order(db.Model):
     """
@@ -48,26 +86,317 @@ class Order(db.Model):
     Attributes/Column Names:
     -----------
     id(int): Unique identifier for an order; a PRIMARY KEY
-    customer_id(int): Key used to link the order to the customer who made it: a FOREIGN KEY
+    customer_id(int): Key used to link the order to the customer who made it: a FOREIGN KEY, deleted with the customer
     item(str): Name of the item ordered by the customer
     amount(decimal): Amount of money cost for the order
     time(datetieme): Timestamp of when the order was made.
+    version(int): Incremented by every write to the order; writers may send back the version they read to
+    make sure nobody changed the order in between (optimistic concurrency)
     """
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(
+        db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE', name='fk_orders_customer_id_customers'), nullable=False
+    )
     item = db.Column(db.String(255), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
-    time = db.Column(db.DateTime, server_default=db.func.now())
+    time = db.Column(Timestamp, server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # Serve per-customer listings and the newest-first keyset pagination in view_orders without full scans
+    __table_args__ = (
+        db.Index('ix_orders_customer_id_time_id', 'customer_id', 'time', 'id'),
+        db.Index('ix_orders_time_id', 'time', 'id'),
+    )
+    # ORM flushes check and increment it; the set-based writes in services/order_service.py do the same by hand
+    __mapper_args__ = {"version_id_col": version}
 
     def __repr__(self):
         return f"<Order(id={self.id}, customer_id={self.customer_id}, item={self.item}, amount={self.amount}, time={self.time})>"
 
+    # Each public field and how it is rendered in JSON; to_dict and the list endpoints share these
+    JSON_FIELDS = {
+        "id": lambda order: order.id,
+        "customer_id": lambda order: order.customer_id,
+        "item": lambda order: order.item,
+        "amount": lambda order: float(order.amount), # Ensure it's float for JSON serialization
+        "time": lambda order: order.time.isoformat() if order.time else None, # ISO format for datetime
+        "version": lambda order: order.version,
+    }
+
+    def to_dict(self, fields=None):
+        return json_dict(self, self.JSON_FIELDS, fields)
+
+def utcnow():
+    """
+    Naive UTC timestamp used for columns the application (not the database server) writes
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class OrderArchive(db.Model):
+    """
+    OrderArchive: Model to represent an order moved out of `orders` by `flask archive-orders`
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    id(int): The order's original id; a PRIMARY KEY (an order lives in exactly one of the two tables)
+    customer_id(int): Customer who made the order: a FOREIGN KEY, deleted with the customer
+    item(str), amount(decimal), time(datetime), version(int): As on Order, unchanged by archiving
+    archived_at(datetime): Timestamp of when the order was moved to the archive
+    """
+    __tablename__ = 'orders_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_id = db.Column(
+        db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE', name='fk_orders_archive_customer_id_customers'),
+        nullable=False
+    )
+    item = db.Column(db.String(255), nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    time = db.Column(Timestamp, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    archived_at = db.Column(Timestamp, nullable=False, default=utcnow)
+
+    # The same access paths as `orders`, for historical view_orders queries
+    __table_args__ = (
+        db.Index('ix_orders_archive_customer_id_time_id', 'customer_id', 'time', 'id'),
+        db.Index('ix_orders_archive_time_id', 'time', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<OrderArchive(id={self.id}, customer_id={self.customer_id}, item={self.item}, amount={self.amount}, time={self.time})>"
+
+    JSON_FIELDS = Order.JSON_FIELDS
+
+    def to_dict(self, fields=None):
+        return json_dict(self, self.JSON_FIELDS, fields)
+
+class SmsOutbox(db.Model):
+    """
+    SmsOutbox: Model to represent an SMS waiting to be (or already) sent by the SMS worker
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    id(int): Unique identifier for an outbox message; a PRIMARY KEY
+    order_id(int): The order the message confirms; a FOREIGN KEY, cleared if the order is deleted or archived
+    archived_order_id(int): The same order once it has moved to orders_archive; a FOREIGN KEY
+    phone_number(str): Recipient phone number
+    message(str): Text of the SMS
+    status(str): One of `pending`, `sending`, `sent` or `failed`
+    attempts(int): Number of send attempts made so far
+    next_attempt_at(datetime): Earliest time the message may be (re)tried
+    locked_until(datetime): Lease held by the worker that claimed the message
+    claim_token(str): Identifies the worker batch that currently holds the lease
+    last_error(str): Error from the most recent failed attempt
+    provider_message_id(str): Message id returned by Africa's Talking once sent
+    created_at(datetime): Timestamp of when the message was queued
+    sent_at(datetime): Timestamp of when the message was accepted by the provider
+    """
+    __tablename__ = 'sms_outbox'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='SET NULL'), nullable=True, index=True)
+    archived_order_id = db.Column(
+        db.Integer, db.ForeignKey('orders_archive.id', ondelete='SET NULL', name='fk_sms_outbox_archived_order_id_orders_archive'),
+        nullable=True, index=True
+    )
+    phone_number = db.Column(db.String(15), nullable=False)
+    message = db.Column(db.String(1000), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    claim_token = db.Column(db.String(36), nullable=True, index=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    provider_message_id = db.Column(db.String(100), nullable=True, index=True) # Joins delivery reports back to the order
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # The worker polls for due messages by status and time
+    __table_args__ = (db.Index('ix_sms_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),)
+
+    def __repr__(self):
+        return f"<SmsOutbox(id={self.id}, order_id={self.order_id}, status={self.status}, attempts={self.attempts})>"
+
     def to_dict(self):
         return {
             "id": self.id,
-            "customer_id": self.customer_id,
-            "item": self.item,
-            "amount": float(self.amount), # Ensure it's float for JSON serialization
-            "time": self.time.isoformat() if self.time else None # ISO format for datetime
-        }
\ No newline at end of file
+            "order_id": self.order_id if self.order_id is not None else self.archived_order_id,
+            "archived": self.archived_order_id is not None,
+            "phone_number": self.phone_number,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "provider_message_id": self.provider_message_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "sent_at": self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class SmsDeliveryReport(db.Model):
+    """
+    SmsDeliveryReport: Model to represent a delivery report posted by Africa's Talking
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    id(int): Unique identifier for a report; a PRIMARY KEY
+    provider_message_id(str): Message id the report is about; matches SmsOutbox.provider_message_id
+    status(str): Delivery status reported by the provider (e.g. `Success`, `Failed`, `Buffered`)
+    phone_number(str): Recipient phone number
+    network_code(str): Mobile network the message went through
+    failure_reason(str): Why delivery failed, when it did
+    retry_count(int): Number of delivery retries the provider made
+    received_at(datetime): Timestamp of when the webhook received the report
+    """
+    __tablename__ = 'sms_delivery_reports'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    provider_message_id = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    phone_number = db.Column(db.String(15), nullable=True)
+    network_code = db.Column(db.String(10), nullable=True)
+    failure_reason = db.Column(db.String(100), nullable=True)
+    retry_count = db.Column(db.Integer, nullable=True)
+    received_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    # A message's reports in arrival order, so the last one is its current status
+    __table_args__ = (db.Index('ix_sms_delivery_reports_provider_message_id_id', 'provider_message_id', 'id'),)
+
+    def __repr__(self):
+        return f"<SmsDeliveryReport(id={self.id}, provider_message_id={self.provider_message_id}, status={self.status})>"
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "phone_number": self.phone_number,
+            "network_code": self.network_code,
+            "failure_reason": self.failure_reason,
+            "retry_count": self.retry_count,
+            "received_at": self.received_at.isoformat() if self.received_at else None
+        }
+
+class InboundSms(db.Model):
+    """
+    InboundSms: Model to represent a processed SMS received on the shortcode
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    id(int): Unique identifier for an inbound message; a PRIMARY KEY
+    provider_message_id(str): Africa's Talking id of the message; UNIQUE, so a redelivered message is processed once
+    phone_number(str): Sender phone number
+    text(str): Message text
+    status(str): `ordered` if an order was placed, `failed` if processing raised an error, otherwise `rejected`
+    error(str): Why the message was rejected
+    order_id(int): The order the message placed; a FOREIGN KEY, cleared if the order is deleted or archived
+    archived_order_id(int): The same order once it has moved to orders_archive; a FOREIGN KEY
+    received_at(datetime): Timestamp of when the webhook received the message
+    processed_at(datetime): Timestamp of when the message was processed
+    """
+    __tablename__ = 'inbound_sms'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    provider_message_id = db.Column(db.String(100), unique=True, nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+    text = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    error = db.Column(db.String(255), nullable=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='SET NULL'), nullable=True, index=True)
+    archived_order_id = db.Column(
+        db.Integer, db.ForeignKey('orders_archive.id', ondelete='SET NULL', name='fk_inbound_sms_archived_order_id_orders_archive'),
+        nullable=True, index=True
+    )
+    received_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    processed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    def __repr__(self):
+        return f"<InboundSms(id={self.id}, provider_message_id={self.provider_message_id}, status={self.status})>"
+
+class OrderDailyRollup(db.Model):
+    """
+    OrderDailyRollup: Model to represent one customer's order totals for one day
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    day(date): Day the orders were placed (the date part of Order.time); part of the PRIMARY KEY
+    customer_id(int): Customer who placed the orders; part of the PRIMARY KEY, a FOREIGN KEY
+    order_count(int): Number of orders that day
+    amount_sum(decimal): Total amount of those orders
+    """
+    __tablename__ = 'order_daily_rollup'
+    day = db.Column(db.Date, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_sum = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    # The primary key serves day ranges; this serves one customer's series (and backs the foreign key)
+    __table_args__ = (db.Index('ix_order_daily_rollup_customer_id_day', 'customer_id', 'day'),)
+
+    def __repr__(self):
+        return f"<OrderDailyRollup(day={self.day}, customer_id={self.customer_id}, order_count={self.order_count}, amount_sum={self.amount_sum})>"
+
+class StoredSession(db.Model):
+    """
+    StoredSession: Model to represent a server-side login session (see auth/session_store.py)
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    sid(str): The random id carried by the session cookie; a PRIMARY KEY
+    data(str): The serialized session (Google profile and access token)
+    expires_at(float): Unix time after which the session is no longer valid
+    """
+    __tablename__ = 'sessions'
+    sid = db.Column(db.String(32), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.Double, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<StoredSession(sid={self.sid[:6]}..., expires_at={self.expires_at})>"
+
+# Tables whose list/detail responses carry ETags derived from a TableVersion counter
+VERSIONED_TABLES = ('customers', 'orders')
+# TableVersion row counting deleted sessions, which tells every worker to stop trusting its cached copies
+SESSION_REVOCATIONS = 'sessions'
+
+class TableVersion(db.Model):
+    """
+    TableVersion: Model to represent the write counter of a versioned table
+    -----------
+    Paramaters:
+    db.Model - A parameter for initializing models in flask's SQLAlchemy
+
+    -----------
+    Attributes/Column Names:
+    -----------
+    table_name(str): Name of the tracked table; a PRIMARY KEY
+    version(int): Incremented in the same transaction as every write to the table (for `sessions`, every deletion)
+    """
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TableVersion(table_name={self.table_name}, version={self.version})>"
+
+@db.event.listens_for(TableVersion.__table__, 'after_create')
+def seed_table_versions(target, connection, **kw):
+    # db.create_all() (tests, AUTO_CREATE_TABLES) needs the counter rows the migration inserts
+    connection.execute(target.insert(), [{"table_name": name, "version": 0} for name in (*VERSIONED_TABLES, SESSION_REVOCATIONS)])
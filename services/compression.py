@@ -0,0 +1,245 @@
+from flask import current_app, request, send_from_directory  # type: ignore
+from flask.cli import with_appcontext  # type: ignore
+from werkzeug.security import safe_join  # type: ignore
+import click
+import gzip
+import logging
+import mimetypes
+import os
+import zlib
+
+try:
+    import brotli  # type: ignore
+except ImportError: # Optional; without it only gzip is offered
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing; images, fonts and archives are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml",
+    "text/css", "text/csv", "text/html", "text/javascript", "text/plain", "text/xml",
+}
+
+# Precompressed static files sit next to the original with these suffixes, in order of preference
+STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encodings, offered):
+    """
+    The coding from `offered` (in server preference order) the client's Accept-Encoding rates highest, or None
+    """
+    best, best_quality = None, 0
+    for coding in offered:
+        quality = accept_encodings[coding] # Honours `*` and `;q=0`
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31: gzip header and trailer
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compress_stream(chunks, stream):
+    """
+    Compresses a streamed body chunk by chunk. Each chunk the view yields is flushed, so the client receives
+    data as soon as it is produced; views already yield in batches, which keeps the ratio close to one-shot.
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = stream.compress(chunk) + stream.flush()
+            if data:
+                yield data
+        yield stream.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class ResponseCompressor:
+    """
+    Compresses responses with gzip or brotli, whichever the client's Accept-Encoding prefers (brotli on ties).
+
+    Only textual responses are compressed, and only when the body is at least `min_bytes` and shrinks.
+    Streamed bodies (exports) are always compressed, since their size is not known up front.
+    File responses are left alone; static assets are served precompressed by `serve_precompressed_static`.
+    A compressed response's ETag is made weak, since its bytes differ from the uncompressed representation.
+    """
+    def __init__(self, min_bytes=1024, gzip_level=6, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            min_bytes=config.get("COMPRESS_MIN_BYTES", 1024),
+            gzip_level=config.get("COMPRESS_GZIP_LEVEL", 6),
+            brotli_quality=config.get("COMPRESS_BROTLI_QUALITY", 4)
+        )
+
+    def compressible(self, response):
+        return (
+            request.method != "HEAD"
+            and 200 <= response.status_code < 300 and response.status_code not in (204, 206)
+            and not response.direct_passthrough
+            and "Content-Encoding" not in response.headers
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and "no-transform" not in response.headers.get("Cache-Control", "")
+        )
+
+    def compress(self, coding, data):
+        if coding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def stream(self, coding):
+        return _BrotliStream(self.brotli_quality) if coding == "br" else _GzipStream(self.gzip_level)
+
+    def __call__(self, response):
+        if not self.compressible(response):
+            return response
+        if not response.is_streamed and response.calculate_content_length() < self.min_bytes:
+            return response # Below the threshold the response is the same whatever the client accepts
+
+        response.vary.add("Accept-Encoding")
+        coding = negotiate(request.accept_encodings, available_encodings())
+        if coding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, self.stream(coding))
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            compressed = self.compress(coding, data)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+        response.headers["Content-Encoding"] = coding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def serve_precompressed_static(app):
+    """
+    Wraps the static view so `style.css` is answered from `style.css.br` / `style.css.gz` when the client
+    accepts that encoding and the file was built by `flask compress-static`
+    """
+    static_view = app.view_functions.get("static")
+    if static_view is None or not app.static_folder:
+        return
+
+    def static(filename):
+        original = safe_join(app.static_folder, filename)
+        if original is None or not os.path.isfile(original):
+            return static_view(filename=filename) # Lets the stock view answer 404
+        variants = {}
+        for coding, suffix in STATIC_ENCODINGS:
+            path = safe_join(app.static_folder, filename + suffix)
+            # A copy older than the file was built before its last edit; never serve it
+            if path is not None and os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(original):
+                variants[coding] = filename + suffix
+        if not variants:
+            return static_view(filename=filename)
+
+        coding = negotiate(request.accept_encodings, list(variants))
+        if coding is None:
+            response = static_view(filename=filename)
+        else:
+            response = send_from_directory(
+                app.static_folder, variants[coding],
+                mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                max_age=app.get_send_file_max_age(filename)
+            )
+            response.headers["Content-Encoding"] = coding
+        response.vary.add("Accept-Encoding")
+        return response
+
+    app.view_functions["static"] = static
+
+
+def init_compression(app):
+    """
+    Compresses eligible responses (when COMPRESS_RESPONSES is on) and serves precompressed static assets
+    """
+    if app.config.get("COMPRESS_RESPONSES", True):
+        app.after_request(ResponseCompressor.from_config(app.config))
+    serve_precompressed_static(app)
+
+
+def precompress_directory(directory, min_bytes=256):
+    """
+    Writes maximally compressed `.gz` (and, with brotli installed, `.br`) copies of every compressible file under
+    `directory`, keeping only those that are smaller than the original. Returns the paths written.
+    """
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith((".gz", ".br")) or mimetypes.guess_type(name)[0] not in COMPRESSIBLE_MIMETYPES:
+                continue
+            with open(path, "rb") as source:
+                data = source.read()
+            if len(data) < min_bytes:
+                continue
+            outputs = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs[".br"] = brotli.compress(data, quality=11, mode=brotli.MODE_TEXT)
+            for suffix, compressed in outputs.items():
+                target = path + suffix
+                if len(compressed) < len(data):
+                    with open(target, "wb") as output:
+                        output.write(compressed)
+                    written.append(target)
+                elif os.path.exists(target):
+                    os.remove(target) # A stale copy of an older version would be served instead
+    return written
+
+
+@click.command('compress-static')
+@with_appcontext
+def compress_static_command():
+    """
+    Precompresses the static assets (run at build time, after any change to static/).
+    """
+    written = precompress_directory(current_app.static_folder)
+    for path in written:
+        click.echo(f"Wrote {os.path.relpath(path, current_app.static_folder)} ({os.path.getsize(path)} bytes)")
+    if brotli is None:
+        click.echo("brotli is not installed; only .gz files were written.")
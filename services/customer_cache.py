@@ -0,0 +1,262 @@
+from flask import current_app  # type: ignore
+from models import db, Customer
+from sqlalchemy import select
+from collections import OrderedDict
+from typing import NamedTuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CachedCustomer(NamedTuple):
+    """
+    Read-only snapshot of a customer row, safe to share between requests and threads.
+    It has the attributes templates and `enqueue_order_confirmation` use on a Customer.
+    """
+    id: int
+    name: str
+    phone_number: str
+    code: str
+
+    def to_dict(self):
+        return self._asdict()
+
+
+class LRUCache:
+    """
+    Bounded in-process cache: least recently used entries are evicted past `max_entries`,
+    and entries older than `ttl` seconds are treated as misses
+    """
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    Key/value store in a local SQLite file, shared by every gunicorn worker on the host.
+    Values are JSON; each thread (and each forked process) opens its own connection.
+    """
+    SWEEP_EVERY = 1000 # Writes between purges of expired rows
+
+    def __init__(self, path, ttl=60):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, *keys):
+        self._connection().executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+
+class CustomerCache:
+    """
+    Read-through cache of customers by id, phone_number and code.
+
+    Lookups try the in-process LRU, then the shared backend (if configured), then the database; a row
+    loaded from the database is stored under all three keys. Misses are not cached, so a newly
+    registered customer is found immediately. Writers call `invalidate` after committing. Another
+    worker's in-process copy can stay stale for at most `ttl` seconds.
+    """
+    def __init__(self, max_entries=10000, ttl=60, shared_path=None):
+        self.local = LRUCache(max_entries, ttl)
+        self.shared = SQLiteCacheBackend(shared_path, ttl) if shared_path else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_entries=config.get("CUSTOMER_CACHE_MAX_ENTRIES", 10000),
+            ttl=config.get("CUSTOMER_CACHE_TTL_SECONDS", 60),
+            shared_path=config.get("CUSTOMER_CACHE_SHARED_PATH")
+        )
+
+    def get_by_id(self, customer_id):
+        try:
+            customer_id = int(customer_id)
+        except (TypeError, ValueError):
+            return None
+        return self._get(f"id:{customer_id}", Customer.id, customer_id)
+
+    def get_by_phone(self, phone_number):
+        return self._get(f"phone:{phone_number}", Customer.phone_number, phone_number)
+
+    def get_by_code(self, code):
+        return self._get(f"code:{code}", Customer.code, code)
+
+    def _get(self, key, column, value):
+        customer = self.local.get(key)
+        if customer is not None:
+            self._count("hits")
+            return customer
+
+        if self.shared is not None:
+            try:
+                data = self.shared.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared customer cache read failed: {e}")
+                data = None
+            if data is not None:
+                self._count("shared_hits")
+                customer = CachedCustomer(**data)
+                self.local.set(key, customer)
+                return customer
+
+        self._count("misses")
+        row = db.session.execute(
+            select(Customer.id, Customer.name, Customer.phone_number, Customer.code).where(column == value)
+        ).first()
+        if row is None:
+            return None
+        customer = CachedCustomer(*row)
+        self._store(customer)
+        return customer
+
+    def _store(self, customer):
+        keys = self._keys(customer)
+        for key in keys:
+            self.local.set(key, customer)
+        if self.shared is not None:
+            try:
+                for key in keys:
+                    self.shared.set(key, customer.to_dict())
+            except sqlite3.Error as e:
+                logger.warning(f"Shared customer cache write failed: {e}")
+
+    def invalidate(self, *customers):
+        """
+        Drops every key of the given customers (Customer rows or CachedCustomer snapshots).
+        Pass the pre-update snapshot as well as the updated row when phone_number or code changed.
+        """
+        keys = [key for customer in customers if customer is not None for key in self._keys(customer)]
+        self.local.delete(*keys)
+        if self.shared is not None:
+            try:
+                self.shared.delete(*keys)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared customer cache invalidation failed: {e}")
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            try:
+                self.shared.clear()
+            except sqlite3.Error as e:
+                logger.warning(f"Shared customer cache clear failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.local.evictions,
+                "expirations": self.local.expirations,
+                "entries": len(self.local),
+                "max_entries": self.local.max_entries,
+                "ttl_seconds": self.local.ttl,
+                "shared_backend": self.shared.path if self.shared is not None else None,
+            }
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _keys(customer):
+        return (f"id:{customer.id}", f"phone:{customer.phone_number}", f"code:{customer.code}")
+
+
+def snapshot(customer):
+    """
+    CachedCustomer copy of a Customer row's current values
+    """
+    return CachedCustomer(customer.id, customer.name, customer.phone_number, customer.code)
+
+
+def customer_cache():
+    """
+    The current app's CustomerCache
+    """
+    return current_app.extensions['customer_cache']
@@ -0,0 +1,124 @@
+from models import db, Customer, normalize_phone
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import csv
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("name", "phone_number", "code")
+MAX_REPORTED_ERRORS = 100
+
+
+def import_customers_csv(text_stream, chunk_size=1000, after_commit=None):
+    """
+    Upserts customers from a CSV text stream with `name,phone_number,code` columns, `chunk_size` rows at a time.
+    -----------
+    Parameters:
+    text_stream - File-like object yielding CSV lines; it is read incrementally, never all at once
+    chunk_size(int): Rows classified and written per round trip
+    after_commit - Called with no arguments after each chunk is committed
+
+    A row whose phone_number or code matches an existing customer updates that customer; otherwise it is inserted.
+    Rows that are incomplete, too long, repeat a key already seen in the same chunk, or whose phone_number and code
+    belong to two different customers are rejected. Each chunk is committed on its own, so a failure part way
+    through keeps the chunks already imported.
+    Returns a dict with `inserted`, `updated` and `rejected` counts and up to MAX_REPORTED_ERRORS row `errors`.
+    """
+    reader = csv.DictReader(text_stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    summary = {"inserted": 0, "updated": 0, "rejected": 0, "errors": []}
+    # Line 1 is the header, so data rows start on line 2
+    numbered_rows = enumerate(reader, start=2)
+    while True:
+        chunk = list(itertools.islice(numbered_rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, summary)
+        db.session.commit()
+        if after_commit is not None:
+            after_commit()
+
+    logger.info(f"Customer import finished: {summary['inserted']} inserted, {summary['updated']} updated, {summary['rejected']} rejected.")
+    return summary
+
+
+def _reject(summary, line, error):
+    summary["rejected"] += 1
+    if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+        summary["errors"].append({"line": line, "error": error})
+
+
+def _import_chunk(chunk, summary):
+    rows = []
+    seen_phones, seen_codes = set(), set()
+    for line, raw in chunk:
+        row = {column: (raw.get(column) or "").strip() for column in REQUIRED_COLUMNS}
+        if not all(row.values()):
+            _reject(summary, line, "Missing customer details (name, phone_number, code are required)")
+        elif len(row["name"]) > 255 or len(row["phone_number"]) > 15 or len(row["code"]) > 50:
+            _reject(summary, line, "Value too long (name <= 255, phone_number <= 15, code <= 50 characters)")
+        elif row["phone_number"] in seen_phones or row["code"] in seen_codes:
+            _reject(summary, line, "Duplicate phone_number or code earlier in the file")
+        else:
+            seen_phones.add(row["phone_number"])
+            seen_codes.add(row["code"])
+            row["phone_digits"] = normalize_phone(row["phone_number"])
+            rows.append((line, row))
+    if not rows:
+        return
+
+    # One lookup per chunk tells inserts from updates and catches rows that would merge two customers
+    existing = db.session.execute(
+        select(Customer.id, Customer.phone_number, Customer.code).where(or_(
+            Customer.phone_number.in_(seen_phones),
+            Customer.code.in_(seen_codes)
+        ))
+    ).all()
+    id_by_phone = {customer.phone_number: customer.id for customer in existing}
+    id_by_code = {customer.code: customer.id for customer in existing}
+
+    by_phone, by_code = [], [] # rows whose conflict (if any) is on phone_number / only on code
+    for line, row in rows:
+        phone_match = id_by_phone.get(row["phone_number"])
+        code_match = id_by_code.get(row["code"])
+        if phone_match and code_match and phone_match != code_match:
+            _reject(summary, line, "phone_number and code belong to different customers")
+            continue
+        summary["updated" if phone_match or code_match else "inserted"] += 1
+        (by_code if code_match and not phone_match else by_phone).append(row)
+
+    _upsert(by_phone, "phone_number")
+    _upsert(by_code, "code")
+
+
+def _upsert(rows, conflict_column):
+    """
+    Multi-row INSERT that updates the existing customer when `conflict_column` (a unique column) collides
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        # ON DUPLICATE KEY UPDATE fires on either unique key, so conflict_column needs no special handling
+        statement = mysql_insert(Customer)
+        statement = statement.on_duplicate_key_update(
+            name=statement.inserted.name,
+            phone_number=statement.inserted.phone_number,
+            code=statement.inserted.code,
+            phone_digits=statement.inserted.phone_digits
+        )
+    elif dialect == "sqlite":
+        statement = sqlite_insert(Customer)
+        statement = statement.on_conflict_do_update(
+            index_elements=[conflict_column],
+            set_={column: statement.excluded[column] for column in REQUIRED_COLUMNS + ("phone_digits",)}
+        )
+    else:
+        raise NotImplementedError(f"Customer import does not support the {dialect} dialect")
+    db.session.execute(statement, rows)
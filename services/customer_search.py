@@ -0,0 +1,253 @@
+from flask import current_app  # type: ignore
+from models import db, Customer, normalize_phone
+from services.customer_cache import CachedCustomer
+from services.table_versions import table_versions
+from sqlalchemy import select
+import bisect
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# A query made only of these characters is also matched against phone numbers, by its digits
+PHONE_QUERY = re.compile(r"^[\d\s+()-]+$")
+
+# Match kinds, best first; results are ordered by kind, then by the value matched, then by id
+EXACT_CODE, CODE_PREFIX, PHONE_PREFIX, NAME_PREFIX, NAME_WORD_PREFIX = range(5)
+
+
+def search_terms(query):
+    """
+    (text, digits) to match for a raw search query: the lowercased text, and its digits if it looks like a phone number
+    """
+    query = (query or "").strip()
+    digits = normalize_phone(query) if PHONE_QUERY.match(query) else ""
+    return query.lower(), digits
+
+
+def match_rank(customer, text, digits):
+    """
+    Sort key of `customer` for the query, or None if it does not match.
+    `customer` is anything with name, phone_number and code (a Customer row or a CachedCustomer).
+    """
+    code = customer.code.lower()
+    name = customer.name.lower()
+    if code == text:
+        return (EXACT_CODE, code, customer.id)
+    if code.startswith(text):
+        return (CODE_PREFIX, code, customer.id)
+    if digits:
+        phone = normalize_phone(customer.phone_number)
+        if phone.startswith(digits):
+            return (PHONE_PREFIX, phone, customer.id)
+    if name.startswith(text):
+        return (NAME_PREFIX, name, customer.id)
+    if any(word.startswith(text) for word in name.split()[1:]):
+        return (NAME_WORD_PREFIX, name, customer.id)
+    return None
+
+
+def search_customers(query, limit=10):
+    """
+    Up to `limit` customers whose code, phone number (digits only) or name starts with `query`, best match first:
+    an exact code, then code prefixes, phone prefixes and name prefixes. Uses the in-process index when it is
+    enabled (which also matches the start of later words in a name), otherwise indexed prefix queries.
+    """
+    text, digits = search_terms(query)
+    if not text:
+        return []
+    index = customer_search()
+    if index is not None:
+        return index.search(text, digits, limit)
+    return _search_database(text, digits, limit)
+
+
+def _like_prefix(value):
+    # Escape LIKE wildcards so "50%" finds codes starting with "50%", not everything starting with "50"
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _search_database(text, digits, limit):
+    """
+    One index range scan per match kind, best kind first, stopping once `limit` customers are found.
+    Each scan is a plain `column LIKE 'prefix%'`, which MySQL serves from the column's index.
+    """
+    criteria = [(Customer.code, _like_prefix(text))]
+    if digits:
+        criteria.append((Customer.phone_digits, _like_prefix(digits)))
+    criteria.append((Customer.name, _like_prefix(text)))
+
+    found = {}
+    for column, pattern in criteria:
+        if len(found) >= limit:
+            break
+        rows = db.session.execute(
+            select(Customer.id, Customer.name, Customer.phone_number, Customer.code)
+            .where(column.like(pattern, escape="\\"))
+            .order_by(column, Customer.id)
+            .limit(limit + len(found)) # Rows already found by a better kind may come back again
+        ).all()
+        for row in rows:
+            found.setdefault(row.id, CachedCustomer(*row))
+
+    ranked = [(match_rank(customer, text, digits), customer) for customer in found.values()]
+    ranked = sorted((rank, customer) for rank, customer in ranked if rank is not None)
+    return [customer for _, customer in ranked[:limit]]
+
+
+class CustomerSearchIndex:
+    """
+    In-process prefix index over every customer's code, phone digits, name and the words of the name.
+
+    Keys are kept in one sorted list of (field, token, id) tuples, so a prefix lookup is a binary search
+    followed by a short forward scan. The index is loaded on first search. Writers in this process call
+    `add`/`remove` after committing; writes made by other workers are picked up by a reload when the
+    customers table version has moved, checked at most every `refresh_seconds`.
+    """
+    def __init__(self, refresh_seconds=60):
+        self.refresh_seconds = refresh_seconds
+        self._customers = {}
+        self._keys = []
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loads = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(refresh_seconds=config.get("CUSTOMER_SEARCH_REFRESH_SECONDS", 60))
+
+    def search(self, text, digits, limit):
+        self._refresh_if_stale()
+        fields = [("code", text)]
+        if digits:
+            fields.append(("phone", digits))
+        fields += [("name", text), ("word", text)]
+
+        found = {}
+        with self._lock:
+            for field, prefix in fields:
+                if len(found) >= limit:
+                    break
+                # Tokens sort by the value matched, so the first `limit` unseen ids are this field's best
+                wanted = limit + len(found)
+                position = bisect.bisect_left(self._keys, (field, prefix))
+                seen = 0
+                while position < len(self._keys) and seen < wanted:
+                    key_field, token, customer_id = self._keys[position]
+                    if key_field != field or not token.startswith(prefix):
+                        break
+                    found.setdefault(customer_id, self._customers[customer_id])
+                    seen += 1
+                    position += 1
+
+        ranked = [(match_rank(customer, text, digits), customer) for customer in found.values()]
+        ranked = sorted((rank, customer) for rank, customer in ranked if rank is not None)
+        return [customer for _, customer in ranked[:limit]]
+
+    def add(self, *customers):
+        """
+        Indexes new or updated customers (Customer rows or CachedCustomer snapshots)
+        """
+        with self._lock:
+            if self._version is None:
+                return # Not loaded yet; the first search loads everything
+            for customer in customers:
+                self._remove(customer.id)
+                customer = CachedCustomer(customer.id, customer.name, customer.phone_number, customer.code)
+                self._customers[customer.id] = customer
+                for key in self._index_keys(customer):
+                    bisect.insort(self._keys, key)
+
+    def remove(self, *customer_ids):
+        with self._lock:
+            for customer_id in customer_ids:
+                self._remove(customer_id)
+
+    def invalidate(self):
+        """
+        Reloads everything on the next search (after writes too large to apply one by one, like an import)
+        """
+        with self._lock:
+            self._version = None
+
+    def _remove(self, customer_id):
+        customer = self._customers.pop(customer_id, None)
+        if customer is None:
+            return
+        for key in self._index_keys(customer):
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    @staticmethod
+    def _index_keys(customer):
+        name_words = customer.name.lower().split()
+        keys = {
+            ("code", customer.code.lower(), customer.id),
+            ("phone", normalize_phone(customer.phone_number), customer.id),
+            ("name", customer.name.lower(), customer.id),
+        }
+        keys.update(("word", word, customer.id) for word in name_words[1:])
+        return keys
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._load_lock:
+            if self._version is not None and now - self._checked_at < self.refresh_seconds:
+                return # Another thread refreshed while this one waited
+            # Read the version first: a write racing the load moves it again and is picked up next time
+            version = table_versions("customers").get("customers")
+            if version != self._version:
+                self._load(version)
+            self._checked_at = now
+
+    def _load(self, version):
+        customers = {}
+        keys = []
+        result = db.session.execute(
+            select(Customer.id, Customer.name, Customer.phone_number, Customer.code)
+            .execution_options(yield_per=5000)
+        )
+        for row in result:
+            customer = CachedCustomer(*row)
+            customers[customer.id] = customer
+            keys.extend(self._index_keys(customer))
+        keys.sort()
+        with self._lock:
+            self._customers, self._keys, self._version = customers, keys, version
+        self.loads += 1
+        logger.info(f"Customer search index loaded {len(customers)} customers.")
+
+
+def customer_search():
+    """
+    The current app's CustomerSearchIndex, or None when CUSTOMER_SEARCH_INDEX is off
+    """
+    return current_app.extensions.get('customer_search')
+
+
+def index_customers(*customers):
+    """
+    Applies registered or updated customers to this process's index, if it is enabled; call after committing
+    """
+    index = customer_search()
+    if index is not None:
+        index.add(*customers)
+
+
+def unindex_customers(*customer_ids):
+    index = customer_search()
+    if index is not None:
+        index.remove(*customer_ids)
+
+
+def reindex_customers():
+    index = customer_search()
+    if index is not None:
+        index.invalidate()
@@ -1,5 +1,9 @@
-import MySQLdb # type: ignore
+from flask.cli import with_appcontext  # type: ignore
 from config import Config
+from models import db, Customer, Order, OrderArchive, SmsOutbox
+from sqlalchemy import and_, or_, select
+from datetime import datetime
+import click
 import os
 import logging
 
@@ -14,6 +18,7 @@ def create_database():
         return
 
     try:
+        import MySQLdb # type: ignore # Imported here so app startup never loads the driver
         connection = MySQLdb.connect(
             host=Config.MYSQL_HOST,
             user=Config.MYSQL_USER,
@@ -31,4 +36,62 @@ def create_database():
     except Exception as e:
         logger.error(f"Error connecting to MySQL or creating database: {e}", exc_info=True)
         # In a real app, raise this error or handle it more gracefully
-        # to prevent the app from starting if the DB isn't available.
\ No newline at end of file
+        # to prevent the app from starting if the DB isn't available.
+
+@click.command('create-db')
+@with_appcontext
+def create_database_command():
+    """
+    Creates the MySQL database named by MYSQL_DB if it does not exist yet.
+    """
+    create_database()
+
+
+def hot_queries(customer_id=1, limit=50):
+    """
+    The queries behind the busiest endpoints, as (label, SQLAlchemy statement) pairs
+    """
+    newest_first = (Order.time.desc(), Order.id.desc())
+    cursor_time, cursor_id = datetime(2024, 1, 1), 1000
+    seek = or_(Order.time < cursor_time, and_(Order.time == cursor_time, Order.id < cursor_id))
+    return [
+        ("view_orders: first page", select(Order).order_by(*newest_first).limit(limit + 1)),
+        ("view_orders: next page", select(Order).where(seek).order_by(*newest_first).limit(limit + 1)),
+        ("view_orders/<customer_id>: first page",
+            select(Order).where(Order.customer_id == customer_id).order_by(*newest_first).limit(limit + 1)),
+        ("view_orders/<customer_id>: next page",
+            select(Order).where(Order.customer_id == customer_id, seek).order_by(*newest_first).limit(limit + 1)),
+        ("view_customers: next page", select(Customer).where(Customer.id > cursor_id).order_by(Customer.id).limit(limit + 1)),
+        ("customers/search: code prefix", select(Customer).where(Customer.code.like("cust%")).order_by(Customer.code, Customer.id).limit(10)),
+        ("customers/search: phone prefix",
+            select(Customer).where(Customer.phone_digits.like("254700%")).order_by(Customer.phone_digits, Customer.id).limit(10)),
+        ("customers/search: name prefix", select(Customer).where(Customer.name.like("jo%")).order_by(Customer.name, Customer.id).limit(10)),
+        ("view_orders?include_archived: archive page",
+            select(OrderArchive)
+            .where(or_(OrderArchive.time < cursor_time, and_(OrderArchive.time == cursor_time, OrderArchive.id < cursor_id)))
+            .order_by(OrderArchive.time.desc(), OrderArchive.id.desc()).limit(limit + 1)),
+        ("archive-orders: next batch", select(Order.id).where(Order.time < cursor_time).order_by(Order.time, Order.id).limit(1000)),
+        ("sms-worker: claim candidates",
+            select(SmsOutbox.id).where(SmsOutbox.status == 'pending', SmsOutbox.next_attempt_at <= cursor_time)
+            .order_by(SmsOutbox.next_attempt_at, SmsOutbox.id).limit(limit)),
+    ]
+
+
+@click.command('explain-queries')
+@click.option('--customer-id', default=1, help='Customer id to use in per-customer queries.')
+@with_appcontext
+def explain_queries_command(customer_id):
+    """
+    Prints the database's EXPLAIN plan for each hot query so index regressions are visible.
+    """
+    dialect = db.engine.dialect
+    explain = "EXPLAIN QUERY PLAN" if dialect.name == "sqlite" else "EXPLAIN"
+    with db.engine.connect() as connection:
+        for label, statement in hot_queries(customer_id=customer_id):
+            sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            click.echo(f"== {label}\n{sql}")
+            result = connection.exec_driver_sql(f"{explain} {sql}")
+            click.echo("\t".join(result.keys()))
+            for row in result:
+                click.echo("\t".join(str(value) for value in row))
+            click.echo()
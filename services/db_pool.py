@@ -0,0 +1,191 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the checkout wait histogram buckets; the last bucket catches everything slower
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolStats:
+    """
+    Thread-safe counters for one engine's connection pool, fed by pool events
+    -----------
+    Attributes:
+    checkouts, checkins, connects, invalidations, soft_invalidations, timeouts(int): Event counts since startup
+    in_use(int): Connections currently checked out; peak_in_use is the highest value seen
+    wait_*: Time spent waiting for a connection on checkout (only measured by InstrumentedQueuePool)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            index = next((i for i, bound in enumerate(WAIT_BUCKETS) if seconds <= bound), len(WAIT_BUCKETS))
+            self.wait_buckets[index] += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+        logger.warning(f"Database connection invalidated: {exception}")
+
+    def on_soft_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.soft_invalidations += 1
+
+    def snapshot(self, pool=None):
+        """
+        Returns the counters as a dict, plus the live state of `pool` when given
+        """
+        with self._lock:
+            labels = [f"le_{bound}" for bound in WAIT_BUCKETS] + ["le_inf"]
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "checkout_wait": {
+                    "count": self.wait_count,
+                    "total_seconds": round(self.wait_total, 6),
+                    "avg_seconds": round(self.wait_total / self.wait_count, 6) if self.wait_count else 0.0,
+                    "max_seconds": round(self.wait_max, 6),
+                    "buckets": dict(zip(labels, self.wait_buckets)),
+                },
+            }
+        if pool is not None:
+            data["pool"] = pool_status(pool)
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that times how long each checkout waits for a connection (including opening a new one).
+    There is no pool event fired before a checkout starts, so the wait is measured around `_do_get`.
+    """
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats or PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            logger.error(f"Connection pool exhausted: {self.status()}")
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() (e.g. after a gunicorn fork) swaps in a new pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def pool_status(pool):
+    """
+    Live pool state; sizing figures are only available on queue-based pools
+    """
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    return status
+
+
+def pool_engine_options(config):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings in `config`.
+    Options set explicitly in config["SQLALCHEMY_ENGINE_OPTIONS"] win. In-memory SQLite keeps
+    Flask-SQLAlchemy's single static connection, which takes no sizing options.
+    """
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.setdefault("poolclass", InstrumentedQueuePool)
+    options.setdefault("pool_size", config.get("DB_POOL_SIZE", 5))
+    options.setdefault("max_overflow", config.get("DB_MAX_OVERFLOW", 10))
+    options.setdefault("pool_timeout", config.get("DB_POOL_TIMEOUT", 30))
+    options.setdefault("pool_recycle", config.get("DB_POOL_RECYCLE", -1))
+    options.setdefault("pool_pre_ping", config.get("DB_POOL_PRE_PING", False))
+    return options
+
+
+def instrument_engine(engine):
+    """
+    Attaches pool event listeners to `engine` and returns the PoolStats they update.
+    Listeners registered on the engine carry over when the pool is recreated by `engine.dispose()`.
+    """
+    stats = getattr(engine.pool, "stats", None) or PoolStats()
+    event.listen(engine, "checkout", stats.on_checkout)
+    event.listen(engine, "checkin", stats.on_checkin)
+    event.listen(engine, "connect", stats.on_connect)
+    event.listen(engine, "invalidate", stats.on_invalidate)
+    event.listen(engine, "soft_invalidate", stats.on_soft_invalidate)
+    return stats
+
+
+def enforce_foreign_keys(engine):
+    """
+    Turns on SQLite's foreign key enforcement (off by default) for every connection `engine` opens, so
+    ON DELETE CASCADE / SET NULL behave as they do on MySQL. Other databases are left as they are.
+    """
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
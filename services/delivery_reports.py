@@ -0,0 +1,171 @@
+from models import db, SmsDeliveryReport, utcnow
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from collections import deque
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _text(data, key, length):
+    value = str(data.get(key) or "").strip()
+    return value[:length] or None
+
+
+MAX_RETRY_COUNT = 2**31 - 1 # Largest value the INT retry_count column holds on MySQL
+
+
+def report_values(data):
+    """
+    Column values for a delivery report from the webhook payload (Africa's Talking posts form fields).
+    Returns None if the payload has no message id or status, or a retryCount that is not a count the column holds.
+    """
+    message_id = _text(data, "id", 100)
+    status = _text(data, "status", 20)
+    if not message_id or not status:
+        return None
+    retry_count = str(data.get("retryCount") or "").strip() or None
+    if retry_count is not None and not (retry_count.isdigit() and int(retry_count) <= MAX_RETRY_COUNT):
+        return None
+    return {
+        "provider_message_id": message_id,
+        "status": status,
+        "phone_number": _text(data, "phoneNumber", 15),
+        "network_code": _text(data, "networkCode", 10),
+        "failure_reason": _text(data, "failureReason", 100),
+        "retry_count": int(retry_count) if retry_count is not None else None,
+        "received_at": utcnow()
+    }
+
+
+class DeliveryReportBuffer:
+    """
+    Collects delivery reports in memory and writes them with multi-row INSERTs from a background thread.
+
+    The webhook only appends, so it acknowledges without touching the database. The flusher writes when
+    `batch_size` reports are waiting or every `flush_interval` seconds. With `flush_interval` of 0 there is
+    no thread and every `add` writes straight away. Reports still buffered when a worker is killed are lost,
+    and a full buffer refuses new reports so the provider retries them later.
+
+    A batch the database rejects is written again row by row, so one bad report cannot hold up the others.
+    A report that still fails is retried on later flushes and dropped (and logged) after `max_attempts`.
+    While the database is unreachable nothing is counted against the reports; they wait in the buffer.
+    """
+    def __init__(self, app, batch_size=500, flush_interval=1.0, max_pending=10000, max_attempts=3):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock() # One writer at a time keeps reports in arrival order
+        self._thread = None
+        self._pid = None
+        self._attempts = {} # id() of a queued report -> failed attempts so far
+        self.written = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def add(self, values):
+        """
+        Queues one report's column values; returns False if the buffer is full
+        """
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending.append(values)
+            pending = len(self._pending)
+        if self.flush_interval <= 0:
+            self.flush()
+        else:
+            self._ensure_flusher()
+            if pending >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def flush(self):
+        """
+        Writes every queued report, `batch_size` rows per INSERT, and returns how many were written
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return written
+                with self.app.app_context():
+                    try:
+                        db.session.execute(insert(SmsDeliveryReport), batch)
+                        db.session.commit()
+                        stored, retry = len(batch), []
+                        for values in batch:
+                            self._attempts.pop(id(values), None)
+                    except OperationalError as e:
+                        db.session.rollback()
+                        logger.error(f"Could not store {len(batch)} delivery reports, will retry: {e}", exc_info=True)
+                        stored, retry = 0, batch
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.warning(f"Could not store {len(batch)} delivery reports in one batch, writing them one by one: {e}")
+                        stored, retry = self._write_rows(batch)
+                written += stored
+                self.written += stored
+                if retry:
+                    with self._lock:
+                        self._pending.extendleft(reversed(retry))
+                    return written
+
+    def _write_rows(self, batch):
+        """
+        Writes `batch` one report per transaction; returns how many were stored and the reports to retry later
+        """
+        stored, retry = 0, []
+        for position, values in enumerate(batch):
+            try:
+                db.session.execute(insert(SmsDeliveryReport), values)
+                db.session.commit()
+                self._attempts.pop(id(values), None)
+                stored += 1
+            except OperationalError as e:
+                db.session.rollback()
+                logger.error(f"Could not store delivery reports, will retry: {e}", exc_info=True)
+                return stored, retry + batch[position:]
+            except Exception as e:
+                db.session.rollback()
+                attempts = self._attempts.get(id(values), 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(id(values), None)
+                    self.dropped += 1
+                    logger.error(f"Dropping delivery report after {attempts} failed attempts: {values}: {e}")
+                else:
+                    self._attempts[id(values)] = attempts
+                    retry.append(values)
+        return stored, retry
+
+    def pending(self):
+        return len(self._pending)
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so a preloaded app starts its flusher in each worker on first use
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="delivery-report-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
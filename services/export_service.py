@@ -0,0 +1,58 @@
+from models import db
+import csv
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def stream_rows(statement, fieldnames, fmt, batch_size=1000):
+    """
+    Generator that executes `statement` with a server-side cursor and yields it as NDJSON or CSV text.
+    -----------
+    Parameters:
+    statement - A SQLAlchemy `select()` of plain columns (no ORM entities, so nothing is tracked in the session)
+    fieldnames(list): Output field names, in the same order as the selected columns
+    fmt(str): One of `EXPORT_FORMATS`
+    batch_size(int): Rows fetched from the server per round trip; memory stays bounded by this
+
+    Values are converted the same way as `Customer.to_dict` / `Order.to_dict`.
+    """
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(fieldnames)
+
+    count = 0
+    for partition in result.partitions():
+        for row in partition:
+            values = [_to_json_value(value) for value in row]
+            if writer:
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(fieldnames, values)), separators=(",", ":")))
+                buffer.write("\n")
+        count += len(partition)
+        # Flush once per partition so each yielded chunk is a whole batch of rows
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+    logger.info(f"Exported {count} rows as {fmt}.")
+
+
+def _to_json_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if value is not None and not isinstance(value, (str, int, float, bool)):
+        return float(value) # Decimal amounts, as in Order.to_dict
+    return value
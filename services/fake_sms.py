@@ -0,0 +1,36 @@
+import itertools
+import threading
+import time
+
+class FakeSMS:
+    """
+    Local stand-in for `africastalking.SMS`: records every `send` call and answers like the provider.
+    Numbers in `reject` get a failed recipient status; `latency` adds a delay to every call.
+    Used by the tests and benchmarks; pass it as the `client` of SMSService or PooledSMSSender.
+    """
+    def __init__(self, reject=(), latency=0, error=None):
+        self.reject = set(reject)
+        self.latency = latency
+        self.error = error
+        self.calls = []
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def send(self, message, recipients, sender_id=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls.append((message, list(recipients)))
+            if self.error:
+                raise self.error
+            return {
+                "SMSMessageData": {
+                    "Message": f"Sent to {len(recipients)}/{len(recipients)}",
+                    "Recipients": [
+                        {"number": number, "statusCode": 403, "status": "InvalidPhoneNumber", "messageId": "None"}
+                        if number in self.reject else
+                        {"number": number, "statusCode": 101, "status": "Success", "messageId": f"ATXid_{next(self.ids)}"}
+                        for number in recipients
+                    ]
+                }
+            }
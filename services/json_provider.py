@@ -0,0 +1,68 @@
+from flask.json.provider import DefaultJSONProvider  # type: ignore
+import logging
+
+try:
+    import orjson  # type: ignore
+except ImportError: # Optional; without it responses are encoded by the standard library
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed, several times faster than `json` on large lists.
+
+    Output decodes to the same values as the stock provider's: dates, Decimals, UUIDs and dataclasses go through
+    the same `default` hook. Non-ASCII text is written as UTF-8 rather than \\u escapes. Anything orjson
+    cannot encode (integers beyond 64 bits, unusual `dumps` arguments) falls back to the stock encoder.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        if orjson is None:
+            logger.info("orjson is not installed; JSON responses use the standard library encoder.")
+
+    def _options(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, indent=False):
+        """
+        orjson bytes for `obj`, or None when orjson is missing or cannot encode it
+        """
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        # orjson writes compact output or two-space indentation, and takes no other json.dumps arguments
+        indented = kwargs == {"indent": 2}
+        if not kwargs or indented or kwargs == {"separators": (",", ":")}:
+            encoded = self._encode(obj, indent=indented)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass # Let the standard library raise its usual error (or accept what orjson refuses, like NaN)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        encoded = self._encode(obj, indent=indent)
+        if encoded is None:
+            return super().response(obj)
+        # Skips the bytes -> str -> bytes round trip the stock provider makes
+        return self._app.response_class(encoded + b"\n", mimetype=self.mimetype)
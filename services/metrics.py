@@ -0,0 +1,386 @@
+from flask import Response, current_app, request  # type: ignore
+from models import db
+from services.query_budget import warn_repeated_statements
+from sqlalchemy import event
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows; METRICS_DIR is only needed under gunicorn
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# SQL accounting for the request being served on this thread; None outside requests
+current_request_stats = ContextVar("current_request_stats", default=None)
+
+
+class RequestStats:
+    """
+    The endpoint, start time, SQL statements run and time spent in the database of the request being served.
+    `statements` counts each distinct statement when repeated-query warnings are on, else it is None.
+    """
+    __slots__ = ("endpoint", "started", "queries", "db_seconds", "statements")
+
+    def __init__(self, endpoint, track_statements=False):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter() if track_statements else None
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics: counters, histograms and gauges keyed by metric name and label values.
+
+    With `directory` set, each process writes its snapshot to `<directory>/<pid>-<start ns>.json` (at most every
+    `flush_interval` seconds, and on every scrape) and `/metrics` adds up the snapshots of all workers.
+    A scrape folds the counters and histograms of workers that have exited into `<directory>/dead.json`
+    and deletes their files, so totals never go backwards and the directory does not grow with every
+    restart. The start time in the name keeps a new process that reuses a pid from overwriting the old
+    process's totals. Gauges only count live workers.
+    """
+    DEAD_FILE = "dead.json"
+
+    HELP = {
+        "http_requests_total": ("counter", "Requests served, by endpoint, method and status"),
+        "http_request_duration_seconds": ("histogram", "Request latency in seconds, by endpoint"),
+        "http_requests_in_flight": ("gauge", "Requests currently being served, by endpoint"),
+        "db_queries_total": ("counter", "SQL statements executed while serving requests, by endpoint"),
+        "db_query_seconds_total": ("counter", "Time spent executing SQL while serving requests, by endpoint"),
+        "db_queries_per_request": ("histogram", "SQL statements per request, by endpoint"),
+    }
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._pid = None
+        self._file_name = None
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_gauge(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """
+        JSON-serializable copy of this process's metrics
+        """
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "gauges": [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+                "histograms": [
+                    [name, list(labels), dict(histogram, counts=list(histogram["counts"]))]
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+            }
+
+    def maybe_flush(self, force=False):
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        path = os.path.join(self.directory, self._own_file_name())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(f"{path}.tmp", path) # Readers never see a half-written file
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot to {path}: {e}")
+
+    def collect(self):
+        """
+        Snapshots to expose: every worker's file when a directory is configured, else just this process
+        """
+        if not self.directory:
+            return [(True, self.snapshot())]
+        self.maybe_flush(force=True)
+        try:
+            with self._directory_lock():
+                dead = self._fold_dead_workers()
+        except OSError as e:
+            logger.warning(f"Could not fold exited workers' metrics in {self.directory}: {e}")
+            dead = _read_snapshot(os.path.join(self.directory, self.DEAD_FILE)) or _empty_snapshot()
+        snapshots = [(False, dead)]
+        folded = set(dead.get("folded", []))
+        for path in _worker_files(self.directory):
+            if os.path.basename(path) in folded:
+                continue
+            data = _read_snapshot(path)
+            if data is not None:
+                snapshots.append((True, data))
+        return snapshots
+
+    def _own_file_name(self):
+        # Decided on the first flush in each process, so a forked worker gets its own start time
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._file_name = f"{self._pid}-{time.time_ns()}.json"
+        return self._file_name
+
+    @contextmanager
+    def _directory_lock(self):
+        # Two workers scraped at once must not both fold (and so double count) the same file
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _fold_dead_workers(self):
+        """
+        Adds the snapshots of exited workers to the dead-worker totals, deletes their files and returns the totals.
+        A file is an exited worker's if its pid is gone, or if a newer file of the same pid exists (the pid was reused).
+        """
+        dead_path = os.path.join(self.directory, self.DEAD_FILE)
+        dead = _read_snapshot(dead_path) or _empty_snapshot()
+        paths = _worker_files(self.directory)
+        names = {os.path.basename(path) for path in paths}
+        # Files already folded whose deletion failed are skipped, not counted twice
+        folded = [name for name in dead.get("folded", []) if name in names]
+        newest = {}
+        for path in paths:
+            pid, started = _file_key(path)
+            newest[pid] = max(newest.get(pid, started), started)
+
+        totals = _sum_snapshots([(False, dead)])
+        to_fold = []
+        for path in paths:
+            name = os.path.basename(path)
+            pid, started = _file_key(path)
+            if name in folded or (_pid_alive(pid) and started == newest[pid]):
+                continue
+            data = _read_snapshot(path)
+            if data is not None:
+                _add_snapshot(totals, data, with_gauges=False)
+            to_fold.append(name)
+        if not to_fold and len(folded) == len(dead.get("folded", [])):
+            return dead
+
+        counters, _, histograms = totals
+        dead = {
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "gauges": [],
+            "histograms": [[name, list(labels), histogram] for (name, labels), histogram in histograms.items()],
+            "folded": folded + to_fold,
+        }
+        with open(f"{dead_path}.tmp", "w") as f:
+            json.dump(dead, f)
+        os.replace(f"{dead_path}.tmp", dead_path)
+        for name in dead["folded"]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"Could not delete folded metrics snapshot {name}: {e}")
+        return dead
+
+    def render(self):
+        """
+        All metrics, summed over the collected snapshots, in the Prometheus text exposition format
+        """
+        counters, gauges, histograms = _sum_snapshots(self.collect())
+
+        lines = []
+        for name, (kind, help_text) in self.HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram['count']}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'])}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+            else:
+                values = counters if kind == "counter" else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _empty_snapshot():
+    return {"counters": [], "gauges": [], "histograms": [], "folded": []}
+
+
+def _worker_files(directory):
+    return glob.glob(os.path.join(directory, "[0-9]*.json"))
+
+
+def _file_key(path):
+    # "<pid>-<start ns>.json"; "<pid>.json" from before start times were recorded sorts as the oldest
+    pid, _, started = os.path.basename(path)[:-len(".json")].partition("-")
+    return int(pid), int(started or 0)
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _sum_snapshots(snapshots):
+    """
+    (counters, gauges, histograms) dicts keyed by (name, labels), summed over `(alive, snapshot)` pairs
+    """
+    totals = ({}, {}, {})
+    for alive, data in snapshots:
+        _add_snapshot(totals, data, with_gauges=alive)
+    return totals
+
+
+def _add_snapshot(totals, data, with_gauges):
+    counters, gauges, histograms = totals
+    for name, labels, value in data["counters"]:
+        key = (name, tuple(labels))
+        counters[key] = counters.get(key, 0) + value
+    if with_gauges:
+        for name, labels, value in data["gauges"]:
+            key = (name, tuple(labels))
+            gauges[key] = gauges.get(key, 0) + value
+    for name, labels, histogram in data["histograms"]:
+        key = (name, tuple(labels))
+        total = histograms.setdefault(key, {"buckets": histogram["buckets"], "counts": [0] * len(histogram["counts"]), "sum": 0.0, "count": 0})
+        total["counts"] = [a + b for a, b in zip(total["counts"], histogram["counts"])]
+        total["sum"] += histogram["sum"]
+        total["count"] += histogram["count"]
+
+
+def _labels(values, le=None):
+    # Every metric here is labelled by endpoint first; http_requests_total adds method and status
+    names = ("endpoint", "method", "status")[:len(values)]
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request_stats.get()
+    started = conn.info.pop("query_started", None)
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+
+
+def init_metrics(app):
+    """
+    Installs request timing hooks, SQL accounting on the app's engine and the `/metrics` route.
+    In debug mode, a request that runs the same statement shape QUERY_REPEAT_WARN_THRESHOLD times logs a warning.
+    """
+    registry = MetricsRegistry(app.config.get("METRICS_DIR"), app.config.get("METRICS_FLUSH_SECONDS", 5.0))
+    app.extensions['metrics'] = registry
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        track_statements = app.debug and app.config.get("QUERY_REPEAT_WARN_THRESHOLD", 0) > 0
+        stats = RequestStats(request.endpoint or "unmatched", track_statements)
+        current_request_stats.set(stats)
+        registry.add_gauge("http_requests_in_flight", (stats.endpoint,), 1)
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = current_request_stats.get()
+        if stats is not None:
+            labels = (stats.endpoint,)
+            registry.inc("http_requests_total", (stats.endpoint, request.method, str(response.status_code)))
+            registry.observe("http_request_duration_seconds", labels, time.perf_counter() - stats.started, LATENCY_BUCKETS)
+            registry.inc("db_queries_total", labels, stats.queries)
+            registry.inc("db_query_seconds_total", labels, stats.db_seconds)
+            registry.observe("db_queries_per_request", labels, stats.queries, QUERY_COUNT_BUCKETS)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exception=None):
+        # Runs even if a later after_request hook failed, so the in-flight gauge always comes back down
+        stats = current_request_stats.get()
+        if stats is not None:
+            registry.add_gauge("http_requests_in_flight", (stats.endpoint,), -1)
+            current_request_stats.set(None)
+            if stats.statements:
+                warn_repeated_statements(stats.endpoint, stats.statements, app.config["QUERY_REPEAT_WARN_THRESHOLD"])
+            registry.maybe_flush()
+
+    @app.route('/metrics')
+    def metrics():
+        """
+        Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set
+        """
+        token = current_app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return Response(status=401)
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return registry
@@ -0,0 +1,91 @@
+from flask import current_app  # type: ignore
+from flask.cli import with_appcontext  # type: ignore
+from models import db, InboundSms, Order, OrderArchive, SmsOutbox, utcnow
+from sqlalchemy import delete, insert, literal, select, update
+from datetime import timedelta
+import click
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ["id", "customer_id", "item", "amount", "time", "version", "archived_at"]
+
+
+def archive_cutoff(older_than_days=None):
+    """
+    Orders placed before this time are due for the archive (default age: ORDER_ARCHIVE_AFTER_DAYS)
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config.get("ORDER_ARCHIVE_AFTER_DAYS", 365)
+    return utcnow() - timedelta(days=older_than_days)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Moves up to `batch_size` of the oldest orders placed before `cutoff` to orders_archive in one short
+    transaction and returns how many were moved (0 once none are left).
+
+    The batch is picked by the (time, id) index without locking anything, then copied and deleted by primary key,
+    so only the rows being moved are locked, and only until the commit. The daily rollup keeps counting them.
+    SMS rows pointing at the moved orders are relinked through archived_order_id before the delete, since the
+    delete clears their order_id (ON DELETE SET NULL).
+    """
+    ids = db.session.execute(
+        select(Order.id).where(Order.time < cutoff).order_by(Order.time, Order.id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        db.session.rollback()
+        return 0
+    archived_at = literal(utcnow(), OrderArchive.archived_at.type)
+    db.session.execute(insert(OrderArchive).from_select(ARCHIVE_COLUMNS, select(
+        Order.id, Order.customer_id, Order.item, Order.amount, Order.time, Order.version, archived_at
+    ).where(Order.id.in_(ids))))
+    for model in (SmsOutbox, InboundSms):
+        db.session.execute(
+            update(model).where(model.order_id.in_(ids)).values(archived_order_id=model.order_id),
+            execution_options={"synchronize_session": False}
+        )
+    moved = db.session.execute(
+        delete(Order).where(Order.id.in_(ids)), execution_options={"synchronize_session": False}
+    ).rowcount
+    db.session.commit()
+    return moved
+
+
+def archive_orders(older_than_days=None, batch_size=None, max_batches=None, pause=0.0):
+    """
+    Moves every order older than `older_than_days` to orders_archive, `batch_size` at a time.
+
+    Each batch commits on its own, so the job can be stopped at any point (or bounded with `max_batches`)
+    and simply run again: it carries on from whatever is still in `orders`. `pause` seconds between
+    batches leave room for other writers. Returns the number of orders moved.
+    """
+    cutoff = archive_cutoff(older_than_days) # Fixed for the run, so new orders ageing past it cannot keep it going
+    batch_size = batch_size or current_app.config.get("ORDER_ARCHIVE_BATCH_SIZE", 1000)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        logger.info(f"Archived a batch of {count} orders placed before {cutoff.isoformat()} ({moved} so far).")
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+@click.command('archive-orders')
+@click.option('--older-than-days', type=int, default=None, help='Archive orders older than this (default ORDER_ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Orders moved per transaction (default ORDER_ARCHIVE_BATCH_SIZE).')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches; run again to continue.')
+@click.option('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+@with_appcontext
+def archive_orders_command(older_than_days, batch_size, max_batches, pause):
+    """
+    Moves old orders from orders to orders_archive in small batches (safe to interrupt and re-run).
+    """
+    moved = archive_orders(older_than_days, batch_size, max_batches, pause)
+    logger.info(f"Order archival finished: {moved} orders moved.")
+    click.echo(f"Archived {moved} orders.")
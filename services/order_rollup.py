@@ -0,0 +1,185 @@
+from flask.cli import with_appcontext  # type: ignore
+from models import db, Customer, Order, OrderArchive, OrderDailyRollup
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import timedelta
+from decimal import Decimal
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+rollup = OrderDailyRollup.__table__
+ROLLUP_COLUMNS = ["day", "customer_id", "order_count", "amount_sum"]
+BUCKETS = ("day", "week", "month")
+
+
+def _orders_by_day(*criteria, negate=False, model=Order):
+    """
+    SELECT of (day, customer_id, order_count, amount_sum) over the orders matching `criteria`,
+    with the counters negated when `negate` is set. `model` may be OrderArchive to read archived orders.
+    """
+    day = func.date(model.time)
+    order_count, amount_sum = func.count(model.id), func.sum(model.amount)
+    if negate:
+        order_count, amount_sum = -order_count, -amount_sum
+    return (
+        select(day, model.customer_id, order_count, amount_sum)
+        .where(model.time.is_not(None), *criteria)
+        .group_by(day, model.customer_id)
+    )
+
+
+def _accumulate(statement):
+    """
+    Turns an INSERT into the rollup into one that adds to the counters of rows that already exist
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        return statement.on_duplicate_key_update(
+            order_count=rollup.c.order_count + statement.inserted.order_count,
+            amount_sum=rollup.c.amount_sum + statement.inserted.amount_sum
+        )
+    return statement.on_conflict_do_update(
+        index_elements=["day", "customer_id"],
+        set_={
+            "order_count": rollup.c.order_count + statement.excluded.order_count,
+            "amount_sum": rollup.c.amount_sum + statement.excluded.amount_sum
+        }
+    )
+
+
+def _insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        return mysql_insert(rollup)
+    if dialect == "sqlite":
+        return sqlite_insert(rollup)
+    raise NotImplementedError(f"The order rollup does not support the {dialect} dialect")
+
+
+def record_new_orders(order_ids):
+    """
+    Adds just-inserted (flushed, not necessarily committed) orders to the rollup in the caller's transaction.
+    Their day comes from the stored `time`, so the database's clock decides which day an order lands on.
+    """
+    if not order_ids:
+        return
+    statement = _insert().from_select(ROLLUP_COLUMNS, _orders_by_day(Order.id.in_(order_ids)))
+    db.session.execute(_accumulate(statement))
+
+
+def reprice_orders(amount, *criteria):
+    """
+    Moves the rollup totals of the orders matching `criteria` to what they will be once each costs `amount`,
+    with one INSERT ... SELECT in the caller's transaction. Runs before the UPDATE, while the old amounts can be read.
+    """
+    day = func.date(Order.time)
+    deltas = (
+        select(day, Order.customer_id, literal(0), func.sum(literal(amount, Order.amount.type) - Order.amount))
+        .where(Order.time.is_not(None), *criteria)
+        .group_by(day, Order.customer_id)
+    )
+    db.session.execute(_accumulate(_insert().from_select(ROLLUP_COLUMNS, deltas)))
+
+
+def retract_orders(*criteria):
+    """
+    Takes the orders matching `criteria` out of the rollup in the caller's transaction, dropping the rows that
+    leaves empty. Runs before the DELETE, while the orders can still be read.
+    """
+    db.session.execute(_accumulate(_insert().from_select(ROLLUP_COLUMNS, _orders_by_day(*criteria, negate=True))))
+    day = func.date(Order.time)
+    db.session.execute(
+        delete(rollup).where(
+            rollup.c.order_count <= 0,
+            tuple_(rollup.c.day, rollup.c.customer_id).in_(
+                select(day, Order.customer_id).where(Order.time.is_not(None), *criteria)
+            )
+        )
+    )
+
+
+def rebuild_rollup():
+    """
+    Recomputes the whole rollup from `orders` and `orders_archive` in one transaction and returns the number of
+    rows written. Archived orders stay in the figures: archiving moves them, it does not delete them.
+    """
+    db.session.execute(delete(rollup))
+    db.session.execute(_insert().from_select(ROLLUP_COLUMNS, _orders_by_day()))
+    db.session.execute(_accumulate(_insert().from_select(ROLLUP_COLUMNS, _orders_by_day(model=OrderArchive))))
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(rollup)).scalar_one()
+
+
+def bucket_start(day, bucket):
+    """
+    First day of the `bucket` ('day', 'week' starting Monday, or 'month') containing `day`
+    """
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def revenue_series(start, end, bucket="day", customer_id=None):
+    """
+    Order count and amount per `bucket` between `start` and `end` (inclusive dates), oldest first.
+    Reads at most one rollup row per day (per customer) in the range; empty buckets are omitted.
+    """
+    statement = (
+        select(rollup.c.day, func.sum(rollup.c.order_count), func.sum(rollup.c.amount_sum))
+        .where(rollup.c.day >= start, rollup.c.day <= end)
+        .group_by(rollup.c.day)
+        .order_by(rollup.c.day)
+    )
+    if customer_id:
+        statement = statement.where(rollup.c.customer_id == customer_id)
+
+    series = {}
+    for day, order_count, amount_sum in db.session.execute(statement):
+        key = bucket_start(day, bucket)
+        totals = series.setdefault(key, [0, Decimal(0)])
+        totals[0] += int(order_count)
+        totals[1] += Decimal(str(amount_sum))
+    return [
+        {"period": key.isoformat(), "order_count": count, "amount_sum": float(amount)}
+        for key, (count, amount) in series.items()
+    ]
+
+
+def top_customers(start, end, limit=10):
+    """
+    Customers with the highest order amount between `start` and `end` (inclusive dates)
+    """
+    amount_sum = func.sum(rollup.c.amount_sum).label("amount_sum")
+    totals = (
+        select(rollup.c.customer_id, func.sum(rollup.c.order_count).label("order_count"), amount_sum)
+        .where(rollup.c.day >= start, rollup.c.day <= end)
+        .group_by(rollup.c.customer_id)
+        .order_by(amount_sum.desc(), rollup.c.customer_id)
+        .limit(limit)
+        .subquery()
+    )
+    statement = (
+        select(totals.c.customer_id, Customer.name, totals.c.order_count, totals.c.amount_sum)
+        .join(Customer, Customer.id == totals.c.customer_id)
+        .order_by(totals.c.amount_sum.desc(), totals.c.customer_id)
+    )
+    return [
+        {"customer_id": customer_id, "name": name, "order_count": int(order_count), "amount_sum": float(amount)}
+        for customer_id, name, order_count, amount in db.session.execute(statement)
+    ]
+
+
+@click.command('rebuild-order-rollup')
+@with_appcontext
+def rebuild_rollup_command():
+    """
+    Recomputes the order_daily_rollup table from the orders and orders_archive tables.
+    """
+    rows = rebuild_rollup()
+    logger.info(f"Rebuilt order rollup: {rows} rows.")
+    click.echo(f"Rebuilt order_daily_rollup: {rows} rows.")
@@ -0,0 +1,61 @@
+from models import db, Order
+from services.order_rollup import record_new_orders, reprice_orders, retract_orders
+from sqlalchemy import delete, update
+from services.sms_outbox import enqueue_order_confirmation
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_AMOUNT = Decimal("99999999.99") # Order.amount is NUMERIC(10, 2)
+MAX_ITEM_LENGTH = 255 # Order.item is VARCHAR(255)
+
+
+def create_orders(entries):
+    """
+    Creates orders from `(customer, item, amount)` entries in the caller's transaction; the caller commits.
+    -----------
+    Parameters:
+    entries(list): Tuples whose `customer` needs `id`, `name` and `phone_number` (a Customer or CachedCustomer)
+
+    Every order gets its confirmation SMS queued in the outbox and is counted in the daily rollup,
+    so an order placed over the API and one placed by SMS go through exactly the same steps.
+    Returns the new Order objects, ids assigned, in the same order as `entries`.
+    """
+    orders = [Order(customer_id=customer.id, item=item, amount=amount) for customer, item, amount in entries]
+    if not orders:
+        return orders
+    db.session.add_all(orders)
+    db.session.flush() # Assigns the order ids the outbox rows and rollup need
+
+    for order, (customer, _, _) in zip(orders, entries):
+        enqueue_order_confirmation(order, customer)
+    record_new_orders([order.id for order in orders])
+    return orders
+
+
+def update_orders(criteria, values):
+    """
+    Sets `values` (`item` and/or `amount`) on every order matching `criteria` with a single UPDATE in the
+    caller's transaction; the caller commits (or rolls back if fewer orders matched than it expected).
+
+    Each updated order's version is incremented. A new amount is carried into the daily rollup first,
+    with one set-based statement. Returns the number of orders updated.
+    """
+    if "amount" in values:
+        reprice_orders(values["amount"], *criteria)
+    result = db.session.execute(
+        update(Order).where(*criteria).values(**values, version=Order.version + 1),
+        execution_options={"synchronize_session": False} # No orders are loaded in the session to keep in sync
+    )
+    return result.rowcount
+
+
+def delete_orders(criteria):
+    """
+    Deletes every order matching `criteria` with a single DELETE in the caller's transaction; the caller commits.
+    The orders are taken out of the daily rollup first. Returns the number of orders deleted.
+    """
+    retract_orders(*criteria)
+    result = db.session.execute(delete(Order).where(*criteria), execution_options={"synchronize_session": False})
+    return result.rowcount
@@ -0,0 +1,101 @@
+from models import db
+from sqlalchemy import event
+from collections import Counter
+from contextlib import contextmanager
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bound parameters in any DB-API paramstyle (qmark, format, pyformat, named)
+PARAMETER = re.compile(r"\?|%s|%\(\w+\)s|(?<![:\w]):\w+")
+# "IN (?, ?, ?)" and multi-row "VALUES (?, ?), (?, ?)" differ only in how many rows/values are bound
+PARAMETER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised by `max_queries` when a block runs more SQL statements than it is allowed
+    """
+
+
+def statement_shape(statement):
+    """
+    A statement with whitespace collapsed and its parameters, parameter lists and row lists each reduced
+    to a single `?`, so the same query run for different ids (or with different IN list lengths) has one shape
+    """
+    shape = PARAMETER.sub("?", " ".join(statement.split()))
+    return ROW_LIST.sub("(?)", PARAMETER_LIST.sub("?", shape))
+
+
+def repeated_shapes(statements, threshold):
+    """
+    Statement shapes run at least `threshold` times, most repeated first, from a Counter of raw statements
+    """
+    shapes = Counter()
+    for statement, count in statements.items():
+        shapes[statement_shape(statement)] += count
+    return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+class QueryCounter:
+    """
+    The SQL statements run on one thread while a `count_queries` block is active
+    """
+    def __init__(self):
+        self.statements = []
+        self._thread = threading.get_ident()
+
+    def __len__(self):
+        return len(self.statements)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        # Background flushers and workers share the engine; only count the thread that opened the block
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def report(self):
+        return "\n".join(f"  {i}. {' '.join(statement.split())}" for i, statement in enumerate(self.statements, 1))
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Counts the statements this thread runs on `engine` (default: the app's engine) inside the block:
+
+        with count_queries() as queries:
+            client.get("/orders/view_orders")
+        assert queries.count <= 3
+    """
+    engine = engine if engine is not None else db.engine
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter.record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter.record)
+
+
+@contextmanager
+def max_queries(limit, engine=None):
+    """
+    Raises QueryBudgetExceeded, listing the statements, if the block runs more than `limit` statements
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        raise QueryBudgetExceeded(f"Expected at most {limit} SQL statements, {counter.count} were run:\n{counter.report()}")
+
+
+def warn_repeated_statements(endpoint, statements, threshold):
+    """
+    Logs a warning for every statement shape a request ran at least `threshold` times (a likely N+1 query)
+    """
+    for shape, count in repeated_shapes(statements, threshold):
+        logger.warning(f"Possible N+1 query: {endpoint} ran the same statement {count} times: {shape}")
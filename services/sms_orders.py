@@ -0,0 +1,241 @@
+from models import db, Customer, InboundSms, normalize_phone, utcnow
+from services.order_service import MAX_AMOUNT, MAX_ITEM_LENGTH, create_orders
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from collections import OrderedDict
+from decimal import Decimal
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# "ORDER <code> <item> <amount>"; the item may contain spaces, the amount is the last word
+ORDER_PATTERN = re.compile(r"^\s*ORDER\s+(?P<code>\S+)\s+(?P<item>.+?)\s+(?P<amount>\d+(?:\.\d{1,2})?)\s*$", re.IGNORECASE)
+RECENT_IDS = 100000 # Message ids remembered per process to drop redeliveries before they are queued
+
+
+def parse_order_text(text):
+    """
+    Parses "ORDER <code> <item> <amount>" into (code, item, amount).
+    Raises ValueError with a message fit for the inbound_sms error column if the text does not match.
+    """
+    match = ORDER_PATTERN.match(text or "")
+    if not match:
+        raise ValueError("Expected 'ORDER <code> <item> <amount>'")
+    item = match.group("item").strip()
+    if len(item) > MAX_ITEM_LENGTH:
+        raise ValueError(f"Item name is longer than {MAX_ITEM_LENGTH} characters")
+    amount = Decimal(match.group("amount"))
+    if not 0 < amount <= MAX_AMOUNT:
+        raise ValueError(f"Amount must be greater than 0 and at most {MAX_AMOUNT}")
+    return match.group("code"), item, amount
+
+
+def inbound_values(data):
+    """
+    The fields of an incoming message payload that are kept (Africa's Talking posts `id`, `from`, `text`, ...).
+    Returns None if the payload has no message id or sender.
+    """
+    message_id = str(data.get("id") or "").strip()
+    sender = str(data.get("from") or "").strip()
+    if not message_id or not sender:
+        return None
+    return {
+        "provider_message_id": message_id[:100],
+        "phone_number": sender[:20],
+        "text": str(data.get("text") or "")[:500],
+        "received_at": utcnow()
+    }
+
+
+class SmsOrderPipeline:
+    """
+    Turns incoming "ORDER ..." messages into orders off the request path.
+
+    `submit` only queues the message, so the webhook answers at once. `workers` threads take up to
+    `batch_size` queued messages at a time, drop ids that were already processed, look all their customer
+    codes up in one query, create the orders through `create_orders` (as `place_order` does) and commit
+    the batch, inbound_sms rows included, in a single transaction. With `workers` of 0 each message is
+    processed during `submit` instead. Messages still queued when a worker is killed are lost.
+    """
+    def __init__(self, app, workers=4, batch_size=100, max_pending=10000, batch_wait=0.05):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self.counts = {"received": 0, "duplicates": 0, "ordered": 0, "rejected": 0, "failed": 0, "batches": 0}
+
+    def submit(self, values):
+        """
+        Queues one message's values (see `inbound_values`); returns False if the queue is full
+        """
+        with self._lock:
+            message_id = values["provider_message_id"]
+            if message_id in self._recent:
+                self.counts["duplicates"] += 1
+                return True # Already queued or processed here; acknowledge the redelivery
+            self._recent[message_id] = True
+            if len(self._recent) > RECENT_IDS:
+                self._recent.popitem(last=False)
+            self.counts["received"] += 1
+
+        if self.workers <= 0:
+            self.process_batch([values])
+            return True
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(values)
+        except queue.Full:
+            with self._lock:
+                self._recent.pop(message_id, None) # Let the provider's retry through
+                self.counts["received"] -= 1
+            return False
+        return True
+
+    def join(self):
+        """
+        Blocks until every queued message has been processed
+        """
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, pending=self._queue.qsize())
+
+    def process_batch(self, messages):
+        """
+        Processes messages in one transaction. If that fails (for instance because another process committed
+        one of the same message ids in the meantime), the batch is retried one message at a time so the rest
+        still go through. A message that fails on its own is recorded in inbound_sms with status `failed`,
+        since the provider was already told it arrived.
+        """
+        with self.app.app_context():
+            try:
+                self._commit(messages)
+                return
+            except IntegrityError:
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Error processing {len(messages)} SMS orders together, retrying one by one: {e}")
+
+            for message in messages:
+                try:
+                    self._commit([message])
+                except IntegrityError:
+                    db.session.rollback()
+                    self._count(duplicates=1)
+                    logger.warning(f"SMS {message['provider_message_id']} was processed elsewhere or conflicts; skipped.")
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error processing SMS order {message['provider_message_id']}: {e}", exc_info=True)
+                    self._record_failure(message, e)
+
+    def _record_failure(self, message, error):
+        """
+        Keeps a message that could not be processed in inbound_sms as `failed`, with the error
+        """
+        try:
+            db.session.execute(insert(InboundSms), [dict(
+                message, status="failed", error=f"{type(error).__name__}: {error}"[:255], order_id=None, processed_at=utcnow()
+            )])
+            db.session.commit()
+            self._count(failed=1)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record failed SMS order {message['provider_message_id']}; it is lost: {e}", exc_info=True)
+
+    def _commit(self, messages):
+        ids = [message["provider_message_id"] for message in messages]
+        processed = set(db.session.execute(
+            select(InboundSms.provider_message_id).where(InboundSms.provider_message_id.in_(ids))
+        ).scalars())
+        fresh = [message for message in messages if message["provider_message_id"] not in processed]
+
+        rows, parsed = [], []
+        for message in fresh:
+            row = dict(message, status="rejected", error=None, order_id=None, processed_at=utcnow())
+            rows.append(row)
+            try:
+                parsed.append((row, parse_order_text(message["text"])))
+            except ValueError as e:
+                row["error"] = str(e)
+
+        codes = {code for _, (code, _, _) in parsed}
+        customers = {}
+        entries, pending_rows = [], [] # Messages that become orders, in matching order
+        if codes:
+            customers = {
+                customer.code: customer for customer in db.session.execute(
+                    select(Customer.id, Customer.name, Customer.phone_number, Customer.code, Customer.phone_digits)
+                    .where(Customer.code.in_(codes))
+                )
+            }
+        for row, (code, item, amount) in parsed:
+            customer = customers.get(code)
+            if customer is None:
+                row["error"] = f"Unknown customer code {code}"[:255]
+            elif customer.phone_digits != normalize_phone(row["phone_number"]): # "+254 700..." is "254700..."
+                row["error"] = "Sender is not the customer's registered phone number"
+            else:
+                entries.append((customer, item, amount))
+                pending_rows.append(row)
+
+        for row, order in zip(pending_rows, create_orders(entries)):
+            row["status"] = "ordered"
+            row["order_id"] = order.id
+        if rows:
+            db.session.execute(insert(InboundSms), rows)
+        db.session.commit()
+
+        ordered = len(pending_rows)
+        self._count(batches=1, ordered=ordered, rejected=len(rows) - ordered, duplicates=len(messages) - len(fresh))
+        logger.info(f"Processed {len(rows)} SMS orders: {ordered} ordered, {len(rows) - ordered} rejected.")
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counts[name] += value
+
+    def _ensure_workers(self):
+        # Threads do not survive a fork, so a preloaded app starts its workers in each process on first use
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f"sms-order-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Gather more messages for a short while so a burst is committed in few transactions
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.process_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,168 @@
+from flask import current_app  # type: ignore
+from flask.cli import with_appcontext  # type: ignore
+from models import db, SmsOutbox, utcnow
+from services.sms_service import PooledSMSSender, SendSMS
+from datetime import timedelta
+import click
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def order_confirmation_values(order_id, customer, item, amount):
+    """
+    Column values for the outbox row confirming an order; `customer` needs `name` and `phone_number`
+    """
+    order_details = f"Item: {item}, Amount: {amount}"
+    return {
+        "order_id": order_id,
+        "phone_number": customer.phone_number,
+        "message": SendSMS.order_confirmation_message(customer.name, order_details)
+    }
+
+
+def enqueue_order_confirmation(order, customer):
+    """
+    Adds an order confirmation SMS to the outbox in the caller's session.
+    The row is committed together with the order, so a message is queued if and only if the order exists.
+    """
+    message = SmsOutbox(**order_confirmation_values(order.id, customer, order.item, order.amount))
+    db.session.add(message)
+    return message
+
+
+def claim_batch(batch_size, lease_seconds):
+    """
+    Claims up to `batch_size` due messages for this worker and returns them.
+
+    Candidates are selected first and then claimed with a conditional UPDATE keyed on a fresh token,
+    so two workers racing for the same rows never both win. Messages whose lease expired
+    (a worker died mid-send) are claimable again.
+    """
+    now = utcnow()
+    claimable = db.or_(
+        SmsOutbox.status == 'pending',
+        db.and_(SmsOutbox.status == 'sending', SmsOutbox.locked_until < now)
+    )
+    candidate_ids = db.session.execute(
+        db.select(SmsOutbox.id)
+        .where(claimable, SmsOutbox.next_attempt_at <= now)
+        .order_by(SmsOutbox.next_attempt_at, SmsOutbox.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not candidate_ids:
+        return []
+
+    token = str(uuid.uuid4())
+    db.session.execute(
+        db.update(SmsOutbox)
+        .where(SmsOutbox.id.in_(candidate_ids), claimable)
+        .values(status='sending', claim_token=token, locked_until=now + timedelta(seconds=lease_seconds))
+    )
+    db.session.commit()
+    return db.session.execute(
+        db.select(SmsOutbox).where(SmsOutbox.claim_token == token, SmsOutbox.status == 'sending')
+    ).scalars().all()
+
+
+def backoff_delay(attempts, base_seconds, max_seconds=3600):
+    """
+    Exponential backoff before retry number `attempts`: base, 2*base, 4*base, ... capped at `max_seconds`
+    """
+    return min(base_seconds * (2 ** (attempts - 1)), max_seconds)
+
+
+def dispatch_batch(messages, sender, max_attempts=5, backoff_seconds=30):
+    """
+    Sends claimed messages through a PooledSMSSender and records the outcome of each one.
+
+    The messages are sent concurrently, and each gets its own result, so the provider message id and any
+    error land on the outbox row (and therefore the order) it belongs to.
+    All database work stays on the calling thread.
+    Returns a dict with the number of messages `sent`, `retrying` and `failed`.
+    """
+    counts = {"sent": 0, "retrying": 0, "failed": 0}
+    if not messages:
+        return counts
+
+    futures = [sender.submit(message.phone_number, message.message) for message in messages]
+    sender.flush()
+
+    now = utcnow()
+    for message, future in zip(messages, futures):
+        error = future.exception()
+        message.attempts += 1
+        message.locked_until = None
+        message.claim_token = None
+        if error is None:
+            message.status = 'sent'
+            message.sent_at = now
+            message.provider_message_id = future.result()
+            message.last_error = None
+            counts["sent"] += 1
+        elif message.attempts >= max_attempts:
+            message.status = 'failed'
+            message.last_error = str(error)[:500]
+            counts["failed"] += 1
+            logger.error(f"Giving up on SMS {message.id} for order {message.order_id} after {message.attempts} attempts: {error}")
+        else:
+            message.status = 'pending'
+            message.last_error = str(error)[:500]
+            message.next_attempt_at = now + timedelta(seconds=backoff_delay(message.attempts, backoff_seconds))
+            counts["retrying"] += 1
+            logger.warning(f"SMS {message.id} for order {message.order_id} failed (attempt {message.attempts}), retrying at {message.next_attempt_at}: {error}")
+    db.session.commit()
+    logger.info(f"Dispatched SMS batch: {counts}")
+    return counts
+
+
+def build_sender(client=None):
+    """
+    Creates a PooledSMSSender configured from the app's SMS_* settings
+    """
+    config = current_app.config
+    return PooledSMSSender(
+        client=client,
+        rate_per_second=config.get("SMS_RATE_LIMIT_PER_SECOND"),
+        max_workers=config.get("SMS_OUTBOX_WORKERS", 8)
+    )
+
+
+def run_worker(once=False, client=None):
+    """
+    Claims and dispatches outbox batches until interrupted (or a single round when `once` is set).
+    One sender is kept for the worker's lifetime so its rate limit holds across batches.
+    """
+    config = current_app.config
+    batch_size = config.get("SMS_OUTBOX_BATCH_SIZE", 50)
+    with build_sender(client) as sender:
+        while True:
+            messages = claim_batch(batch_size, config.get("SMS_OUTBOX_LEASE_SECONDS", 300))
+            dispatch_batch(
+                messages,
+                sender,
+                max_attempts=config.get("SMS_OUTBOX_MAX_ATTEMPTS", 5),
+                backoff_seconds=config.get("SMS_OUTBOX_BACKOFF_SECONDS", 30)
+            )
+            db.session.remove()
+            if once:
+                return
+            # Go straight on to the next batch while there is a backlog
+            if len(messages) < batch_size:
+                time.sleep(config.get("SMS_OUTBOX_POLL_SECONDS", 2))
+
+
+@click.command('sms-worker')
+@click.option('--once', is_flag=True, help='Dispatch a single batch and exit.')
+@with_appcontext
+def sms_worker_command(once):
+    """
+    Sends queued SMS messages from the outbox.
+    """
+    logger.info("SMS outbox worker starting.")
+    try:
+        run_worker(once=once)
+    except KeyboardInterrupt:
+        logger.info("SMS outbox worker stopped.")
@@ -1,7 +1,10 @@
 from config import Config
-import africastalking # type: ignore
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from models import normalize_phone
 import logging
-# import time # Uncomment if implementing blocking in-request retry (not recommended)
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -10,29 +13,179 @@ username = Config.AT_USERNAME
 api_key = Config.AT_API_KEY
 sender_id = Config.AT_SENDER_ID
 
-# Initialize Africa's Talking SDK
-africastalking.initialize(username, api_key)
-sms = africastalking.SMS
+_client = None
+_client_lock = threading.Lock()
+
+def get_sms_client():
+    """
+    Returns the Africa's Talking SMS client, importing and initializing the SDK on first use
+    so that importing the app (and every gunicorn worker boot) skips it.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import africastalking # type: ignore
+                africastalking.initialize(username, api_key)
+                _client = africastalking.SMS
+    return _client
+
+# Africa's Talking recipient status codes that mean the provider accepted the message
+SUCCESS_STATUS_CODES = {100, 101, 102}
+
+class SMSSendError(Exception):
+    """
+    Raised when Africa's Talking does not accept a message for a recipient
+    """
 
 class SendSMS:
+    @staticmethod
+    def order_confirmation_message(customer_name, order_details):
+        """
+        Builds the text of an order confirmation SMS.
+        """
+        return f"Hello {customer_name}, your order has been placed. Details: {order_details}"
+
+    @staticmethod
+    def send_message(phone_number, message):
+        """
+        Sends `message` to a single recipient.
+        Returns the provider message id on success and raises SMSSendError otherwise.
+        """
+        result = SendSMS.send_bulk(message, [phone_number])[phone_number]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    @staticmethod
+    def send_bulk(message, phone_numbers, client=None):
+        """
+        Sends the same `message` to every number in `phone_numbers` with a single provider call.
+        Returns a dict mapping each phone number to its provider message id, or to an SMSSendError
+        if the provider rejected that recipient.
+        """
+        client = client or get_sms_client()
+        response = client.send(message, list(phone_numbers), sender_id)
+        data = response.get("SMSMessageData", {})
+        recipients = data.get("Recipients", [])
+
+        # The provider may reformat numbers (e.g. "+254 700..." to "+254700..."), so they are matched by digits.
+        # A lone recipient is unambiguous even if it was rewritten further (e.g. 07... to +2547...)
+        by_digits = {normalize_phone(recipient.get("number")): recipient for recipient in recipients}
+        results = {}
+        for phone_number in phone_numbers:
+            recipient = by_digits.get(normalize_phone(phone_number))
+            if recipient is None and len(phone_numbers) == 1 and len(recipients) == 1:
+                recipient = recipients[0]
+            if recipient is None:
+                results[phone_number] = SMSSendError(data.get("Message", "No result for recipient"))
+            elif recipient.get("statusCode") not in SUCCESS_STATUS_CODES:
+                results[phone_number] = SMSSendError(f"{recipient.get('status')} (statusCode {recipient.get('statusCode')})")
+            else:
+                results[phone_number] = recipient.get("messageId")
+        return results
+
     @staticmethod
     # Added max_retries parameter, though full retry logic for production would be async
     def send_order_confirmation(phone_number, customer_name, order_details): # Removed max_retries parameter for simplicity
         """
         Sends an order confirmation SMS to the customer.
         Returns True on success, False on failure.
+
+        `place_order` no longer calls this; confirmations go through the SMS outbox (see services/sms_outbox.py).
         """
-        message = f"Hello {customer_name}, your order has been placed. Details: {order_details}"
-        sender = sender_id # Make sure this is correctly configured
+        message = SendSMS.order_confirmation_message(customer_name, order_details)
 
         try:
-            response = sms.send(message, [phone_number], sender)
-            logger.info(f"SMS sent successfully to {phone_number} for customer {customer_name}. Response: {response}")
+            message_id = SendSMS.send_message(phone_number, message)
+            logger.info(f"SMS sent successfully to {phone_number} for customer {customer_name}. Message ID: {message_id}")
             return True # Indicate success
         except Exception as e:
             logger.error(f"Error sending SMS to {phone_number} for customer {customer_name}: {e}", exc_info=True)
-            # In a real application, this failure will be logged persistently
-            # (e.g., to a dedicated SMS log table in the DB with retry attempts).
-            # I would also implement a proper retry mechanism here, ideally
-            # using a background task queue like Celery.
-            return False # Indicate failure
\ No newline at end of file
+            return False # Indicate failure
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` acquisitions per second with bursts of up to `burst`.
+    A `rate` of None or 0 disables limiting.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PooledSMSSender:
+    """
+    Sends messages one provider call each, on a small thread pool throttled to `rate_per_second` calls.
+
+    Africa's Talking sends the same text to every recipient of a call, and every order confirmation carries its
+    customer's name and order details, so messages are never merged into one call. `submit()` returns a Future
+    that resolves to the recipient's provider message id (or raises SMSSendError), so callers can map results
+    back to the order each message belongs to.
+    `client` is anything with the `africastalking.SMS.send(message, recipients, sender_id)` interface.
+    """
+    def __init__(self, client=None, rate_per_second=None, max_workers=4):
+        self.client = client # None means the Africa's Talking client, resolved on first send
+        self.limiter = RateLimiter(rate_per_second, burst=max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    def submit(self, phone_number, message):
+        call = self.executor.submit(self._deliver, phone_number, message)
+        with self.lock:
+            self.in_flight.add(call)
+        call.add_done_callback(self._discard_call)
+        return call
+
+    def flush(self, wait=True):
+        """
+        With `wait`, blocks until every submitted message has been sent or has failed
+        """
+        with self.lock:
+            in_flight = list(self.in_flight)
+        if wait:
+            futures.wait(in_flight)
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _discard_call(self, call):
+        with self.lock:
+            self.in_flight.discard(call)
+
+    def _deliver(self, phone_number, message):
+        self.limiter.acquire()
+        try:
+            result = SendSMS.send_bulk(message, [phone_number], client=self.client)[phone_number]
+        except Exception as e:
+            logger.error(f"Error sending SMS to {phone_number}: {e}", exc_info=True)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
@@ -0,0 +1,229 @@
+from flask import request  # type: ignore
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Id of the request being served on this thread; None outside requests (CLI commands, worker threads)
+current_request_id = ContextVar("current_request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, request id, process and source location,
+    plus the formatted traceback under `exc` when there is one
+    """
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+            "where": f"{record.module}:{record.lineno}",
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps each record with the current request id; runs in the thread that logs, before the record is queued
+    """
+    def filter(self, record):
+        record.request_id = current_request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fixed fraction of the records below WARNING from the configured loggers (and their children);
+    warnings and errors always pass. `rates` maps logger names to the fraction kept, e.g. {"api.orders": 0.1}.
+    The fraction is exact rather than random: with 0.1, every tenth record is kept.
+    """
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._rate_by_name = {}
+        self._credit = {}
+        self._lock = threading.Lock()
+
+    def rate_for(self, name):
+        rate = self._rate_by_name.get(name)
+        if rate is None:
+            rate = 1.0
+            # The most specific configured ancestor wins: "api" covers "api.orders" unless it has its own rate
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._rate_by_name[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1:
+            return True
+        with self._lock:
+            credit = self._credit.get(record.name, 0.0) + rate
+            keep = credit >= 1
+            self._credit[record.name] = credit - 1 if keep else credit
+        return keep
+
+
+def parse_sampling(spec):
+    """
+    Parses "api.orders=0.1,services.sms_orders=0.5" into {"api.orders": 0.1, "services.sms_orders": 0.5}
+    """
+    rates = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, rate = part.partition("=")
+        rate = float(rate)
+        if not name.strip() or not 0 <= rate <= 1:
+            raise ValueError(f"Invalid LOG_SAMPLING entry {part!r}; expected <logger>=<fraction between 0 and 1>")
+        rates[name.strip()] = rate
+    return rates
+
+
+class _DrainingListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Blocking put: on a full queue the stop marker waits for room instead of raising queue.Full
+        self.queue.put(self._sentinel)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded in-memory queue; a listener thread formats them and does the file I/O.
+
+    Logging threads never block: when the queue is full the record is dropped and counted in `dropped`.
+    Threads do not survive a fork, so the listener is started in each process on its first record, and
+    stopped (draining the queue) at exit. A forked child (a gunicorn worker of a preloaded app) also gets a
+    fresh queue and lock: the inherited ones may hold the parent's pending records, which the parent's listener
+    writes, or be locked by a thread that no longer exists in the child.
+    """
+    def __init__(self, handlers, max_pending=10000):
+        super().__init__(queue.Queue(maxsize=max_pending))
+        self.handlers = handlers
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"): # Not on Windows, which has no fork
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def prepare(self, record):
+        # Only resolve what cannot wait for the listener thread (args, traceback objects); the listener formats
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def _after_fork(self):
+        self.queue = queue.Queue(maxsize=self.max_pending)
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+        self.dropped = 0
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._listener = _DrainingListener(self.queue, *self.handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+
+def build_log_handler(config):
+    """
+    Creates the queued handler for the app's LOG_* settings: JSON (or text) lines to a size-rotated file,
+    or to stdout when LOG_FILE is "-", with per-logger sampling and request ids
+    """
+    path = config.get("LOG_FILE", "logs/make-an-order.log")
+    if path == "-":
+        output = logging.StreamHandler(sys.stdout)
+    else:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        output = RotatingFileHandler(
+            path, maxBytes=config.get("LOG_MAX_BYTES", 10 * 1024 * 1024), backupCount=config.get("LOG_BACKUP_COUNT", 10)
+        )
+    if config.get("LOG_FORMAT", "json") == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+
+    handler = AsyncQueueHandler([output], max_pending=config.get("LOG_QUEUE_MAX", 10000))
+    sampling = parse_sampling(config.get("LOG_SAMPLING"))
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling)) # First, so dropped records cost nothing more
+    handler.addFilter(RequestIdFilter())
+    return handler
+
+
+def register_request_ids(app):
+    """
+    Gives every request an id (the caller's X-Request-ID if it is sane, else a new one),
+    stamps it on the request's log records and returns it in the X-Request-ID response header
+    """
+    @app.before_request
+    def assign_request_id():
+        supplied = request.headers.get(REQUEST_ID_HEADER, "")
+        current_request_id.set(supplied if VALID_REQUEST_ID.match(supplied) else uuid.uuid4().hex)
+
+    @app.after_request
+    def return_request_id(response):
+        request_id = current_request_id.get()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    @app.teardown_request
+    def clear_request_id(exception=None):
+        current_request_id.set(None)
@@ -0,0 +1,108 @@
+from models import db, TableVersion, VERSIONED_TABLES
+from sqlalchemy import event, select, update
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+WRITTEN_TABLES = "written_versioned_tables" # Session.info key: tables written in the current transaction
+
+
+def register_version_tracking(session=None):
+    """
+    Bumps the TableVersion row of every versioned table a session writes to, inside the same transaction.
+
+    ORM changes are picked up after each flush; Core and bulk DML run through `session.execute`
+    (multi-row inserts, upserts, `query.update()`/`delete()`) are picked up as they execute.
+    A delete also bumps the tables the database changes through ON DELETE CASCADE / SET NULL foreign keys.
+    The written tables are only noted along the way; their counters are bumped once, just before the
+    transaction commits, so the shared counter rows stay locked for the commit alone and not for the
+    whole transaction. Writes made on a raw connection outside the session are not tracked.
+    """
+    session = session or db.session
+    if not event.contains(session, "after_flush", _after_flush):
+        event.listen(session, "after_flush", _after_flush)
+        event.listen(session, "do_orm_execute", _do_orm_execute)
+        event.listen(session, "before_commit", _before_commit)
+        event.listen(session, "after_transaction_end", _after_transaction_end)
+
+
+def bump_versions(connection, tables):
+    """
+    Increments the counters of `tables` (names outside VERSIONED_TABLES are ignored)
+    """
+    tables = sorted(set(tables) & set(VERSIONED_TABLES)) # Sorted so concurrent writers lock rows in the same order
+    if tables:
+        connection.execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.table_name.in_(tables))
+            .values(version=TableVersion.__table__.c.version + 1)
+        )
+
+
+@lru_cache(maxsize=None)
+def delete_cascades(table):
+    """
+    Names of the tables whose rows the database deletes or updates when rows of `table` are deleted,
+    following ON DELETE CASCADE / SET NULL foreign keys transitively
+    """
+    affected, pending = set(), [table]
+    while pending:
+        parent = pending.pop()
+        for child in db.metadata.tables.values():
+            if child.name not in affected and any(
+                fk.column.table.name == parent and (fk.ondelete or "").upper() in ("CASCADE", "SET NULL")
+                for fk in child.foreign_keys
+            ):
+                affected.add(child.name)
+                pending.append(child.name)
+    return frozenset(affected)
+
+
+def table_versions(*tables):
+    """
+    Current counters of `tables` as a dict, read with one primary-key lookup
+    """
+    rows = db.session.execute(
+        select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(tables))
+    ).all()
+    return dict(rows)
+
+
+def _after_flush(session, flush_context):
+    # new/dirty/deleted still describe what this flush wrote
+    tables = {instance.__table__.name for instance in session.new}
+    for instance in session.deleted:
+        tables.add(instance.__table__.name)
+        tables.update(delete_cascades(instance.__table__.name))
+    tables.update(instance.__table__.name for instance in session.dirty if session.is_modified(instance))
+    _note_written(session, tables)
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    name = getattr(table, "name", None)
+    tables = {name, *delete_cascades(name)} if orm_execute_state.is_delete else {name}
+    _note_written(orm_execute_state.session, tables)
+
+
+def _note_written(session, tables):
+    tables = set(tables) & set(VERSIONED_TABLES)
+    if tables:
+        session.info.setdefault(WRITTEN_TABLES, set()).update(tables)
+
+
+def _before_commit(session):
+    if session.in_nested_transaction():
+        return # A savepoint; the outer transaction bumps everything when it commits
+    session.flush() # Commit's own flush runs after this hook, so its writes are collected first
+    tables = session.info.pop(WRITTEN_TABLES, None)
+    if tables:
+        bump_versions(session.connection(), tables)
+
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None: # Committed (and bumped) or rolled back; either way the next one starts clean
+        session.info.pop(WRITTEN_TABLES, None)
@@ -0,0 +1,22 @@
+import os
+import tempfile
+import pytest # type: ignore
+
+# Keep the shared test app's sessions in a file rather than in the per-test in-memory database, so query
+# budgets count the endpoints' own statements. tests/test_session_store.py covers the database store.
+os.environ.setdefault("SESSION_STORE_PATH", os.path.join(tempfile.mkdtemp(), "sessions.db"))
+
+from app import app, db
+from services.query_budget import max_queries
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Query budget for a block of test code; fails listing the statements if the block runs more than `limit`:
+
+        with assert_max_queries(2):
+            client.get("/orders/view_orders")
+    """
+    with app.app_context():
+        engine = db.engine
+    return lambda limit: max_queries(limit, engine)
@@ -0,0 +1,28 @@
+import sys
+from app import create_app
+from config import Config
+from models import db, Customer
+
+class FactoryTestConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test_secret_key'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    AUTO_CREATE_TABLES = True
+
+def test_create_app_uses_given_config():
+    app = create_app(FactoryTestConfig)
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:///:memory:'
+    with app.app_context():
+        # AUTO_CREATE_TABLES created the schema on this app's own database
+        assert Customer.query.count() == 0
+        assert db.engine.url.database == ':memory:'
+
+def test_create_app_registers_routes_and_commands():
+    app = create_app(FactoryTestConfig)
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+    assert {'dashboard', 'orders.place_order', 'customers.view_customers', 'auth.login', 'delivery_reports'} <= endpoints
+    assert {'create-db', 'sms-worker', 'explain-queries'} <= set(app.cli.commands)
+
+def test_create_app_does_not_initialize_sms_client():
+    create_app(FactoryTestConfig)
+    assert 'africastalking' not in sys.modules or sys.modules['services.sms_service']._client is None
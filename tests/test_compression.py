@@ -0,0 +1,96 @@
+import gzip
+import os
+import time
+import pytest # type: ignore
+from flask import Flask # type: ignore
+from app import create_app
+from config import Config
+from services.compression import precompress_directory, serve_precompressed_static
+
+@pytest.fixture
+def compression_app(tmp_path):
+    class CompressionTestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'compression.db'}"
+        AUTO_CREATE_TABLES = True
+        SESSION_STORE_PATH = str(tmp_path / "sessions.db")
+        COMPRESS_MIN_BYTES = 500
+
+    return create_app(CompressionTestConfig)
+
+@pytest.fixture
+def client(compression_app):
+    client = compression_app.test_client()
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com'}
+    for i in range(20):
+        client.post("/customers/register", json={"name": f"Customer {i}", "phone_number": f"+2547000000{i:02d}", "code": f"CODE{i}"})
+    return client
+
+def test_large_json_is_gzipped_with_weak_etag(client):
+    plain = client.get("/customers/view_customers")
+    assert "Content-Encoding" not in plain.headers # The client did not ask for it
+
+    response = client.get("/customers/view_customers", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(plain.get_data())
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/')
+    revalidated = client.get("/customers/view_customers", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+def test_brotli_is_preferred_when_accepted(client):
+    brotli = pytest.importorskip("brotli")
+    plain = client.get("/customers/view_customers").get_data()
+    response = client.get("/customers/view_customers", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.get_data()) == plain
+    response = client.get("/customers/view_customers", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/customers/view_customers?limit=1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+def test_streamed_export_is_compressed(client):
+    plain = client.get("/customers/export?format=csv").get_data()
+    response = client.get("/customers/export?format=csv", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(response.get_data()) == plain
+
+def test_precompressed_static_assets(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    css = ".card { box-shadow: 0 0 4px rgba(0, 0, 0, 0.1); }\n" * 50
+    (static / "style.css").write_text(css)
+    (static / "tiny.css").write_text("a{}")
+    written = precompress_directory(str(static))
+    assert str(static / "style.css.gz") in written
+    assert not (static / "tiny.css.gz").exists() # Too small to be worth it
+
+    app = Flask(__name__, static_folder=str(static))
+    serve_precompressed_static(app)
+    client = app.test_client()
+    response = client.get("/static/style.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.get_data()).decode() == css
+    response.close()
+
+    response = client.get("/static/style.css")
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data().decode() == css
+    response.close()
+
+    # An asset edited after the build is served as is, not from its outdated copy
+    later = time.time() + 10
+    os.utime(static / "style.css", (later, later))
+    response = client.get("/static/style.css", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    response.close()
+    assert client.get("/static/missing.css", headers={"Accept-Encoding": "gzip"}).status_code == 404
@@ -0,0 +1,101 @@
+import time
+import pytest # type: ignore
+from app import app, db
+from models import Customer
+from services.customer_cache import CachedCustomer, CustomerCache, LRUCache
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config['SECRET_KEY'] = 'test_secret_key'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            app.extensions['customer_cache'] = CustomerCache(max_entries=100, ttl=60)
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+@pytest.fixture
+def logged_in_client(client):
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com'}
+        sess['access_token'] = 'fake-token'
+    return client
+
+def add_customer(name='Alice', phone_number='+25756098389', code='XYZ789'):
+    customer = Customer(name=name, phone_number=phone_number, code=code)
+    db.session.add(customer)
+    db.session.commit()
+    return customer.id
+
+def test_lru_evicts_least_recently_used_and_expires():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a') # 'b' is now the least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.evictions == 1
+
+    short_lived = LRUCache(max_entries=2, ttl=0.01)
+    short_lived.set('a', 1)
+    time.sleep(0.02)
+    assert short_lived.get('a') is None
+    assert short_lived.expirations == 1
+
+def test_read_through_by_id_phone_and_code(client):
+    customer_id = add_customer()
+    cache = app.extensions['customer_cache']
+    customer = cache.get_by_id(customer_id)
+    assert customer == CachedCustomer(customer_id, 'Alice', '+25756098389', 'XYZ789')
+    # The first load stored every key, so these are hits
+    assert cache.get_by_phone('+25756098389') == customer
+    assert cache.get_by_code('XYZ789') == customer
+    assert cache.get_by_id('not-a-number') is None
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+    assert stats["entries"] == 3
+
+def test_view_customer_served_from_cache(logged_in_client):
+    customer_id = add_customer()
+    assert logged_in_client.get(f"/customers/view_customers/{customer_id}").status_code == 200
+    response = logged_in_client.get(f"/customers/view_customers/{customer_id}")
+    assert response.get_json() == {"id": customer_id, "name": "Alice", "phone_number": "+25756098389", "code": "XYZ789"}
+    stats = logged_in_client.get("/internal/cache").get_json()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+def test_update_and_delete_invalidate(logged_in_client):
+    customer_id = add_customer()
+    cache = app.extensions['customer_cache']
+    cache.get_by_id(customer_id)
+
+    response = logged_in_client.put(f"/customers/update_customers/{customer_id}", json={"name": "Alicia", "phone_number": "+25700000000"})
+    assert response.status_code == 200
+    assert cache.get_by_phone('+25756098389') is None # The old phone number no longer resolves
+    assert cache.get_by_id(customer_id).name == 'Alicia'
+
+    response = logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 10})
+    assert response.status_code == 201
+
+    assert logged_in_client.delete(f"/customers/delete_customers/{customer_id}").status_code == 200
+    assert cache.get_by_id(customer_id) is None
+    assert logged_in_client.get(f"/customers/view_customers/{customer_id}").status_code == 404
+
+def test_shared_backend_serves_other_workers(client, tmp_path):
+    customer_id = add_customer()
+    path = str(tmp_path / 'customers.cache')
+    worker_a = CustomerCache(ttl=60, shared_path=path)
+    worker_b = CustomerCache(ttl=60, shared_path=path)
+    worker_a.get_by_id(customer_id)
+    assert worker_b.get_by_code('XYZ789').id == customer_id
+    assert worker_b.stats()["shared_hits"] == 1
+    assert worker_b.stats()["misses"] == 0
+
+    worker_a.invalidate(worker_a.get_by_id(customer_id))
+    worker_b.local.clear()
+    assert worker_b.get_by_id(customer_id) is not None
+    assert worker_b.stats()["misses"] == 1 # Invalidation reached the shared store
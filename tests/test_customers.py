@@ -1,6 +1,9 @@
+import io
 import pytest # type: ignore
 from app import app, db
 from models import Customer # Import Customer model
+from services.customer_search import CustomerSearchIndex
+from sqlalchemy import update
 
 @pytest.fixture
 def client():
@@ -14,6 +17,7 @@ def client():
         yield client
         with app.app_context():
             db.drop_all()
+        app.extensions['customer_cache'].clear() # Ids are reused by the next test's fresh database
 
 # Helper to simulate a logged-in session for protected routes
 @pytest.fixture
@@ -23,9 +27,10 @@ def logged_in_client(client):
         sess['access_token'] = 'fake-token'
     return client
 
-def test_register_customer(logged_in_client):
+def test_register_customer(logged_in_client, assert_max_queries):
     data = {"name": "John Doe", "phone_number": "+25756098389", "code": "ABC123"}
-    response = logged_in_client.post("/customers/register", json=data)
+    with assert_max_queries(2):
+        response = logged_in_client.post("/customers/register", json=data)
     assert response.status_code == 201
     assert response.get_json()["message"] == "Customer registered successfully"
 
@@ -41,50 +46,225 @@ def test_register_duplicate_customer(logged_in_client):
     assert response.status_code == 400
     assert response.get_json()["error"] == "Phone number or code already exists"
 
-def test_view_customers(logged_in_client):
+def test_view_customers(logged_in_client, assert_max_queries):
+    logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
+    with assert_max_queries(2):
+        response = logged_in_client.get("/customers/view_customers")
+    assert response.status_code == 200
+    assert len(response.get_json()["customers"]) == 1
+
+def test_view_customers_paginated(logged_in_client):
+    for i in range(3):
+        logged_in_client.post("/customers/register", json={"name": f"Customer {i}", "phone_number": f"+25470000000{i}", "code": f"PAGE{i}"})
+    first = logged_in_client.get("/customers/view_customers?limit=2").get_json()
+    assert len(first["customers"]) == 2
+    assert first["next_cursor"] is not None
+    second = logged_in_client.get(f"/customers/view_customers?limit=2&cursor={first['next_cursor']}").get_json()
+    assert len(second["customers"]) == 1
+    assert second["next_cursor"] is None
+    assert second["customers"][0]["id"] > first["customers"][-1]["id"]
+
+def test_view_customers_all_opt_in(logged_in_client):
     logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
-    response = logged_in_client.get("/customers/view_customers")
+    response = logged_in_client.get("/customers/view_customers?all=true")
     assert response.status_code == 200
     assert len(response.get_json()) == 1
 
+def test_view_customers_sparse_fields(logged_in_client):
+    logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
+    page = logged_in_client.get("/customers/view_customers?fields=name").get_json()
+    assert page["customers"] == [{"name": "Jane Doe"}]
+    columns = logged_in_client.get("/customers/view_customers?all=true&fields=code,id&format=columnar").get_json()
+    assert columns == {"code": ["DEF456"], "id": [1]}
+
 def test_view_customers_unauthorized(client):
     response = client.get("/customers/view_customers")
     assert response.status_code == 302 # Redirect to login
 
-def test_view_single_customer(logged_in_client):
+def test_view_single_customer(logged_in_client, assert_max_queries):
     response = logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
     customer_id = response.get_json()["customer_id"]
-    response = logged_in_client.get(f"/customers/view_customers/{customer_id}")
+    with assert_max_queries(1):
+        response = logged_in_client.get(f"/customers/view_customers/{customer_id}")
     assert response.status_code == 200
     assert response.get_json()["name"] == "Jane Doe"
 
-def test_view_nonexistent_customer(logged_in_client):
-    response = logged_in_client.get("/customers/view_customers/999")
+def test_view_nonexistent_customer(logged_in_client, assert_max_queries):
+    with assert_max_queries(2):
+        response = logged_in_client.get("/customers/view_customers/999")
     assert response.status_code == 404
     assert response.get_json()["error"] == "Customer not found"
 
-def test_update_customer(logged_in_client):
+def test_update_customer(logged_in_client, assert_max_queries):
     response = logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
     customer_id = response.get_json()["customer_id"]
     update_data = {"name": "Jane Smith"}
-    response = logged_in_client.put(f"/customers/update_customers/{customer_id}", json=update_data)
+    with assert_max_queries(4):
+        response = logged_in_client.put(f"/customers/update_customers/{customer_id}", json=update_data)
     assert response.status_code == 200
     assert response.get_json()["message"] == "Customer updated successfully"
 
-def test_update_nonexistent_customer(logged_in_client):
+def test_update_nonexistent_customer(logged_in_client, assert_max_queries):
     update_data = {"name": "Jane Smith"}
-    response = logged_in_client.put("/customers/update_customers/999", json=update_data)
+    with assert_max_queries(1):
+        response = logged_in_client.put("/customers/update_customers/999", json=update_data)
     assert response.status_code == 404
     assert response.get_json()["error"] == "Customer not found"
 
-def test_delete_customer(logged_in_client):
+def test_delete_customer(logged_in_client, assert_max_queries):
     response = logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
     customer_id = response.get_json()["customer_id"]
-    response = logged_in_client.delete(f"/customers/delete_customers/{customer_id}")
+    with assert_max_queries(3):
+        response = logged_in_client.delete(f"/customers/delete_customers/{customer_id}")
     assert response.status_code == 200
     assert response.get_json()["message"] == "Customer deleted successfully"
 
-def test_delete_nonexistent_customer(logged_in_client):
-    response = logged_in_client.delete("/customers/delete_customers/999")
+def test_delete_nonexistent_customer(logged_in_client, assert_max_queries):
+    with assert_max_queries(1):
+        response = logged_in_client.delete("/customers/delete_customers/999")
     assert response.status_code == 404
-    assert response.get_json()["error"] == "Customer not found"
\ No newline at end of file
+    assert response.get_json()["error"] == "Customer not found"
+def test_export_customers_csv(logged_in_client, assert_max_queries):
+    logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
+    with assert_max_queries(1):
+        response = logged_in_client.get("/customers/export?format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "id,name,phone_number,code"
+    assert lines[1].endswith("Jane Doe,+25756098388,DEF456")
+
+def test_import_customers_csv(logged_in_client):
+    logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
+    csv_data = (
+        "name,phone_number,code\n"
+        "Jane Smith,+25756098388,DEF456\n" # updates Jane by phone_number
+        "New Person,+254700000001,NEW001\n"
+        "No Phone,,NEW002\n"
+        "Another,+254700000002,NEW003\n"
+    )
+    response = logged_in_client.post("/customers/import", data={"file": (io.BytesIO(csv_data.encode()), "customers.csv")}, content_type="multipart/form-data")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["inserted"], body["updated"], body["rejected"]) == (2, 1, 1)
+    assert body["errors"][0]["line"] == 4
+    customers = logged_in_client.get("/customers/view_customers?all=true").get_json()
+    assert len(customers) == 3
+    assert customers[0]["name"] == "Jane Smith"
+
+def test_import_customers_updates_by_code_and_rejects_conflicts(logged_in_client):
+    logged_in_client.post("/customers/register", json={"name": "Jane Doe", "phone_number": "+25756098388", "code": "DEF456"})
+    logged_in_client.post("/customers/register", json={"name": "John Doe", "phone_number": "+25756098389", "code": "ABC123"})
+    csv_data = (
+        "name,phone_number,code\n"
+        "Jane New Phone,+254711111111,DEF456\n"
+        "Mixed Up,+25756098389,DEF456\n"
+    )
+    response = logged_in_client.post("/customers/import", data=csv_data, content_type="text/csv")
+    body = response.get_json()
+    assert (body["inserted"], body["updated"], body["rejected"]) == (0, 1, 1)
+    customers = logged_in_client.get("/customers/view_customers?all=true").get_json()
+    assert customers[0]["phone_number"] == "+254711111111"
+
+def test_import_customers_reports_result_when_refresh_fails(logged_in_client, monkeypatch):
+    def broken_reindex():
+        raise RuntimeError("index unavailable")
+    monkeypatch.setattr("api.customers.reindex_customers", broken_reindex)
+    response = logged_in_client.post("/customers/import", data="name,phone_number,code\nJane,+254700000001,NEW001\n", content_type="text/csv")
+    assert response.status_code == 200
+    assert response.get_json()["inserted"] == 1
+
+def test_import_customers_requires_columns(logged_in_client):
+    response = logged_in_client.post("/customers/import", data="name,phone\nJane,+1\n", content_type="text/csv")
+    assert response.status_code == 400
+
+def test_view_customers_etag(logged_in_client):
+    response = logged_in_client.post("/customers/register", json={"name": "Bob", "phone_number": "+25799999999", "code": "BOB123"})
+    customer_id = response.get_json()["customer_id"]
+    list_etag = logged_in_client.get("/customers/view_customers").headers["ETag"]
+    detail_etag = logged_in_client.get(f"/customers/view_customers/{customer_id}").headers["ETag"]
+    assert logged_in_client.get("/customers/view_customers", headers={"If-None-Match": list_etag}).status_code == 304
+    assert logged_in_client.get(f"/customers/view_customers/{customer_id}", headers={"If-None-Match": detail_etag}).status_code == 304
+
+    logged_in_client.put(f"/customers/update_customers/{customer_id}", json={"name": "Robert"})
+    response = logged_in_client.get(f"/customers/view_customers/{customer_id}", headers={"If-None-Match": detail_etag})
+    assert response.status_code == 200
+    assert response.get_json()["name"] == "Robert"
+
+    # A write the cache has not seen yet (another worker's, until the TTL) keeps the cached body and its own tag
+    detail_etag = logged_in_client.get(f"/customers/view_customers/{customer_id}").headers["ETag"]
+    with app.app_context():
+        db.session.execute(update(Customer).where(Customer.id == customer_id).values(name="Bobby"))
+        db.session.commit()
+    response = logged_in_client.get(f"/customers/view_customers/{customer_id}")
+    assert response.get_json()["name"] == "Robert"
+    assert response.headers["ETag"] == detail_etag
+
+    # Multi-row upserts from an import count as writes too
+    list_etag = logged_in_client.get("/customers/view_customers").headers["ETag"]
+    csv_body = "name,phone_number,code\nCarol,+25788888888,CAR001\n"
+    logged_in_client.post("/customers/import", data=csv_body, content_type="text/csv")
+    response = logged_in_client.get("/customers/view_customers", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert len(response.get_json()["customers"]) == 2
+
+SEARCH_CUSTOMERS = [
+    {"name": "Alice Kamau", "phone_number": "+254700111222", "code": "KAM"},
+    {"name": "Kamau Otieno", "phone_number": "+254711000333", "code": "OTI001"},
+    {"name": "Mary Wanjiku", "phone_number": "+254722000444", "code": "KAM01"},
+    {"name": "Peter 50% Off", "phone_number": "+255700000555", "code": "P50_1"},
+]
+
+def register_search_customers(client):
+    for data in SEARCH_CUSTOMERS:
+        client.post("/customers/register", json=data)
+
+def search_codes(client, query, **params):
+    response = client.get("/customers/search", query_string={"q": query, **params})
+    assert response.status_code == 200
+    return [customer["code"] for customer in response.get_json()["customers"]]
+
+def test_search_customers_ranks_prefix_matches(logged_in_client, assert_max_queries):
+    register_search_customers(logged_in_client)
+    with assert_max_queries(3): # One indexed range scan per kind of match
+        codes = search_codes(logged_in_client, "kam")
+    assert codes == ["KAM", "KAM01", "OTI001"] # Exact code, code prefix, then name prefix
+    assert search_codes(logged_in_client, "+254 700-111") == ["KAM"] # Phone digits, whatever the formatting
+    assert search_codes(logged_in_client, "2547") == ["KAM", "OTI001", "KAM01"]
+    assert search_codes(logged_in_client, "kam", limit=1) == ["KAM"]
+    assert search_codes(logged_in_client, "p50_") == ["P50_1"]
+    assert search_codes(logged_in_client, "p5%") == [] # LIKE wildcards are matched literally
+
+def test_search_customers_requires_query(logged_in_client):
+    response = logged_in_client.get("/customers/search?q=%20")
+    assert response.status_code == 400
+
+def test_search_customers_unauthorized(client):
+    response = client.get("/customers/search?q=kam")
+    assert response.status_code == 302 # Redirect to login
+
+def test_search_index_follows_writes(logged_in_client, assert_max_queries):
+    index = app.extensions['customer_search'] = CustomerSearchIndex(refresh_seconds=3600)
+    try:
+        register_search_customers(logged_in_client)
+        assert search_codes(logged_in_client, "wanj") == ["KAM01"] # Later words of a name match too
+        assert index.loads == 1
+        with assert_max_queries(0): # Served from memory
+            assert search_codes(logged_in_client, "kam") == ["KAM", "KAM01", "OTI001"]
+
+        response = logged_in_client.post("/customers/register", json={"name": "Kamande", "phone_number": "+254733000666", "code": "NEW1"})
+        new_id = response.get_json()["customer_id"]
+        logged_in_client.put(f"/customers/update_customers/{new_id}", json={"phone_number": "+254799000666"})
+        assert search_codes(logged_in_client, "kam") == ["KAM", "KAM01", "NEW1", "OTI001"]
+        assert search_codes(logged_in_client, "254799") == ["NEW1"]
+        assert search_codes(logged_in_client, "254733") == []
+
+        logged_in_client.delete(f"/customers/delete_customers/{new_id}")
+        assert search_codes(logged_in_client, "kama") == ["OTI001", "KAM"] # Name start, then a later word
+        assert index.loads == 1 # Writes in this process were applied without reloading
+
+        logged_in_client.post("/customers/import", data="name,phone_number,code\nKamala,+254744000777,IMP1\n", content_type="text/csv")
+        assert search_codes(logged_in_client, "254 744") == ["IMP1"]
+        assert index.loads == 2
+    finally:
+        app.extensions['customer_search'] = None
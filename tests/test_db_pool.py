@@ -0,0 +1,75 @@
+import pytest # type: ignore
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import create_app
+from config import Config
+from services.db_pool import InstrumentedQueuePool, instrument_engine, pool_engine_options
+
+def test_pool_engine_options_for_mysql():
+    config = {
+        "SQLALCHEMY_DATABASE_URI": "mysql+pymysql://user:pw@db.example.com/orders",
+        "DB_POOL_SIZE": 8, "DB_MAX_OVERFLOW": 4, "DB_POOL_TIMEOUT": 5, "DB_POOL_RECYCLE": 280, "DB_POOL_PRE_PING": True,
+        "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": 20} # Explicit options win
+    }
+    options = pool_engine_options(config)
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 4
+    assert options["pool_timeout"] == 5
+    assert options["pool_recycle"] == 280
+    assert options["pool_pre_ping"] is True
+
+def test_pool_engine_options_skip_in_memory_sqlite():
+    assert pool_engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}) == {}
+
+def test_pool_stats_track_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    stats = instrument_engine(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert stats.in_use == 1
+        assert engine.pool.stats is stats
+        # The only connection is checked out, so a second checkout times out
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["checkouts"] == 1
+    assert snapshot["checkins"] == 1
+    assert snapshot["in_use"] == 0
+    assert snapshot["peak_in_use"] == 1
+    assert snapshot["connects"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checkout_wait"]["count"] == 2
+    assert snapshot["checkout_wait"]["max_seconds"] >= 0.05
+    assert snapshot["pool"]["size"] == 1
+    assert snapshot["pool"]["checked_out"] == 0
+
+    # dispose() recreates the pool but keeps feeding the same stats
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert engine.pool.stats is stats
+    assert stats.checkouts == 2
+
+def test_pool_endpoint(tmp_path):
+    class PoolTestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test_secret_key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        AUTO_CREATE_TABLES = True
+        DB_POOL_SIZE = 3
+
+    app = create_app(PoolTestConfig)
+    with app.test_client() as client:
+        assert client.get("/internal/pool").status_code == 302 # Redirects to login
+        with client.session_transaction() as sess:
+            sess['profile'] = {'email': 'testuser@example.com'}
+        client.get("/customers/?all=true")
+        response = client.get("/internal/pool")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["pool"]["class"] == "InstrumentedQueuePool"
+    assert data["pool"]["size"] == 3
+    assert data["checkouts"] >= 1
+    assert data["checkout_wait"]["count"] >= 1
@@ -0,0 +1,123 @@
+import time
+from datetime import timedelta
+import pytest # type: ignore
+from app import app, create_app, db
+from config import Config
+from models import Customer, Order, OrderArchive, SmsDeliveryReport, SmsOutbox, utcnow
+from services.delivery_reports import DeliveryReportBuffer
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config['SECRET_KEY'] = 'test_secret_key'
+    app.config['AT_WEBHOOK_TOKEN'] = 'webhook-token'
+    buffer = app.extensions['delivery_reports']
+    # Write each report during the request so the tests need no background thread
+    app.extensions['delivery_reports'] = DeliveryReportBuffer(app, flush_interval=0)
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+    app.extensions['delivery_reports'] = buffer
+
+@pytest.fixture
+def logged_in_client(client):
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com'}
+        sess['access_token'] = 'fake-token'
+    return client
+
+def sent_message(provider_message_id='ATXid_1'):
+    customer = Customer(name='Alice', phone_number='+25756098389', code='XYZ789')
+    db.session.add(customer)
+    db.session.flush()
+    order = Order(customer_id=customer.id, item='Laptop', amount=1500.0)
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(SmsOutbox(order_id=order.id, phone_number=customer.phone_number, message='Hello Alice',
+                             status='sent', provider_message_id=provider_message_id))
+    db.session.commit()
+    return customer.id, order.id
+
+def test_delivery_report_webhook_stores_reports(logged_in_client):
+    customer_id, order_id = sent_message()
+    for status in ('Sent', 'Success'):
+        response = logged_in_client.post("/delivery-reports?token=webhook-token", data={"id": "ATXid_1", "status": status, "phoneNumber": "+25756098389", "networkCode": "63902"})
+        assert response.status_code == 200
+    assert SmsDeliveryReport.query.count() == 2
+
+    response = logged_in_client.get(f"/orders/delivery_status?order_id={order_id}")
+    assert response.status_code == 200
+    messages = response.get_json()["messages"]
+    assert len(messages) == 1
+    assert messages[0]["delivery_status"] == 'Success'
+    assert [report["status"] for report in messages[0]["reports"]] == ['Sent', 'Success']
+
+    by_customer = logged_in_client.get(f"/orders/delivery_status?customer_id={customer_id}").get_json()["messages"]
+    assert [message["order_id"] for message in by_customer] == [order_id]
+
+def test_delivery_status_follows_archived_orders(logged_in_client):
+    customer_id, order_id = sent_message()
+    logged_in_client.post("/delivery-reports?token=webhook-token", data={"id": "ATXid_1", "status": "Success"})
+    db.session.get(Order, order_id).time = utcnow() - timedelta(days=400)
+    db.session.commit()
+    assert "Archived 1 orders" in app.test_cli_runner().invoke(args=["archive-orders"]).output
+    assert db.session.get(OrderArchive, order_id) is not None
+
+    messages = logged_in_client.get(f"/orders/delivery_status?order_id={order_id}").get_json()["messages"]
+    assert [(message["order_id"], message["archived"], message["delivery_status"]) for message in messages] == [(order_id, True, 'Success')]
+    by_customer = logged_in_client.get(f"/orders/delivery_status?customer_id={customer_id}").get_json()["messages"]
+    assert [message["order_id"] for message in by_customer] == [order_id]
+
+def test_delivery_report_webhook_validation(logged_in_client):
+    assert logged_in_client.post("/delivery-reports?token=webhook-token", data={"status": "Success"}).status_code == 400
+    assert logged_in_client.get("/orders/delivery_status").status_code == 400
+
+    for retry_count in ("9999999999", "-1", "two"):
+        assert logged_in_client.post("/delivery-reports?token=webhook-token", data={"id": "ATXid_8", "status": "Failed", "retryCount": retry_count}).status_code == 400
+    assert logged_in_client.post("/delivery-reports?token=webhook-token", data={"id": "ATXid_8", "status": "Failed", "retryCount": "2"}).status_code == 200
+
+    app.extensions['delivery_reports'] = DeliveryReportBuffer(app, flush_interval=0, max_pending=0)
+    assert logged_in_client.post("/delivery-reports?token=webhook-token", json={"id": "ATXid_9", "status": "Failed"}).status_code == 503
+
+def test_delivery_reports_require_the_webhook_token(logged_in_client):
+    # Being logged in to the app is not enough; only the provider knows the token
+    assert logged_in_client.post("/delivery-reports", data={"id": "ATXid_1", "status": "Success"}).status_code == 403
+    assert logged_in_client.post("/delivery-reports?token=guess", data={"id": "ATXid_1", "status": "Success"}).status_code == 403
+    assert SmsDeliveryReport.query.count() == 0
+
+def test_buffer_sets_aside_a_report_the_database_rejects(client):
+    buffer = DeliveryReportBuffer(app, flush_interval=0, max_attempts=2)
+    bad = {"provider_message_id": "ATXid_bad", "status": None} # Violates NOT NULL
+    buffer.add(bad)
+    assert (buffer.written, buffer.pending()) == (0, 1)
+
+    # The next flush writes the good report around it and drops the bad one on its last attempt
+    buffer.add({"provider_message_id": "ATXid_good", "status": "Success"})
+    assert (buffer.written, buffer.dropped, buffer.pending()) == (1, 1, 0)
+    assert [report.provider_message_id for report in SmsDeliveryReport.query.all()] == ["ATXid_good"]
+
+def test_buffer_flushes_in_batches_from_background_thread(tmp_path):
+    class BufferTestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'reports.db'}"
+        AUTO_CREATE_TABLES = True
+        DELIVERY_REPORT_BATCH_SIZE = 10
+        DELIVERY_REPORT_FLUSH_SECONDS = 0.05
+        AT_WEBHOOK_TOKEN = 'webhook-token'
+
+    buffered_app = create_app(BufferTestConfig)
+    buffer = buffered_app.extensions['delivery_reports']
+    with buffered_app.test_client() as client:
+        for i in range(25):
+            assert client.post("/delivery-reports?token=webhook-token", data={"id": f"ATXid_{i}", "status": "Success"}).status_code == 200
+
+    deadline = time.monotonic() + 5
+    while buffer.written < 25 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert buffer.written == 25
+    assert buffer.pending() == 0
+    with buffered_app.app_context():
+        assert SmsDeliveryReport.query.count() == 25
@@ -0,0 +1,48 @@
+import dataclasses
+import json
+import pytest # type: ignore
+from datetime import datetime
+from decimal import Decimal
+from flask import Flask # type: ignore
+from flask.json.provider import DefaultJSONProvider # type: ignore
+from services import json_provider
+from services.json_provider import FastJSONProvider
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+VALUES = {
+    "amount": Decimal("12.50"),
+    "time": datetime(2024, 5, 1, 12, 30),
+    "name": "Wanjikũ",
+    "point": Point(1, 2),
+    "nested": [{"b": 1, "a": None}],
+}
+
+def providers():
+    app = Flask(__name__)
+    return DefaultJSONProvider(app), FastJSONProvider(app), app
+
+def test_fast_provider_matches_stock_output():
+    stock, fast, app = providers()
+    assert json.loads(fast.dumps(VALUES)) == json.loads(stock.dumps(VALUES))
+    with app.app_context():
+        assert json.loads(fast.response(VALUES).get_data()) == json.loads(stock.response(VALUES).get_data())
+    assert fast.loads(b'{"a": [1, 2.5]}') == {"a": [1, 2.5]}
+
+def test_fast_provider_falls_back_to_stdlib():
+    stock, fast, _ = providers()
+    huge = {"value": 2 ** 70} # Beyond orjson's 64-bit integers
+    assert fast.dumps(huge) == stock.dumps(huge)
+    assert fast.dumps({"a": 1}, indent=4) == stock.dumps({"a": 1}, indent=4)
+    with pytest.raises(ValueError):
+        fast.loads("{not json")
+
+def test_fast_provider_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, "orjson", None)
+    stock, fast, app = providers()
+    assert fast.dumps(VALUES) == stock.dumps(VALUES)
+    with app.app_context():
+        assert fast.response(VALUES).get_data() == stock.response(VALUES).get_data()
@@ -0,0 +1,88 @@
+import glob
+import os
+import re
+from app import create_app, db
+from config import Config
+from services.metrics import MetricsRegistry
+
+def make_app(tmp_path, **settings):
+    class MetricsTestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test_secret_key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'metrics.db'}"
+        AUTO_CREATE_TABLES = True
+    for name, value in settings.items():
+        setattr(MetricsTestConfig, name, value)
+    return create_app(MetricsTestConfig)
+
+def sample(body, line_start):
+    match = re.search(rf"^{re.escape(line_start)} (\S+)$", body, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+def test_requests_and_sql_are_recorded_per_endpoint(tmp_path):
+    app = make_app(tmp_path)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com'}
+    client.post("/customers/register", json={"name": "Alice", "phone_number": "+25756098389", "code": "XYZ789"})
+    client.get("/customers/view_customers")
+    client.get("/customers/view_customers")
+    client.get("/no-such-page")
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert sample(body, 'http_requests_total{endpoint="customers.view_customers",method="GET",status="200"}') == 2
+    assert sample(body, 'http_requests_total{endpoint="customers.register_customer",method="POST",status="201"}') == 1
+    assert sample(body, 'http_requests_total{endpoint="unmatched",method="GET",status="404"}') == 1
+    assert sample(body, 'http_request_duration_seconds_count{endpoint="customers.view_customers"}') == 2
+    assert sample(body, 'http_request_duration_seconds_bucket{endpoint="customers.view_customers",le="+Inf"}') == 2
+    assert sample(body, 'db_queries_total{endpoint="customers.register_customer"}') >= 1
+    assert sample(body, 'db_query_seconds_total{endpoint="customers.register_customer"}') > 0
+    assert sample(body, 'db_queries_per_request_count{endpoint="customers.view_customers"}') == 2
+    # Only the scrape itself is still being served
+    assert sample(body, 'http_requests_in_flight{endpoint="customers.view_customers"}') == 0
+    assert sample(body, 'http_requests_in_flight{endpoint="metrics"}') == 1
+
+def test_metrics_token(tmp_path):
+    client = make_app(tmp_path, METRICS_TOKEN="s3cret").test_client()
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+
+def test_worker_snapshots_are_summed(tmp_path):
+    directory = str(tmp_path / "metrics")
+    # A worker that has exited: its counters and histograms still count, its gauges do not
+    exited = MetricsRegistry(directory)
+    exited.inc("http_requests_total", ("orders.view_orders", "GET", "200"), 3)
+    exited.observe("http_request_duration_seconds", ("orders.view_orders",), 0.02, (0.01, 0.05))
+    exited.add_gauge("http_requests_in_flight", ("orders.view_orders",), 2)
+    exited.maybe_flush(force=True)
+    (snapshot,) = glob.glob(os.path.join(directory, f"{os.getpid()}-*.json"))
+    os.replace(snapshot, os.path.join(directory, "999999999-1.json"))
+
+    current = MetricsRegistry(directory)
+    current.inc("http_requests_total", ("orders.view_orders", "GET", "200"), 2)
+    current.observe("http_request_duration_seconds", ("orders.view_orders",), 0.5, (0.01, 0.05))
+    current.add_gauge("http_requests_in_flight", ("orders.view_orders",), 1)
+
+    body = current.render()
+    assert sample(body, 'http_requests_total{endpoint="orders.view_orders",method="GET",status="200"}') == 5
+    assert sample(body, 'http_request_duration_seconds_bucket{endpoint="orders.view_orders",le="0.05"}') == 1
+    assert sample(body, 'http_request_duration_seconds_bucket{endpoint="orders.view_orders",le="+Inf"}') == 2
+    assert sample(body, 'http_request_duration_seconds_sum{endpoint="orders.view_orders"}') == 0.52
+    assert sample(body, 'http_requests_in_flight{endpoint="orders.view_orders"}') == 1
+
+def test_exited_workers_are_folded_and_reused_pids_kept_apart(tmp_path):
+    directory = str(tmp_path / "metrics")
+    for name in ("999999999-1.json", f"{os.getpid()}-1.json"): # An exited worker, and one whose pid is now ours
+        exited = MetricsRegistry(directory)
+        exited.inc("http_requests_total", ("orders.view_orders", "GET", "200"), 3)
+        exited.maybe_flush(force=True)
+        os.replace(os.path.join(directory, exited._file_name), os.path.join(directory, name))
+
+    current = MetricsRegistry(directory)
+    current.inc("http_requests_total", ("orders.view_orders", "GET", "200"), 2)
+    for _ in range(2): # Folding happens once; the totals stay put
+        body = current.render()
+        assert sample(body, 'http_requests_total{endpoint="orders.view_orders",method="GET",status="200"}') == 8
+    assert sorted(os.listdir(directory)) == sorted([".lock", "dead.json", os.path.basename(current._file_name)])
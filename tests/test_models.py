@@ -1,6 +1,8 @@
 import pytest # type: ignore
 from app import app, db
 from models import Customer, Order
+from services.table_versions import table_versions
+from sqlalchemy import event
 
 # This will set up a test client with a temporary database
 @pytest.fixture
@@ -97,10 +99,36 @@ def test_delete_customer_and_order(client):
     db.session.add(order)
     db.session.commit()
 
-    # Deleting the customer should also delete the related order
+    # Deleting the customer should also delete the related order; the database cascades the delete,
+    # so the order object left in the session is stale and only its id is read back
+    customer_id, order_id = customer.id, order.id
     db.session.delete(customer)
     db.session.commit()
 
     # Assert customer and order are deleted
-    assert db.session.get(Customer, customer.id) is None  # Use db.session.get instead of query.get
-    assert db.session.get(Order, order.id) is None  # Use db.session.get instead of query.get
\ No newline at end of file
+    assert db.session.get(Customer, customer_id) is None  # Use db.session.get instead of query.get
+    assert db.session.get(Order, order_id) is None  # Use db.session.get instead of query.get
+# Test that table versions are bumped once, at commit, and not for rolled-back writes
+def test_table_versions_bump_at_commit(client):
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        customer = Customer(name='John Doe', phone_number='1234567890', code='CUST001')
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(Order(customer_id=customer.id, item='Book', amount=12.5))
+        db.session.commit()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    bumps = [statement for statement in statements if statement.startswith("UPDATE table_versions")]
+    assert len(bumps) == 1 and statements[-1] == bumps[0] # One bump, the last statement before COMMIT
+    versions = table_versions("customers", "orders")
+
+    db.session.add(Customer(name='Jane Doe', phone_number='1234567891', code='CUST002'))
+    db.session.flush()
+    db.session.rollback()
+    db.session.add(Order(customer_id=customer.id, item='Pen', amount=1))
+    db.session.commit()
+    assert table_versions("customers", "orders") == {"customers": versions["customers"], "orders": versions["orders"] + 1}
@@ -1,6 +1,10 @@
+import json
 import pytest # type: ignore
 from app import app, db
-from models import Customer # Import Customer model for setup
+from models import Customer, Order, OrderArchive, OrderDailyRollup, SmsOutbox, utcnow # Import models for setup and assertions
+from services.customer_cache import customer_cache
+from sqlalchemy import delete, insert
+from datetime import timedelta
 
 @pytest.fixture
 def client():
@@ -13,6 +17,7 @@ def client():
         yield client
         with app.app_context():
             db.drop_all()
+        app.extensions['customer_cache'].clear() # Ids are reused by the next test's fresh database
 
 # Helper to simulate a logged-in session for protected routes
 @pytest.fixture
@@ -28,10 +33,11 @@ def setup_customer(logged_in_client):
     customer_id = response.get_json()["customer_id"]
     return customer_id
 
-def test_place_order(logged_in_client):
+def test_place_order(logged_in_client, assert_max_queries):
     customer_id = setup_customer(logged_in_client)
     data = {"customer_id": customer_id, "item": "Laptop", "amount": 1500.0}
-    response = logged_in_client.post("/orders/place_order", json=data)
+    with assert_max_queries(5):
+        response = logged_in_client.post("/orders/place_order", json=data)
     assert response.status_code == 201
     assert response.get_json()["message"] == "Order placed successfully!"
     assert "sms_status" in response.get_json()
@@ -45,59 +51,137 @@ def test_place_order_unauthorized(client):
     response = client.post("/orders/place_order", json=data)
     assert response.status_code == 302 # Redirect to login
 
-def test_place_order_invalid_customer(logged_in_client):
+def test_place_order_invalid_customer(logged_in_client, assert_max_queries):
     data = {"customer_id": 999, "item": "Laptop", "amount": 1500.0}
+    with assert_max_queries(1):
+        response = logged_in_client.post("/orders/place_order", json=data)
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "Customer not found"
+
+def test_place_order_for_customer_deleted_after_caching(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    logged_in_client.get(f"/customers/view_customers/{customer_id}") # Caches the customer
+    with app.app_context():
+        # Deleted behind this worker's back, as another worker would, so the cache entry survives
+        db.session.execute(delete(Customer).where(Customer.id == customer_id))
+        db.session.commit()
+    data = {"customer_id": customer_id, "item": "Laptop", "amount": 1500.0}
     response = logged_in_client.post("/orders/place_order", json=data)
     assert response.status_code == 404
     assert response.get_json()["error"] == "Customer not found"
+    with app.app_context():
+        assert customer_cache().local.get(f"id:{customer_id}") is None
 
-def test_place_order_missing_details(logged_in_client):
+def test_place_order_missing_details(logged_in_client, assert_max_queries):
     customer_id = setup_customer(logged_in_client)
     data = {"customer_id": customer_id, "item": "Laptop"} # Missing amount
-    response = logged_in_client.post("/orders/place_order", json=data)
+    with assert_max_queries(0):
+        response = logged_in_client.post("/orders/place_order", json=data)
     assert response.status_code == 400
     assert response.get_json()["error"] == "Missing order details (customer_id, item, amount are required)"
 
 
-def test_view_orders(logged_in_client):
+def test_view_orders(logged_in_client, assert_max_queries):
     customer_id = setup_customer(logged_in_client)
     logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
-    response = logged_in_client.get(f"/orders/view_orders/{customer_id}")
+    with assert_max_queries(2):
+        response = logged_in_client.get(f"/orders/view_orders/{customer_id}")
     assert response.status_code == 200
-    assert len(response.get_json()) == 1
-    assert response.get_json()[0]["item"] == "Laptop"
+    assert len(response.get_json()["orders"]) == 1
+    assert response.get_json()["orders"][0]["item"] == "Laptop"
+    assert response.get_json()["next_cursor"] is None
 
-def test_view_all_orders(logged_in_client):
+def test_view_all_orders(logged_in_client, assert_max_queries):
     customer_id1 = setup_customer(logged_in_client)
-    logged_in_client.post("/customers/register", json={"name": "Bob", "phone_number": "+254712345678", "code": "CUST2"})
-    customer_id2 = logged_in_client.get_json()["customer_id"] # Retrieve customer ID from the response of previous post
+    response = logged_in_client.post("/customers/register", json={"name": "Bob", "phone_number": "+254712345678", "code": "CUST2"})
+    customer_id2 = response.get_json()["customer_id"] # Retrieve customer ID from the response of previous post
     logged_in_client.post("/orders/place_order", json={"customer_id": customer_id1, "item": "Laptop", "amount": 1500.0})
     logged_in_client.post("/orders/place_order", json={"customer_id": customer_id2, "item": "Keyboard", "amount": 150.0})
-    response = logged_in_client.get("/orders/view_orders")
+    with assert_max_queries(2):
+        response = logged_in_client.get("/orders/view_orders")
     assert response.status_code == 200
-    assert len(response.get_json()) == 2
+    assert len(response.get_json()["orders"]) == 2
+
+def test_view_orders_paginated(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    for i in range(5):
+        logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": f"Item {i}", "amount": 10.0 + i})
+
+    seen = []
+    cursor = None
+    for _ in range(5): # Bounded so a cursor that never advances fails instead of hanging
+        url = "/orders/view_orders?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = logged_in_client.get(url).get_json()
+        assert len(page["orders"]) <= 2
+        seen.extend(order["id"] for order in page["orders"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+def test_view_orders_all_opt_in(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    with assert_max_queries(2):
+        response = logged_in_client.get("/orders/view_orders?all=true")
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), list)
+    assert len(response.get_json()) == 1
+
+def test_view_orders_invalid_cursor(logged_in_client):
+    response = logged_in_client.get("/orders/view_orders?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid limit or cursor"
+
+def test_view_orders_sparse_fields_and_columnar(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    for item, amount in (("Laptop", 1500.0), ("Mouse", 25.5)):
+        logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": item, "amount": amount})
+
+    with assert_max_queries(2) as queries:
+        response = logged_in_client.get("/orders/view_orders?fields=amount,id")
+    orders = response.get_json()["orders"]
+    assert [set(order) for order in orders] == [{"amount", "id"}, {"amount", "id"}]
+    assert "orders.item" not in queries.statements[-1] # Unrequested columns are not selected
+
+    columnar = logged_in_client.get("/orders/view_orders?fields=item,amount&format=columnar").get_json()
+    assert columnar["orders"] == {"item": ["Mouse", "Laptop"], "amount": [25.5, 1500.0]}
+    assert columnar["next_cursor"] is None
+    full = logged_in_client.get("/orders/view_orders?all=true&format=columnar").get_json()
+    assert set(full) == {"id", "customer_id", "item", "amount", "time", "version"}
+    assert full["customer_id"] == [customer_id, customer_id]
+
+def test_view_orders_invalid_fields(logged_in_client):
+    response = logged_in_client.get("/orders/view_orders?fields=id,secret")
+    assert response.status_code == 400
+    assert "secret" in response.get_json()["error"]
+    assert logged_in_client.get("/orders/view_orders?format=xml").status_code == 400
 
 def test_view_orders_unauthorized(client):
     response = client.get("/orders/view_orders/1")
     assert response.status_code == 302 # Redirect to login
 
-def test_view_orders_invalid_customer(logged_in_client):
-    response = logged_in_client.get("/orders/view_orders/999")
+def test_view_orders_invalid_customer(logged_in_client, assert_max_queries):
+    with assert_max_queries(2):
+        response = logged_in_client.get("/orders/view_orders/999")
     assert response.status_code == 404
     assert response.get_json()["message"] == "No orders found for customer with ID 999."
 
-def test_update_order(logged_in_client):
+def test_update_order(logged_in_client, assert_max_queries):
     customer_id = setup_customer(logged_in_client)
     response = logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
     order_id = response.get_json()["id"]
     update_data = {"item": "Desktop PC"}
-    response = logged_in_client.put(f"/orders/update_orders/{order_id}", json=update_data)
+    with assert_max_queries(3):
+        response = logged_in_client.put(f"/orders/update_orders/{order_id}", json=update_data)
     assert response.status_code == 200
     assert response.get_json()["message"] == "Order updated successfully"
 
-def test_update_nonexistent_order(logged_in_client):
+def test_update_nonexistent_order(logged_in_client, assert_max_queries):
     update_data = {"item": "Desktop PC"}
-    response = logged_in_client.put("/orders/update_orders/999", json=update_data)
+    with assert_max_queries(2): # No read first: the version bump and the UPDATE run, match nothing and roll back
+        response = logged_in_client.put("/orders/update_orders/999", json=update_data)
     assert response.status_code == 404
     assert response.get_json()["error"] == "Order not found"
 
@@ -111,15 +195,365 @@ def test_update_order_missing_details(logged_in_client):
     assert response.get_json()["error"] == "No update data provided"
 
 
-def test_delete_order(logged_in_client):
+def test_delete_order(logged_in_client, assert_max_queries):
     customer_id = setup_customer(logged_in_client)
     response = logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
     order_id = response.get_json()["id"]
-    response = logged_in_client.delete(f"/orders/delete_orders/{order_id}")
+    with assert_max_queries(5):
+        response = logged_in_client.delete(f"/orders/delete_orders/{order_id}")
     assert response.status_code == 200
     assert response.get_json()["message"] == "Order deleted successfully"
 
-def test_delete_nonexistent_order(logged_in_client):
-    response = logged_in_client.delete("/orders/delete_orders/999")
+def test_delete_nonexistent_order(logged_in_client, assert_max_queries):
+    with assert_max_queries(4): # No read first: the rollup statements and the DELETE match nothing and roll back
+        response = logged_in_client.delete("/orders/delete_orders/999")
     assert response.status_code == 404
-    assert response.get_json()["error"] == "Order not found"
\ No newline at end of file
+    assert response.get_json()["error"] == "Order not found"
+
+def test_update_order_version_check(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    order_id = logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0}).get_json()["id"]
+    assert logged_in_client.get("/orders/view_orders").get_json()["orders"][0]["version"] == 1
+
+    with assert_max_queries(2): # Version bump and the UPDATE; nothing is read first
+        response = logged_in_client.put(f"/orders/update_orders/{order_id}", json={"item": "Desktop PC", "version": 1})
+    assert response.status_code == 200
+    # A writer still holding version 1 is turned away and told the current version
+    response = logged_in_client.put(f"/orders/update_orders/{order_id}", json={"amount": 10.0, "version": 1})
+    assert response.status_code == 409
+    assert response.get_json()["version"] == 2
+    assert logged_in_client.delete(f"/orders/delete_orders/{order_id}?version=1").status_code == 409
+    assert rollup_rows() == [(customer_id, 1, 1500.0)] # The rejected writes left the rollup alone
+
+    assert logged_in_client.put(f"/orders/update_orders/{order_id}", json={"amount": "lots"}).status_code == 400
+    assert logged_in_client.delete(f"/orders/delete_orders/{order_id}?version=2").status_code == 200
+    assert rollup_rows() == []
+
+def test_bulk_update_orders(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    created = logged_in_client.post("/orders/bulk", json={"orders": [
+        {"customer_id": customer_id, "item": "Mouse", "amount": 20.0},
+        {"customer_id": customer_id, "item": "Mouse", "amount": 25.0},
+        {"customer_id": customer_id, "item": "Pad", "amount": 5.0},
+    ]}).get_json()["results"]
+    ids = [result["id"] for result in created]
+
+    with assert_max_queries(3): # Rollup delta, version bump and one UPDATE for every order
+        response = logged_in_client.patch("/orders/bulk", json={"ids": ids[:2], "set": {"amount": 22.5}})
+    assert response.status_code == 200
+    assert response.get_json() == {"updated": 2}
+    assert rollup_rows() == [(customer_id, 3, 50.0)]
+
+    orders = {order["id"]: order for order in logged_in_client.get("/orders/view_orders").get_json()["orders"]}
+    assert [(orders[i]["amount"], orders[i]["version"]) for i in ids] == [(22.5, 2), (22.5, 2), (5.0, 1)]
+
+    # One stale version rolls the whole batch back
+    response = logged_in_client.patch("/orders/bulk", json={"versions": {str(ids[0]): 2, str(ids[2]): 0}, "set": {"item": "Cable"}})
+    assert response.status_code == 409
+    assert response.get_json()["versions"] == {str(ids[0]): 2, str(ids[2]): 1}
+    response = logged_in_client.patch("/orders/bulk", json={"ids": [ids[0], 999], "set": {"item": "Cable"}})
+    assert response.status_code == 404
+    assert response.get_json()["ids"] == [999]
+    assert {order["item"] for order in logged_in_client.get("/orders/view_orders").get_json()["orders"]} == {"Mouse", "Pad"}
+
+    response = logged_in_client.patch("/orders/bulk", json={"filter": {"customer_id": customer_id}, "set": {"item": "Cable"}})
+    assert response.get_json() == {"updated": 3}
+
+def test_bulk_delete_orders(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    created = logged_in_client.post("/orders/bulk", json={"orders": [
+        {"customer_id": customer_id, "item": "Mouse", "amount": 20.0},
+        {"customer_id": customer_id, "item": "Pad", "amount": 5.0},
+    ]}).get_json()["results"]
+    ids = [result["id"] for result in created]
+
+    response = logged_in_client.delete("/orders/bulk", json={"versions": {str(ids[0]): 1, str(ids[1]): 7}})
+    assert response.status_code == 409
+    with assert_max_queries(4): # Rollup retraction and pruning, version bump and one DELETE
+        response = logged_in_client.delete("/orders/bulk", json={"ids": ids[:1]})
+    assert response.get_json() == {"deleted": 1}
+    assert rollup_rows() == [(customer_id, 1, 5.0)]
+
+    today = logged_in_client.get("/orders/view_orders").get_json()["orders"][0]["time"][:10]
+    response = logged_in_client.delete("/orders/bulk", json={"filter": {"customer_id": customer_id, "to": today}})
+    assert response.get_json() == {"deleted": 1}
+    assert rollup_rows() == []
+
+def test_bulk_write_validation(logged_in_client):
+    app.config["BULK_ORDERS_MAX"] = 2
+    try:
+        assert logged_in_client.delete("/orders/bulk", json={"ids": [1, 2, 3]}).status_code == 413
+    finally:
+        app.config["BULK_ORDERS_MAX"] = 5000
+    for body in (
+        {"ids": [1]}, # Nothing to set
+        {"ids": [1], "set": {"customer_id": 2}},
+        {"ids": [1], "set": {"amount": "lots"}},
+        {"set": {"item": "Cable"}}, # No selection
+        {"ids": [1], "filter": {"customer_id": 1}, "set": {"item": "Cable"}},
+        {"filter": {}, "set": {"item": "Cable"}}, # Would match every order
+        {"filter": {"from": "yesterday"}, "set": {"item": "Cable"}},
+    ):
+        assert logged_in_client.patch("/orders/bulk", json=body).status_code == 400, body
+def test_export_orders_ndjson(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Mouse", "amount": 25.5})
+    with assert_max_queries(1):
+        response = logged_in_client.get("/orders/export")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["item"] for row in rows] == ["Laptop", "Mouse"]
+    assert rows[1]["amount"] == 25.5
+
+def test_export_orders_csv_for_customer(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    response = logged_in_client.get(f"/orders/export/{customer_id}?format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "id,customer_id,item,amount,time"
+    assert len(lines) == 2
+
+def test_export_orders_invalid_format(logged_in_client):
+    response = logged_in_client.get("/orders/export?format=xml")
+    assert response.status_code == 400
+
+def test_place_orders_bulk(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    orders = [{"customer_id": customer_id, "item": f"Item {i}", "amount": 10.0 + i} for i in range(3)]
+    with assert_max_queries(7):
+        response = logged_in_client.post("/orders/bulk", json={"orders": orders})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["created"] == 3
+    assert body["failed"] == 0
+    assert [result["status"] for result in body["results"]] == ["created"] * 3
+    assert Order.query.count() == 3
+    assert SmsOutbox.query.count() == 3
+
+def test_place_orders_bulk_without_returning(logged_in_client, monkeypatch):
+    # The path MySQL takes: ids come from the driver's last insert id, not from RETURNING
+    other_id = logged_in_client.post("/customers/register", json={"name": "Bob", "phone_number": "+25799999999", "code": "BOB123"}).get_json()["customer_id"]
+    customer_id = setup_customer(logged_in_client)
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+    logged_in_client.post("/orders/place_order", json={"customer_id": other_id, "item": "Earlier", "amount": 1.0})
+    orders = [{"customer_id": (customer_id, other_id)[i % 2], "item": f"Item {i}", "amount": 10.0 + i} for i in range(5)]
+    response = logged_in_client.post("/orders/bulk", json={"orders": orders})
+    assert response.status_code == 201
+    ids = [result["id"] for result in response.get_json()["results"]]
+    with app.app_context():
+        for order_id, row in zip(ids, orders):
+            order = db.session.get(Order, order_id)
+            assert (order.customer_id, order.item) == (row["customer_id"], row["item"])
+            assert SmsOutbox.query.filter_by(order_id=order_id).one().phone_number == ("+25756098389", "+25799999999")[row["customer_id"] == other_id]
+
+def test_place_orders_bulk_partial_failure(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    orders = [
+        {"customer_id": customer_id, "item": "Laptop", "amount": 1500.0},
+        {"customer_id": 999, "item": "Laptop", "amount": 1500.0},
+        {"customer_id": customer_id, "item": "Laptop"},
+        {"customer_id": customer_id, "item": "Laptop", "amount": "lots"},
+        {"customer_id": customer_id, "item": "Laptop", "amount": "NaN"},
+        {"customer_id": customer_id, "item": "Laptop", "amount": "-Infinity"},
+        {"customer_id": customer_id, "item": {"a": 1}, "amount": 10},
+        {"customer_id": customer_id, "item": "x" * 300, "amount": 10},
+        {"customer_id": customer_id, "item": "Laptop", "amount": 1e12},
+        {"customer_id": customer_id, "item": "Laptop", "amount": -5},
+        {"customer_id": True, "item": "Laptop", "amount": 10},
+        {"customer_id": 1.5, "item": "Laptop", "amount": 10},
+    ]
+    response = logged_in_client.post("/orders/bulk", json={"orders": orders})
+    assert response.status_code == 207
+    results = response.get_json()["results"]
+    assert results[0]["status"] == "created"
+    assert results[1] == {"index": 1, "status": "error", "error": "Customer not found"}
+    assert results[2]["error"] == "Missing order details (customer_id, item, amount are required)"
+    assert [result["error"] for result in results[3:]] == [
+        "amount must be a number",
+        "amount must be a number",
+        "amount must be a number",
+        "item must be a non-empty string",
+        "item must be at most 255 characters",
+        "amount must be greater than 0 and at most 99999999.99",
+        "amount must be greater than 0 and at most 99999999.99",
+        "customer_id must be an integer",
+        "customer_id must be an integer",
+    ]
+    assert Order.query.count() == 1
+
+def test_place_orders_bulk_requires_list(logged_in_client):
+    response = logged_in_client.post("/orders/bulk", json={"orders": []})
+    assert response.status_code == 400
+
+def test_view_orders_etag(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    response = logged_in_client.get("/orders/view_orders")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    response = logged_in_client.get("/orders/view_orders", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+    # Another URL over the same data has its own validator
+    assert logged_in_client.get("/orders/view_orders?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+    # Core bulk inserts, ORM updates and cascaded deletes all move the version on
+    logged_in_client.post("/orders/bulk", json={"orders": [{"customer_id": customer_id, "item": "Mouse", "amount": 20.0}]})
+    response = logged_in_client.get("/orders/view_orders", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.get_json()["orders"]) == 2
+    etag = response.headers["ETag"]
+
+    order_id = response.get_json()["orders"][0]["id"]
+    logged_in_client.put(f"/orders/update_orders/{order_id}", json={"item": "Keyboard"})
+    response = logged_in_client.get("/orders/view_orders", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    logged_in_client.delete(f"/customers/delete_customers/{customer_id}")
+    response = logged_in_client.get("/orders/view_orders", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["orders"] == []
+
+def rollup_rows():
+    with app.app_context():
+        return [(row.customer_id, row.order_count, float(row.amount_sum)) for row in OrderDailyRollup.query.all()]
+
+def test_rollup_tracks_order_writes(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    order_id = logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0}).get_json()["id"]
+    logged_in_client.post("/orders/bulk", json={"orders": [{"customer_id": customer_id, "item": "Mouse", "amount": 20.0}] * 2})
+    assert rollup_rows() == [(customer_id, 3, 1540.0)]
+
+    logged_in_client.put(f"/orders/update_orders/{order_id}", json={"amount": 1000.0})
+    assert rollup_rows() == [(customer_id, 3, 1040.0)]
+
+    logged_in_client.delete(f"/orders/delete_orders/{order_id}")
+    assert rollup_rows() == [(customer_id, 2, 40.0)]
+
+    # A rebuild from scratch agrees with the incremental counts
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["rebuild-order-rollup"])
+    assert "1 rows" in result.output
+    assert rollup_rows() == [(customer_id, 2, 40.0)]
+
+    logged_in_client.delete(f"/customers/delete_customers/{customer_id}")
+    assert rollup_rows() == []
+
+def test_delete_customer_cascades_in_database(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    logged_in_client.post("/orders/bulk", json={"orders": [{"customer_id": customer_id, "item": "Mouse", "amount": 20.0}] * 200})
+    etag = logged_in_client.get("/orders/view_orders").headers["ETag"]
+
+    # The customer row, one version bump for customers and orders, and one DELETE: no order is loaded
+    with assert_max_queries(3) as queries:
+        response = logged_in_client.delete(f"/customers/delete_customers/{customer_id}")
+    assert response.status_code == 200
+    assert not any(statement.startswith("DELETE FROM orders") for statement in queries.statements)
+
+    with app.app_context():
+        assert Order.query.count() == 0
+        assert SmsOutbox.query.count() == 200 # Kept for the record, unlinked from the deleted orders
+        assert SmsOutbox.query.filter(SmsOutbox.order_id.is_not(None)).count() == 0
+    assert rollup_rows() == []
+    assert logged_in_client.get("/orders/view_orders", headers={"If-None-Match": etag}).status_code == 200
+
+def seed_aged_orders(customer_id, days_old):
+    # Orders placed `days_old` days ago, one minute apart, oldest first
+    with app.app_context():
+        start = utcnow().replace(microsecond=0) - timedelta(days=days_old)
+        db.session.execute(insert(Order), [
+            {"customer_id": customer_id, "item": f"Old {i}", "amount": 10.0, "time": start + timedelta(minutes=i)}
+            for i in range(5)
+        ])
+        db.session.commit()
+
+def test_archive_orders_is_batched_and_resumable(logged_in_client):
+    customer_id = setup_customer(logged_in_client)
+    seed_aged_orders(customer_id, 400)
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    runner = app.test_cli_runner()
+    runner.invoke(args=["rebuild-order-rollup"]) # Counts the orders seeded behind the app's back
+    rollup_before = sorted(rollup_rows())
+    assert len(rollup_before) == 2
+
+    # Stopped after one batch of two, then run again: it carries on with what is left
+    result = runner.invoke(args=["archive-orders", "--batch-size", "2", "--max-batches", "1"])
+    assert "Archived 2 orders" in result.output
+    result = runner.invoke(args=["archive-orders", "--batch-size", "2"])
+    assert "Archived 3 orders" in result.output
+    assert "Archived 0 orders" in runner.invoke(args=["archive-orders"]).output
+
+    with app.app_context():
+        assert Order.query.count() == 1
+        assert sorted(order.item for order in OrderArchive.query.all()) == [f"Old {i}" for i in range(5)]
+    # The rollup still counts archived orders, and a rebuild agrees
+    assert sorted(rollup_rows()) == rollup_before
+    runner.invoke(args=["rebuild-order-rollup"])
+    assert sorted(rollup_rows()) == rollup_before
+
+def test_view_orders_reads_archive_when_asked(logged_in_client, assert_max_queries):
+    customer_id = setup_customer(logged_in_client)
+    seed_aged_orders(customer_id, 400)
+    logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    app.test_cli_runner().invoke(args=["archive-orders"])
+
+    hot = logged_in_client.get("/orders/view_orders").get_json()["orders"]
+    assert [order["item"] for order in hot] == ["Laptop"]
+
+    # Pages walk from the hot table into the archive, newest first, one query per page
+    items, cursor = [], ""
+    while True:
+        with assert_max_queries(2):
+            page = logged_in_client.get(f"/orders/view_orders/{customer_id}?include_archived=true&limit=2{cursor}").get_json()
+        items += [order["item"] for order in page["orders"]]
+        if not page["next_cursor"]:
+            break
+        cursor = f"&cursor={page['next_cursor']}"
+    assert items == ["Laptop"] + [f"Old {i}" for i in reversed(range(5))]
+
+    # A range reaching back past the archival age merges the archive in without being asked
+    old_day = (utcnow() - timedelta(days=400)).date().isoformat()
+    ranged = logged_in_client.get(f"/orders/view_orders?all=true&from={old_day}&to={old_day}&fields=item").get_json()
+    assert len(ranged) == 5
+    recent = logged_in_client.get(f"/orders/view_orders?all=true&from={utcnow().date().isoformat()}").get_json()
+    assert [order["item"] for order in recent] == ["Laptop"]
+    assert logged_in_client.get("/orders/view_orders?from=last-year").status_code == 400
+
+    # Archived orders go with their customer
+    logged_in_client.delete(f"/customers/delete_customers/{customer_id}")
+    with app.app_context():
+        assert OrderArchive.query.count() == 0
+
+def test_order_stats(logged_in_client, assert_max_queries):
+    alice = setup_customer(logged_in_client)
+    bob = logged_in_client.post("/customers/register", json={"name": "Bob", "phone_number": "+25799999999", "code": "BOB123"}).get_json()["customer_id"]
+    logged_in_client.post("/orders/bulk", json={"orders": [
+        {"customer_id": alice, "item": "Laptop", "amount": 1500.0},
+        {"customer_id": bob, "item": "Mouse", "amount": 20.0},
+        {"customer_id": bob, "item": "Pad", "amount": 5.5},
+    ]})
+
+    with assert_max_queries(3):
+        response = logged_in_client.get("/orders/stats?bucket=month&top=1")
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert stats["totals"] == {"order_count": 3, "amount_sum": 1525.5}
+    assert len(stats["series"]) == 1
+    assert stats["series"][0]["period"].endswith("-01")
+    assert stats["top_customers"] == [{"customer_id": alice, "name": "Alice", "order_count": 1, "amount_sum": 1500.0}]
+
+    bob_series = logged_in_client.get(f"/orders/stats?customer_id={bob}").get_json()["series"]
+    assert [(point["order_count"], point["amount_sum"]) for point in bob_series] == [(2, 25.5)]
+
+    empty = logged_in_client.get("/orders/stats?from=2000-01-01&to=2000-01-31").get_json()
+    assert empty["series"] == [] and empty["top_customers"] == []
+    assert logged_in_client.get("/orders/stats?bucket=year").status_code == 400
+    assert logged_in_client.get("/orders/stats?from=2000-02-01&to=2000-01-01").status_code == 400
@@ -0,0 +1,76 @@
+import logging
+import pytest # type: ignore
+from sqlalchemy import text
+from app import create_app, db
+from config import Config
+from models import Customer, Order
+from services.query_budget import QueryBudgetExceeded, count_queries, max_queries, statement_shape
+
+@pytest.fixture
+def budget_app(tmp_path):
+    class BudgetTestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test_secret_key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'budget.db'}"
+        AUTO_CREATE_TABLES = True
+        QUERY_REPEAT_WARN_THRESHOLD = 3
+
+    app = create_app(BudgetTestConfig)
+    app.add_url_rule("/n-plus-one", "n_plus_one", lambda: {
+        "orders": [len(customer.orders) for customer in Customer.query.all()] # Lazy loads one query per customer
+    })
+    with app.app_context():
+        customers = [Customer(name=f"Customer {i}", phone_number=f"+25470000000{i}", code=f"C{i}") for i in range(4)]
+        db.session.add_all(customers)
+        db.session.flush()
+        db.session.add_all(Order(customer_id=customer.id, item="Laptop", amount=10) for customer in customers)
+        db.session.commit()
+    return app
+
+def test_statement_shape():
+    assert statement_shape("SELECT *\n  FROM orders WHERE id = ?") == "SELECT * FROM orders WHERE id = ?"
+    # IN lists and multi-row VALUES of any length, in any paramstyle, have the same shape
+    assert statement_shape("SELECT * FROM orders WHERE id IN (?, ?, ?)") == statement_shape("SELECT * FROM orders WHERE id IN (?)")
+    assert statement_shape("WHERE id IN (%(id_1_1)s, %(id_1_2)s)") == "WHERE id IN (?)"
+    assert statement_shape("VALUES (%s, %s), (%s, %s)") == "VALUES (?)"
+    assert statement_shape("WHERE time > :since") == "WHERE time > ?"
+
+def test_max_queries(budget_app):
+    with budget_app.app_context():
+        with count_queries() as queries:
+            db.session.execute(text("SELECT 1"))
+            db.session.execute(text("SELECT 2"))
+        assert queries.count == 2
+
+        with pytest.raises(QueryBudgetExceeded, match="at most 1 SQL statements, 2 were run") as exceeded:
+            with max_queries(1):
+                db.session.execute(text("SELECT 1"))
+                db.session.execute(text("SELECT 2"))
+        assert "2. SELECT 2" in str(exceeded.value)
+
+def test_repeated_statements_warn_in_debug_mode(budget_app, caplog):
+    client = budget_app.test_client()
+    with caplog.at_level(logging.WARNING, logger="services.query_budget"):
+        client.get("/n-plus-one")
+        assert not caplog.records # Only in debug mode
+
+        budget_app.debug = True
+        client.get("/n-plus-one")
+    (record,) = caplog.records
+    assert "n_plus_one ran the same statement 4 times" in record.getMessage()
+    assert "FROM orders WHERE ? = orders.customer_id" in record.getMessage()
+
+def test_view_orders_query_count_does_not_grow_with_rows(budget_app):
+    client = budget_app.test_client()
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com'}
+    with budget_app.app_context():
+        engine = db.engine
+    with max_queries(2, engine):
+        assert len(client.get("/orders/view_orders?all=true").get_json()) == 4
+    with budget_app.app_context():
+        customer = Customer.query.first()
+        db.session.add_all(Order(customer_id=customer.id, item=f"Item {i}", amount=10) for i in range(50))
+        db.session.commit()
+    with max_queries(2, engine):
+        assert len(client.get("/orders/view_orders?all=true").get_json()) == 54
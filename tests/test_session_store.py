@@ -0,0 +1,127 @@
+import time
+import pytest # type: ignore
+from datetime import timedelta
+from app import create_app
+from config import Config
+from auth.session_store import DatabaseSessionBackend, SQLiteSessionBackend, ServerSideSessionInterface
+
+class CountingBackend(SQLiteSessionBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.gets = 0
+
+    def get(self, sid):
+        self.gets += 1
+        return super().get(sid)
+
+@pytest.fixture
+def session_app(tmp_path):
+    class SessionTestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'sessions_app.db'}"
+        AUTO_CREATE_TABLES = True
+
+    app = create_app(SessionTestConfig)
+    app.session_interface = ServerSideSessionInterface(CountingBackend(str(tmp_path / "sessions.db")))
+    return app
+
+def log_in(client, **extra):
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com', 'name': 'Test User', 'picture': 'https://example.com/' + 'x' * 200}
+        sess['access_token'] = 'ya29.' + 'a' * 180
+        sess.update(extra)
+
+def session_cookie(client, app):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return cookie.value if cookie else None
+
+def test_cookie_carries_only_the_session_id(session_app):
+    client = session_app.test_client()
+    log_in(client)
+    sid = session_cookie(client, session_app)
+    assert len(sid) == 32
+    data, _ = session_app.session_interface.backend.get(sid)
+    assert "testuser@example.com" in data
+
+    assert client.get("/customers/view_customers").status_code == 200
+    assert client.get("/dashboard").status_code == 200
+    assert session_cookie(client, session_app) == sid # Unchanged sessions are not rewritten
+
+def test_sessions_resolve_from_cache(session_app):
+    client = session_app.test_client()
+    log_in(client)
+    interface = session_app.session_interface
+    interface.cache.clear()
+    backend_gets = interface.backend.gets
+    for _ in range(5):
+        assert client.get("/customers/view_customers").status_code == 200
+    assert interface.backend.gets == backend_gets + 1 # The first request loads it, the rest hit the cache
+
+def test_logout_deletes_the_session(session_app):
+    client = session_app.test_client()
+    log_in(client)
+    sid = session_cookie(client, session_app)
+    assert client.get("/logout").status_code == 302
+    assert session_app.session_interface.backend.get(sid) is None
+    assert session_cookie(client, session_app) is None
+    assert client.get("/customers/view_customers").status_code == 302 # Back to login
+
+def test_regenerate_moves_session_to_new_id(session_app):
+    client = session_app.test_client()
+    log_in(client)
+    old_sid = session_cookie(client, session_app)
+    with client.session_transaction() as sess:
+        sess.regenerate()
+    new_sid = session_cookie(client, session_app)
+    assert new_sid != old_sid
+    backend = session_app.session_interface.backend
+    assert backend.get(old_sid) is None
+    assert backend.get(new_sid) is not None
+
+def test_expired_sessions_are_rejected_and_swept(session_app):
+    session_app.permanent_session_lifetime = timedelta(seconds=1)
+    client = session_app.test_client()
+    log_in(client)
+    backend = session_app.session_interface.backend
+    backend.set("x" * 32, "{}", time.time() - 1) # Abandoned long ago
+
+    time.sleep(1.1)
+    session_app.session_interface.cache.clear()
+    assert client.get("/customers/view_customers").status_code == 302
+    assert session_cookie(client, session_app) is None # The dead cookie is dropped
+    assert backend.sweep() == 2
+
+def test_logout_in_one_worker_reaches_every_workers_cache(session_app, tmp_path):
+    client = session_app.test_client()
+    log_in(client)
+    sid = session_cookie(client, session_app)
+    other_worker = ServerSideSessionInterface(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+    assert other_worker.load(sid) is not None # Now cached there
+
+    assert client.get("/logout").status_code == 302
+    assert other_worker.load(sid) is None
+
+def test_sessions_default_to_the_app_database(tmp_path):
+    class DatabaseSessionConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'sessions_app.db'}"
+        AUTO_CREATE_TABLES = True
+        SESSION_STORE_PATH = None
+
+    app = create_app(DatabaseSessionConfig)
+    interface = app.session_interface
+    assert isinstance(interface.backend, DatabaseSessionBackend)
+    client = app.test_client()
+    log_in(client)
+    sid = session_cookie(client, app)
+    assert client.get("/customers/view_customers").status_code == 200
+    with app.app_context():
+        data, _ = interface.backend.get(sid)
+        assert "testuser@example.com" in data
+        revision = interface.backend.revision()
+
+    assert client.get("/logout").status_code == 302
+    with app.app_context():
+        assert interface.backend.get(sid) is None
+        assert interface.backend.revision() == revision + 1
+    assert client.get("/customers/view_customers").status_code == 302
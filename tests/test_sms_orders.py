@@ -0,0 +1,136 @@
+import pytest # type: ignore
+from app import app, create_app, db
+from config import Config
+from models import Customer, InboundSms, Order, OrderDailyRollup, SmsOutbox, utcnow
+import services.sms_orders
+from services.sms_orders import SmsOrderPipeline, parse_order_text
+from decimal import Decimal
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config['SECRET_KEY'] = 'test_secret_key'
+    app.config['AT_WEBHOOK_TOKEN'] = 'webhook-token'
+    pipeline = app.extensions['sms_orders']
+    # Process each message during the request so the tests need no worker threads
+    app.extensions['sms_orders'] = SmsOrderPipeline(app, workers=0)
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            db.session.add(Customer(name='Alice', phone_number='+25756098389', code='XYZ789'))
+            db.session.commit()
+            yield client
+            db.session.remove()
+            db.drop_all()
+    app.extensions['sms_orders'] = pipeline
+
+def incoming(client, message_id, text, sender='+25756098389'):
+    return client.post("/incoming-messages?token=webhook-token", data={"id": message_id, "from": sender, "to": "12345", "text": text})
+
+def test_parse_order_text():
+    assert parse_order_text("ORDER XYZ789 Red shoes 25.50") == ("XYZ789", "Red shoes", Decimal("25.50"))
+    assert parse_order_text("  order abc Laptop 1500 ") == ("abc", "Laptop", Decimal("1500"))
+    for text in ("ORDER XYZ789 25", "Hello", "ORDER XYZ789 Laptop 0", "ORDER XYZ789 Laptop 12.345"):
+        with pytest.raises(ValueError):
+            parse_order_text(text)
+
+def test_sms_order_goes_through_place_order_path(client):
+    response = incoming(client, "ATXid_in_1", "ORDER XYZ789 Red shoes 25.50")
+    assert response.status_code == 200
+
+    order = Order.query.one()
+    assert (order.item, order.amount) == ("Red shoes", Decimal("25.50"))
+    # Same side effects as POST /orders/place_order
+    assert SmsOutbox.query.filter_by(order_id=order.id).count() == 1
+    assert OrderDailyRollup.query.one().order_count == 1
+    inbound = InboundSms.query.one()
+    assert (inbound.status, inbound.order_id) == ("ordered", order.id)
+
+def test_sms_orders_dedupe_and_reject(client):
+    assert incoming(client, "ATXid_in_1", "ORDER XYZ789 Laptop 1500").status_code == 200
+    assert incoming(client, "ATXid_in_1", "ORDER XYZ789 Laptop 1500").status_code == 200 # Redelivered
+    incoming(client, "ATXid_in_2", "ORDER NOPE Laptop 1500")
+    incoming(client, "ATXid_in_3", "ORDER XYZ789 Laptop 1500", sender='+25700000000')
+    incoming(client, "ATXid_in_4", "What are your opening hours?")
+    assert client.post("/incoming-messages?token=webhook-token", data={"text": "ORDER XYZ789 Laptop 1500"}).status_code == 400
+
+    assert Order.query.count() == 1
+    errors = dict(db.session.query(InboundSms.provider_message_id, InboundSms.error).filter_by(status='rejected'))
+    assert errors == {
+        "ATXid_in_2": "Unknown customer code NOPE",
+        "ATXid_in_3": "Sender is not the customer's registered phone number",
+        "ATXid_in_4": "Expected 'ORDER <code> <item> <amount>'",
+    }
+    stats = app.extensions['sms_orders'].stats()
+    assert stats["duplicates"] == 1
+    assert stats["ordered"] == 1
+    assert stats["rejected"] == 3
+
+    # A fresh process (empty in-memory id set) still skips messages already in inbound_sms
+    fresh = SmsOrderPipeline(app, workers=0)
+    fresh.submit({"provider_message_id": "ATXid_in_1", "phone_number": "+25756098389", "text": "ORDER XYZ789 Laptop 1500"})
+    assert Order.query.count() == 1
+    assert fresh.stats()["duplicates"] == 1
+
+def test_incoming_messages_require_the_webhook_token(client):
+    payload = {"id": "ATXid_in_1", "from": "+25756098389", "to": "12345", "text": "ORDER XYZ789 Laptop 1500"}
+    assert client.post("/incoming-messages", data=payload).status_code == 403
+    assert client.post("/incoming-messages?token=guess", data=payload).status_code == 403
+    app.config['AT_WEBHOOK_TOKEN'] = None # Unset: the webhook stays closed
+    assert client.post("/incoming-messages?token=", data=payload).status_code == 403
+    assert Order.query.count() == 0 and InboundSms.query.count() == 0
+    assert app.extensions['sms_orders'].stats()["received"] == 0
+
+    app.config['AT_WEBHOOK_TOKEN'] = 'webhook-token'
+    assert client.post("/incoming-messages", data=payload, headers={"X-Webhook-Token": "webhook-token"}).status_code == 200
+    assert Order.query.count() == 1
+
+def test_sms_order_sender_matches_formatted_number(client):
+    incoming(client, "ATXid_in_1", "ORDER XYZ789 Laptop 1500", sender='+257 5609-8389')
+    assert InboundSms.query.one().status == "ordered"
+
+def test_failed_sms_order_is_kept_and_spares_the_batch(client, monkeypatch):
+    create_orders = services.sms_orders.create_orders
+    def flaky_create_orders(entries):
+        if any(item == "Boom" for _, item, _ in entries):
+            raise RuntimeError("boom")
+        return create_orders(entries)
+    monkeypatch.setattr(services.sms_orders, "create_orders", flaky_create_orders)
+
+    pipeline = app.extensions['sms_orders']
+    pipeline.process_batch([
+        {"provider_message_id": f"ATXid_in_{i}", "phone_number": "+25756098389", "text": text, "received_at": utcnow()}
+        for i, text in enumerate(("ORDER XYZ789 Laptop 1500", "ORDER XYZ789 Boom 5"))
+    ])
+    assert [order.item for order in Order.query.all()] == ["Laptop"]
+    statuses = dict(db.session.query(InboundSms.provider_message_id, InboundSms.status))
+    assert statuses == {"ATXid_in_0": "ordered", "ATXid_in_1": "failed"}
+    assert InboundSms.query.filter_by(status="failed").one().error == "RuntimeError: boom"
+    assert pipeline.stats()["failed"] == 1
+
+def test_workers_commit_in_batches(tmp_path):
+    class PipelineTestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'sms_orders.db'}"
+        AUTO_CREATE_TABLES = True
+        SMS_ORDER_WORKERS = 2
+        SMS_ORDER_BATCH_SIZE = 20
+        AT_WEBHOOK_TOKEN = 'webhook-token'
+
+    pipeline_app = create_app(PipelineTestConfig)
+    with pipeline_app.app_context():
+        db.session.add(Customer(name='Alice', phone_number='+25756098389', code='XYZ789'))
+        db.session.commit()
+
+    pipeline = pipeline_app.extensions['sms_orders']
+    with pipeline_app.test_client() as client:
+        for i in range(60):
+            assert incoming(client, f"ATXid_{i}", f"ORDER XYZ789 Item{i} {i + 1}").status_code == 200
+    pipeline.join()
+
+    stats = pipeline.stats()
+    assert stats["ordered"] == 60
+    assert stats["batches"] < 60
+    with pipeline_app.app_context():
+        assert Order.query.count() == 60
+        assert InboundSms.query.filter_by(status='ordered').count() == 60
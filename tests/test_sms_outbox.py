@@ -0,0 +1,88 @@
+import pytest # type: ignore
+from app import app, db
+from models import Customer, Order, SmsOutbox
+from services.sms_outbox import claim_batch, dispatch_batch, run_worker
+from services.sms_service import PooledSMSSender
+from services.fake_sms import FakeSMS
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    app.config['SECRET_KEY'] = 'test_secret_key'
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+            app.extensions['customer_cache'].clear() # Ids are reused by the next test's fresh database
+
+@pytest.fixture
+def logged_in_client(client):
+    with client.session_transaction() as sess:
+        sess['profile'] = {'email': 'testuser@example.com'}
+        sess['access_token'] = 'fake-token'
+    return client
+
+def queue_message():
+    customer = Customer(name='Alice', phone_number='+25756098389', code='XYZ789')
+    db.session.add(customer)
+    db.session.flush()
+    order = Order(customer_id=customer.id, item='Laptop', amount=1500.0)
+    db.session.add(order)
+    db.session.flush()
+    message = SmsOutbox(order_id=order.id, phone_number=customer.phone_number, message='Hello Alice')
+    db.session.add(message)
+    db.session.commit()
+    return message.id
+
+def test_place_order_queues_sms(logged_in_client):
+    response = logged_in_client.post("/customers/register", json={"name": "Alice", "phone_number": "+25756098389", "code": "XYZ789"})
+    customer_id = response.get_json()["customer_id"]
+    response = logged_in_client.post("/orders/place_order", json={"customer_id": customer_id, "item": "Laptop", "amount": 1500.0})
+    assert response.status_code == 201
+    assert response.get_json()["sms_status"] == "queued"
+
+    message = SmsOutbox.query.filter_by(order_id=response.get_json()["id"]).one()
+    assert message.status == 'pending'
+    assert message.phone_number == '+25756098389'
+    assert 'Alice' in message.message
+
+def test_claim_batch_is_exclusive(client):
+    queue_message()
+    claimed = claim_batch(batch_size=10, lease_seconds=60)
+    assert len(claimed) == 1
+    assert claimed[0].status == 'sending'
+    # A second worker sees nothing while the lease is held
+    assert claim_batch(batch_size=10, lease_seconds=60) == []
+
+def test_dispatch_marks_sent(client):
+    message_id = queue_message()
+    client = FakeSMS()
+    run_worker(once=True, client=client)
+
+    message = db.session.get(SmsOutbox, message_id)
+    assert client.calls == [('Hello Alice', ['+25756098389'])]
+    assert message.status == 'sent'
+    assert message.attempts == 1
+    assert message.provider_message_id == 'ATXid_1'
+    assert message.sent_at is not None
+
+def test_dispatch_retries_with_backoff_then_fails(client):
+    message_id = queue_message()
+    sender = PooledSMSSender(client=FakeSMS(reject={'+25756098389'}))
+
+    counts = dispatch_batch(claim_batch(10, 60), sender, max_attempts=2, backoff_seconds=30)
+    assert counts == {"sent": 0, "retrying": 1, "failed": 0}
+    message = db.session.get(SmsOutbox, message_id)
+    assert message.status == 'pending'
+    assert message.last_error == 'InvalidPhoneNumber (statusCode 403)'
+    # Not due yet, so nothing is claimable until the backoff elapses
+    assert claim_batch(10, 60) == []
+
+    message.next_attempt_at = message.created_at
+    db.session.commit()
+    counts = dispatch_batch(claim_batch(10, 60), sender, max_attempts=2, backoff_seconds=30)
+    assert counts == {"sent": 0, "retrying": 0, "failed": 1}
+    assert db.session.get(SmsOutbox, message_id).status == 'failed'
+    sender.close()
@@ -0,0 +1,62 @@
+import time
+import pytest # type: ignore
+from services.sms_service import PooledSMSSender, RateLimiter, SendSMS, SMSSendError
+from services.fake_sms import FakeSMS
+
+def test_send_bulk_maps_results_per_recipient():
+    client = FakeSMS(reject={"+254700000002"})
+    results = SendSMS.send_bulk("Sale today", ["+254700000001", "+254700000002"], client=client)
+    assert len(client.calls) == 1
+    assert results["+254700000001"].startswith("ATXid_")
+    assert isinstance(results["+254700000002"], SMSSendError)
+
+def test_send_bulk_matches_reformatted_numbers_only():
+    class ReformattingSMS(FakeSMS):
+        def send(self, message, recipients, sender_id=None):
+            response = super().send(message, recipients, sender_id)
+            for recipient in response["SMSMessageData"]["Recipients"]:
+                recipient["number"] = recipient["number"].replace(" ", "")
+            response["SMSMessageData"]["Recipients"].reverse()
+            return response
+
+    results = SendSMS.send_bulk("Sale today", ["+254 700000001", "+254 700000002"], client=ReformattingSMS(reject={"+254 700000002"}))
+    assert results["+254 700000001"].startswith("ATXid_")
+    assert isinstance(results["+254 700000002"], SMSSendError)
+
+    # Recipients the response does not name are errors, never another recipient's result
+    class AnonymousSMS(FakeSMS):
+        def send(self, message, recipients, sender_id=None):
+            response = super().send(message, recipients, sender_id)
+            for recipient in response["SMSMessageData"]["Recipients"]:
+                recipient["number"] = "unknown"
+            return response
+    results = SendSMS.send_bulk("Sale today", ["+254700000001", "+254700000002"], client=AnonymousSMS())
+    assert all(isinstance(result, SMSSendError) for result in results.values())
+
+def test_pooled_sender_sends_each_message_on_its_own():
+    client = FakeSMS(latency=0.1)
+    with PooledSMSSender(client=client, max_workers=4) as sender:
+        start = time.monotonic()
+        futures = [sender.submit(f"+25470000000{i}", f"Hello customer {i}") for i in range(4)]
+        sender.flush()
+        assert time.monotonic() - start < 0.3 # Concurrent, not one after another
+    assert sorted(client.calls) == sorted((f"Hello customer {i}", [f"+25470000000{i}"]) for i in range(4))
+    assert len({future.result() for future in futures}) == 4
+
+def test_rejected_recipient_and_provider_error_reach_futures():
+    with PooledSMSSender(client=FakeSMS(reject={"+254700000002"})) as sender:
+        ok = sender.submit("+254700000001", "Sale today")
+        rejected = sender.submit("+254700000002", "Sale today")
+    assert ok.exception() is None
+    assert isinstance(rejected.exception(), SMSSendError)
+
+    with PooledSMSSender(client=FakeSMS(error=ConnectionError("timeout"))) as sender:
+        failed = sender.submit("+254700000001", "Sale today")
+    assert isinstance(failed.exception(), ConnectionError)
+
+def test_rate_limiter_throttles_calls():
+    limiter = RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.15
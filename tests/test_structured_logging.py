@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import pytest # type: ignore
+from app import create_app
+from config import Config
+from services.structured_logging import AsyncQueueHandler, JsonFormatter, RequestIdFilter, SamplingFilter, parse_sampling
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+def record(name="api.orders", level=logging.INFO, message="Order placed"):
+    return logging.LogRecord(name, level, __file__, 1, message, None, None)
+
+def test_request_ids_reach_queued_json_records(tmp_path):
+    class LoggingTestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'logging.db'}"
+
+    app = create_app(LoggingTestConfig)
+    output = ListHandler()
+    output.setFormatter(JsonFormatter())
+    handler = AsyncQueueHandler([output])
+    handler.addFilter(RequestIdFilter())
+    test_logger = logging.getLogger("tests.request_ids")
+    test_logger.addHandler(handler)
+    test_logger.setLevel(logging.INFO)
+
+    def view():
+        test_logger.info("Handling %s", "request")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            test_logger.error("It failed", exc_info=True)
+        return "ok"
+    app.add_url_rule("/log-something", "log_something", view)
+
+    client = app.test_client()
+    try:
+        response = client.get("/log-something", headers={"X-Request-ID": "abc-123"})
+        generated = client.get("/log-something").headers["X-Request-ID"]
+        client.get("/log-something", headers={"X-Request-ID": "not valid!"})
+        handler.stop() # Drains the queue
+    finally:
+        test_logger.removeHandler(handler)
+
+    assert response.headers["X-Request-ID"] == "abc-123"
+    entries = [json.loads(line) for line in output.lines]
+    assert [entry["request_id"] for entry in entries[:4]] == ["abc-123", "abc-123", generated, generated]
+    assert entries[0]["message"] == "Handling request"
+    assert entries[0]["logger"] == "tests.request_ids"
+    assert "ValueError: boom" in entries[1]["exc"]
+    assert entries[4]["request_id"] not in ("not valid!", generated)
+
+def test_sampling_keeps_exact_fraction_of_info_lines():
+    sampler = SamplingFilter({"api": 0.25, "api.customers": 1.0})
+    assert sum(sampler.filter(record("api.orders")) for _ in range(100)) == 25
+    assert sum(sampler.filter(record("api.customers")) for _ in range(100)) == 100
+    assert sum(sampler.filter(record("services.sms_orders")) for _ in range(10)) == 10
+    assert all(sampler.filter(record("api.orders", logging.WARNING)) for _ in range(10))
+
+def test_parse_sampling():
+    assert parse_sampling("api.orders=0.1, services.sms_orders=0.5") == {"api.orders": 0.1, "services.sms_orders": 0.5}
+    assert parse_sampling("") == {}
+    for spec in ("api.orders", "api.orders=2", "=0.5"):
+        with pytest.raises(ValueError):
+            parse_sampling(spec)
+
+def test_full_queue_drops_instead_of_blocking():
+    output = ListHandler()
+    handler = AsyncQueueHandler([output], max_pending=2)
+    handler._pid = os.getpid() # Pretend the listener is running, so nothing drains the queue
+    for _ in range(5):
+        handler.handle(record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_gets_its_own_queue_and_listener(tmp_path):
+    path = tmp_path / "forked.log"
+    output = logging.FileHandler(path)
+    output.setFormatter(logging.Formatter("%(process)d %(message)s"))
+    handler = AsyncQueueHandler([output])
+    handler.handle(record(message="parent before fork")) # Starts the listener here, as create_app does in a preloaded master
+    parent_queue = handler.queue
+
+    pid = os.fork()
+    if pid == 0:
+        ok = handler.queue is not parent_queue and handler._listener is None
+        handler.handle(record(message="child"))
+        handler.stop()
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    handler.handle(record(message="parent after fork"))
+    handler.stop()
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    lines = path.read_text().splitlines()
+    assert sorted(line.split(" ", 1)[1] for line in lines) == ["child", "parent after fork", "parent before fork"]
+    assert f"{pid} child" in lines